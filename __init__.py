@@ -21,8 +21,8 @@ NODE_DISPLAY_NAME_MAPPINGS = {**fa_display_mappings, **display_display_mappings}
 
 try:
     main_loop = asyncio.get_event_loop()
-    utils.initiate_background_scan(main_loop)
-    print("Civitai Toolkit background scan initiated.")
+    utils.schedule_startup_tasks(main_loop)
+    print("Civitai Toolkit background scan scheduled.")
 except RuntimeError:
     print("[Civitai Toolkit] Could not get asyncio event loop. Background scan may not have started.")
     print("This can happen during certain startup modes. The scan will trigger on first UI interaction instead.")
@@ -0,0 +1,241 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import utils
+from .analysis_core import (
+    PARTIAL_VERSION,
+    compute_partials,
+    matcher_signature,
+    merge_partials,
+    resource_version_id,
+    use_parallel_analysis,
+)
+
+
+def resolve_resources(metas, domain=None, resources=None):
+    """
+    解析 meta 中 civitaiResources 引用到的模型版本，返回 {version_id: 资源索引条目}。
+    条目依次来自内存 LRU、resource_index 表，都没有时才并发请求 API（结果写入索引）。
+    传入已有的 resources 时只补充其中缺少的版本（批量分析时多个模型共享）。
+    """
+    from tqdm import tqdm
+    if resources is None:
+        resources = {}
+    required_version_ids = {
+        vid
+        for meta in metas
+        if isinstance(meta.get("civitaiResources"), list)
+        for res in meta["civitaiResources"]
+        if (vid := resource_version_id(res)) and vid not in resources
+    }
+    if not required_version_ids:
+        return resources
+
+    resources.update(utils.db_manager.get_resources(required_version_ids))
+    missing = [vid for vid in required_version_ids if vid not in resources]
+    if not missing:
+        return resources
+
+    domain = domain or utils._get_active_domain()
+    print(
+        f"[Civitai Utils] Pre-caching {len(missing)} unique resource details..."
+    )
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [
+            executor.submit(
+                utils.CivitaiAPIUtils.get_model_version_info_by_id, vid, domain
+            )
+            for vid in missing
+        ]
+        for future in tqdm(
+            as_completed(futures), total=len(futures), desc="Pre-caching Resources"
+        ):
+            future.result()
+    resources.update(utils.db_manager.get_resources(missing))
+    return resources
+
+
+def _pending_slices(pages, limit, signature=None):
+    """
+    找出前 limit 条中需要计算部分结果的页：返回 ([(页, 参与计算的 meta)], 计算后需要保存的页)。
+    最后一页只用到一部分时只计算用到的部分，结果不保存。
+    signature 为当前本地文件列表的签名，与部分结果记录的签名不同时该页需要重新计算。
+    """
+    slices, todo, used = [], [], 0
+    for page in pages:
+        if used >= limit:
+            break
+        take = min(page["item_count"], limit - used)
+        if take < page["item_count"]:
+            slices.append((page, page["metas"][:take]))
+        elif (
+            not page["partial"]
+            or page["partial"].get("v") != PARTIAL_VERSION
+            or (signature and page["partial"].get("matcher") != signature)
+        ):
+            slices.append((page, page["metas"]))
+            todo.append(page)
+        used += take
+    return slices, todo
+
+
+def pending_metas(pages, limit):
+    """返回前 limit 条中还需要计算部分结果的 meta"""
+    return [meta for _, metas in _pending_slices(pages, limit)[0] for meta in metas]
+
+
+def analyze_pages(
+    stream_key, pages, limit, filename_to_lora_hash_map, resources=None, embedding_names=None
+):
+    """
+    合并各页的部分结果得到前 limit 条 meta 的统计，缺少部分结果的页在此计算并写回数据库。
+    resources 为共享的资源解析结果，只补充其中缺少的版本。
+    embedding_names 默认为当前的本地 Embedding 列表，用于统计提示词中引用的本地文件。
+    """
+    if embedding_names is None:
+        embedding_names = utils.get_local_embedding_names()
+    slices, todo = _pending_slices(
+        pages, limit, matcher_signature(filename_to_lora_hash_map, embedding_names)
+    )
+
+    shards = [metas for _, metas in slices]
+    metas_to_analyze = [meta for shard in shards for meta in shard]
+    if metas_to_analyze:
+        resources = resolve_resources(metas_to_analyze, resources=resources)
+
+    computed = {}
+    if slices:
+        mode = "parallel" if use_parallel_analysis(shards) else "serial"
+        print(
+            f"[Civitai Toolkit] Analyzing {len(metas_to_analyze)} recipes in {len(shards)} shards ({mode})..."
+        )
+        partials = compute_partials(
+            shards, filename_to_lora_hash_map, resources, embedding_names
+        )
+        for (page, _), partial in zip(slices, partials):
+            computed[page["page_index"]] = partial
+    if todo:
+        utils.db_manager.set_analysis_page_partials(
+            stream_key, {page["page_index"]: computed[page["page_index"]] for page in todo}
+        )
+        for page in todo:
+            page["partial"] = computed[page["page_index"]]
+
+    ordered, used = [], 0
+    for page in pages:
+        if used >= limit:
+            break
+        take = min(page["item_count"], limit - used)
+        if take < page["item_count"]:
+            ordered.append(computed[page["page_index"]])
+        else:
+            ordered.append(page["partial"])
+        used += take
+    return merge_partials(ordered)
+
+
+# =================================================================================
+# 数值参数统计
+# 部分结果中的参数按字符串计数（"7" 与 "7.0" 是不同的键）。这里把计数字典一次性转换为
+# 取值数组与计数数组，按数值合并后用加权分位数计算中位数、四分位距与推荐范围。
+# =================================================================================
+NUMERIC_PARAM_KEYS = {"cfgScale": float, "steps": int, "Denoising strength": float}
+PARAM_HISTOGRAM_BINS = 8
+
+
+def _counts_to_arrays(counts, parse):
+    """把 {字符串取值: 次数} 转换为 (取值数组, 次数数组)，无法解析的取值被忽略"""
+    import numpy as np
+    values, weights = [], []
+    for raw, count in counts.items():
+        try:
+            values.append(parse(raw))
+        except (TypeError, ValueError):
+            continue
+        weights.append(count)
+    return np.asarray(values, dtype=float), np.asarray(weights, dtype=np.int64)
+
+
+def _parse_size(raw):
+    width, height = str(raw).lower().replace(" ", "").split("x")
+    return int(float(width)), int(float(height))
+
+
+def _weighted_quantiles(values, weights, quantiles):
+    """values 已排序；取累计次数首次达到 q * 总数的取值"""
+    import numpy as np
+    cumulative = np.cumsum(weights)
+    targets = np.asarray(quantiles) * cumulative[-1]
+    index = np.searchsorted(cumulative, targets, side="left")
+    return values[np.minimum(index, len(values) - 1)]
+
+
+def _numeric_summary(values, weights, integer=False):
+    import numpy as np
+    if not len(values) or weights.sum() <= 0:
+        return None
+    # 按数值合并重复取值（"7" 与 "7.0"），结果已排序
+    merged, inverse = np.unique(values, return_inverse=True)
+    merged_weights = np.bincount(inverse, weights=weights).astype(np.int64)
+    q1, median, q3 = _weighted_quantiles(merged, merged_weights, [0.25, 0.5, 0.75])
+    hist_counts, edges = np.histogram(
+        merged, bins=min(PARAM_HISTOGRAM_BINS, len(merged)), weights=merged_weights
+    )
+    order = np.argsort(-merged_weights, kind="stable")
+
+    def cast(value):
+        return round(float(value)) if integer else round(float(value), 3)
+
+    return {
+        "count": int(merged_weights.sum()),
+        "mean": float(np.average(merged, weights=merged_weights)),
+        "median": cast(median),
+        "q1": cast(q1),
+        "q3": cast(q3),
+        "min": cast(merged[0]),
+        "max": cast(merged[-1]),
+        "mode": cast(merged[order[0]]),
+        "top_values": [(cast(merged[i]), int(merged_weights[i])) for i in order],
+        "recommended_range": (cast(q1), cast(q3)),
+        "histogram": [
+            (float(edges[i]), float(edges[i + 1]), int(hist_counts[i]))
+            for i in range(len(hist_counts))
+        ],
+    }
+
+
+def numeric_param_stats(param_counters):
+    """
+    由分析结果中的参数计数计算数值统计：{参数: 统计}，包括 CFG、步数、重绘幅度，
+    以及从 Size 一次解析出的 width / height；另附按数值规范化后的 Size 计数 "sizes"。
+    """
+    import numpy as np
+    stats = {}
+    for key, parse in NUMERIC_PARAM_KEYS.items():
+        values, weights = _counts_to_arrays(
+            param_counters.get(key, {}), lambda raw, parse=parse: float(parse(float(raw)))
+        )
+        summary = _numeric_summary(values, weights, integer=parse is int)
+        if summary:
+            stats[key] = summary
+
+    sizes, size_weights = [], []
+    for raw, count in param_counters.get("Size", {}).items():
+        try:
+            sizes.append(_parse_size(raw))
+        except (TypeError, ValueError):
+            continue
+        size_weights.append(count)
+    if sizes:
+        dims = np.asarray(sizes, dtype=np.int64)
+        size_weights = np.asarray(size_weights, dtype=np.int64)
+        for axis, name in enumerate(("width", "height")):
+            summary = _numeric_summary(dims[:, axis].astype(float), size_weights, integer=True)
+            if summary:
+                stats[name] = summary
+        unique_sizes, inverse = np.unique(dims, axis=0, return_inverse=True)
+        size_counts = np.bincount(inverse.ravel(), weights=size_weights).astype(np.int64)
+        order = np.argsort(-size_counts, kind="stable")
+        stats["sizes"] = [
+            (f"{unique_sizes[i][0]}x{unique_sizes[i][1]}", int(size_counts[i])) for i in order
+        ]
+    return stats
@@ -0,0 +1,649 @@
+import multiprocessing
+import os
+import re
+import runpy
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from . import standalone
+    from .name_index import resolve_name
+    from .prompt_matcher import get_resource_matcher, matcher_signature
+    from .prompt_tokenizer import tokenize_prompt
+except ImportError:  # 在分析子进程中按文件路径独立加载
+    import civitai_toolkit_standalone as standalone
+    from civitai_toolkit_name_index import resolve_name
+    from civitai_toolkit_prompt_matcher import get_resource_matcher, matcher_signature
+    from civitai_toolkit_prompt_tokenizer import tokenize_prompt
+
+# =================================================================================
+# 模型分析器的纯计算部分：元数据解析与可合并的聚合结果。
+# 本模块不依赖 ComfyUI、网络或数据库，可以在进程池的子进程中直接加载。
+# =================================================================================
+
+# 分析器统计的生成参数
+PARAM_KEYS = ["sampler", "scheduler", "cfgScale", "steps", "Size", "Denoising strength"]
+PARTIAL_VERSION = 5  # 部分结果格式变化时递增，旧格式的页会被重新计算
+TAG_SKETCH_CAPACITY = 1000  # 每个标签 Top-K 摘要最多跟踪的标签数
+TAG_REPORT_LIMIT = 200  # 最终结果中保留的高频标签数（不小于节点 summary_top_n 的上限）
+WEIGHT_PRECISION = 2  # LoRA 权重直方图的分桶精度（小数位数）
+
+
+# =================================================================================
+# 模型分析器的可合并聚合结果
+# 每页图片的 meta 先计算出一份部分结果 (partial)，多份部分结果按页序合并即可得到
+# 与一次性分析全部 meta 完全相同的统计，因此增加图片数量时只需计算新获取的页。
+# =================================================================================
+def empty_partial():
+    return {
+        "v": PARTIAL_VERSION,
+        "total": 0,
+        "pos": empty_sketch(),
+        "neg": empty_sketch(),
+        "assoc": {"lora": {}, "model": {}, "vae": {}, "embedding": {}},
+        "params": {key: {} for key in PARAM_KEYS},
+        "matcher": None,  # 计算时使用的本地文件列表签名，本地文件变化后需要重新计算
+    }
+
+
+# --- Space-Saving Top-K 摘要 ---
+# items 为 {tag: [count, error, weight_sum]}，count 是真实次数的上界，count - error 是下界，
+# weight_sum 是这 count - error 次出现的有效权重之和；
+# floor 是未被跟踪的标签可能出现的最大次数。摘要可以任意顺序合并，大小不超过 capacity。
+def empty_sketch():
+    return {"floor": 0, "items": {}}
+
+
+def _truncate_sketch(items, floor, capacity):
+    if len(items) <= capacity:
+        return {"floor": floor, "items": items}
+    ranked = sorted(items.items(), key=lambda kv: kv[1][0], reverse=True)
+    kept = dict(ranked[:capacity])
+    dropped_max = ranked[capacity][1][0]
+    # 保持标签首次出现的顺序，使同频标签的排名稳定
+    return {
+        "floor": max(floor, dropped_max),
+        "items": {tag: val for tag, val in items.items() if tag in kept},
+    }
+
+
+def sketch_from_counts(counts, weight_sums=None, capacity=TAG_SKETCH_CAPACITY):
+    """由精确计数（以及可选的权重之和）构建摘要"""
+    weight_sums = weight_sums or {}
+    return _truncate_sketch(
+        {
+            tag: [count, 0, weight_sums.get(tag, float(count))]
+            for tag, count in counts.items()
+        },
+        0,
+        capacity,
+    )
+
+
+def merge_sketches(a, b, capacity=TAG_SKETCH_CAPACITY):
+    items, a_items, b_items = {}, a["items"], b["items"]
+    a_floor, b_floor = a["floor"], b["floor"]
+    for tag in list(a_items) + [t for t in b_items if t not in a_items]:
+        a_count, a_err, a_sum = a_items.get(tag, (a_floor, a_floor, 0.0))
+        b_count, b_err, b_sum = b_items.get(tag, (b_floor, b_floor, 0.0))
+        items[tag] = [a_count + b_count, a_err + b_err, a_sum + b_sum]
+    return _truncate_sketch(items, a_floor + b_floor, capacity)
+
+
+def sketch_most_common(sketch, n=None):
+    ranked = sorted(
+        ((tag, val[0]) for tag, val in sketch["items"].items()),
+        key=lambda kv: kv[1],
+        reverse=True,
+    )
+    return ranked[:n] if n is not None else ranked
+
+
+def sketch_avg_weights(sketch, tags):
+    """给定标签的平均有效权重"""
+    weights = {}
+    for tag in tags:
+        count, err, weight_sum = sketch["items"][tag]
+        if count - err > 0:
+            weights[tag] = round(weight_sum / (count - err), 3)
+    return weights
+
+
+# --- LoRA 权重直方图 ---
+def add_weight(entry, weight):
+    """把一次使用的权重计入资源条目：精确累加总和，按精度分桶计数"""
+    weight = float(weight)
+    bucket = f"{round(weight, WEIGHT_PRECISION):.{WEIGHT_PRECISION}f}"
+    entry["weight_sum"] = entry.get("weight_sum", 0.0) + weight
+    hist = entry.setdefault("weight_hist", {})
+    hist[bucket] = hist.get(bucket, 0) + 1
+
+
+def safe_float_conversion(value, default=1.0):
+    if value is None:
+        return default
+    if isinstance(value, (float, int)):
+        return float(value)
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def resource_version_id(res):
+    """civitaiResources 条目中的 modelVersionId，统一为 int；无效时返回 None"""
+    if not isinstance(res, dict):
+        return None
+    try:
+        return int(res.get("modelVersionId")) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_resources_from_meta(meta, filename_to_lora_hash_map, resources=None):
+    """
+    解析 meta 中引用的 Checkpoint / LoRA / VAE。
+    resources 为 {version_id: 资源索引条目}（sha256、model_id、type、name），用于解析 civitaiResources。
+    """
+    if not isinstance(meta, dict):
+        return {"ckpt_hash": None, "ckpt_name": "unknown", "loras": []}
+    if resources is None:
+        resources = {}
+
+    ckpt_hash, ck_name = meta.get("Model hash"), meta.get("Model")
+    loras, vaes, seen_hashes, seen_names = [], [], set(), set()
+
+    def add_lora(lora_info):
+        lora_hash, lora_name = lora_info.get("hash"), lora_info.get("name")
+        if lora_hash and lora_hash in seen_hashes:
+            return
+        if not lora_hash and lora_name and lora_name in seen_names:
+            return
+        loras.append(lora_info)
+        if lora_hash:
+            seen_hashes.add(lora_hash)
+        if lora_name:
+            seen_names.add(lora_name)
+
+    if isinstance(meta.get("civitaiResources"), list):
+        for res in meta["civitaiResources"]:
+            version_id = resource_version_id(res)
+            resource = resources.get(version_id) if version_id else None
+            if not resource:
+                continue
+
+            res_hash = resource.get("sha256")
+            res_type = (res.get("type") or resource.get("type") or "").lower()
+
+            if res_type == "lora":
+                add_lora(
+                    {
+                        "hash": res_hash,
+                        "name": res.get("modelVersionName") or resource.get("name"),
+                        "weight": safe_float_conversion(res.get("weight")),
+                        "modelVersionId": version_id,
+                    }
+                )
+            elif res_type in ["checkpoint", "model"] and not ckpt_hash:
+                ckpt_hash = res_hash
+                if res.get("modelVersionName") and not ck_name:
+                    ck_name = res["modelVersionName"]
+
+    if isinstance(meta.get("resources"), list):
+        for res in meta["resources"]:
+            if isinstance(res, dict) and res.get("type", "").lower() == "lora":
+                lora_name, lora_hash = res.get("name"), res.get("hash")
+                if not lora_hash and lora_name:
+                    lora_hash = resolve_name(filename_to_lora_hash_map, lora_name)
+                add_lora(
+                    {
+                        "hash": lora_hash,
+                        "name": lora_name,
+                        "weight": safe_float_conversion(res.get("weight")),
+                    }
+                )
+            elif (
+                isinstance(res, dict)
+                and res.get("type", "").lower() == "model"
+                and not ckpt_hash
+            ):
+                ckpt_hash, ck_name = res.get("hash"), res.get("name")
+
+    if isinstance(meta.get("hashes"), dict):
+
+        is_new_hash_format = any(':' in k for k in meta['hashes'])
+
+        if is_new_hash_format:
+            print("[Civitai Toolkit] Detected new hash format, applying special parsing logic.")
+            for key, short_hash in meta['hashes'].items():
+                key_lower = key.lower()
+
+                if key_lower.startswith("lora:"):
+                    # 从键名中提取文件名（可能带子文件夹），通过名称索引反查完整的哈希值
+                    lora_filename = key[5:].replace('\\', '/').split('/')[-1]
+                    full_hash = resolve_name(filename_to_lora_hash_map, key[5:])
+
+                    if not full_hash:
+                        print(f"[Civitai Toolkit] Warning: LoRA '{lora_filename}' found in metadata, but not in local file map. Cannot get full hash.")
+
+                    add_lora({
+                        "hash": full_hash or short_hash, # 优先使用完整的哈希
+                        "name": lora_filename,
+                        "weight": 1.0, # 这种格式没有提供权重，默认为 1.0
+                    })
+
+                elif key_lower.startswith("model:"):
+                    ckpt_hash = short_hash
+                    ck_name = key[6:]  # 提取模型名
+                elif key_lower == "model":
+                    if not ckpt_hash:
+                        ckpt_hash = short_hash
+                elif "vae" in key_lower:
+                    vaes.append({
+                        "hash": short_hash,
+                        "name": key,})
+
+        # 保留原有的逻辑以兼容旧格式
+        elif isinstance(meta["hashes"].get("lora"), dict):
+            for hash_val, weight in meta["hashes"]["lora"].items():
+                add_lora(
+                    {
+                        "hash": hash_val,
+                        "name": None,
+                        "weight": safe_float_conversion(weight),
+                    }
+                )
+
+    for i in range(1, 10):
+        if meta.get(f"AddNet Module {i}") == "LoRA" and f"AddNet Model {i}" in meta:
+            model_str = meta.get(f"AddNet Model {i}", "")
+            match = re.search(r"\((\w+)\)", model_str)
+            if match:
+                add_lora(
+                    {
+                        "hash": match.group(1),
+                        "name": model_str.split("(")[0].strip(),
+                        "weight": safe_float_conversion(
+                            meta.get(f"AddNet Weight A {i}")
+                        ),
+                    }
+                )
+
+    return {"ckpt_hash": ckpt_hash, "ckpt_name": ck_name, "loras": loras, "vaes": vaes}
+
+
+def _int_or_none(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _lower_or_none(value):
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+def normalize_image_meta(meta):
+    """
+    把一条图片 meta 规范化为 images 表的参数列与 LoRA 关联行，返回 (列字典, [LoRA])。
+    LoRA 优先取 civitaiResources（带 version_id），没有时退回 resources / hashes 中的哈希与名称。
+    哈希统一为小写，CFG 等数值列无法解析时为 None。
+    """
+    columns = {
+        "sampler": None, "scheduler": None, "steps": None, "cfg": None,
+        "width": None, "height": None, "seed": None, "denoise": None,
+        "ckpt_hash": None, "ckpt_name": None, "ckpt_version_id": None,
+    }
+    if not isinstance(meta, dict):
+        return columns, []
+
+    columns["sampler"] = meta.get("sampler") or None
+    columns["scheduler"] = meta.get("scheduler") or None
+    columns["steps"] = _int_or_none(meta.get("steps"))
+    columns["cfg"] = _float_or_none(meta.get("cfgScale"))
+    columns["seed"] = _int_or_none(meta.get("seed"))
+    columns["denoise"] = _float_or_none(meta.get("Denoising strength", meta.get("denoise")))
+    size = meta.get("Size")
+    if isinstance(size, str) and "x" in size:
+        width, _, height = size.partition("x")
+        columns["width"], columns["height"] = _int_or_none(width), _int_or_none(height)
+    columns["ckpt_hash"] = _lower_or_none(meta.get("Model hash"))
+    columns["ckpt_name"] = meta.get("Model") or None
+
+    loras, seen = [], set()
+
+    def add_lora(version_id, lora_hash, name, weight):
+        key = version_id or lora_hash or name
+        if not key or key in seen:
+            return
+        seen.add(key)
+        loras.append(
+            {"version_id": version_id, "hash": lora_hash, "name": name, "weight": weight}
+        )
+
+    for res in meta.get("civitaiResources") or []:
+        version_id = resource_version_id(res)
+        if not version_id:
+            continue
+        res_type = (res.get("type") or "").lower()
+        if res_type == "lora":
+            add_lora(
+                version_id, None, res.get("modelVersionName"),
+                safe_float_conversion(res.get("weight")),
+            )
+        elif res_type in ("checkpoint", "model") and not columns["ckpt_version_id"]:
+            columns["ckpt_version_id"] = version_id
+
+    if not loras:
+        for res in meta.get("resources") or []:
+            if not isinstance(res, dict):
+                continue
+            res_type = (res.get("type") or "").lower()
+            if res_type == "lora":
+                add_lora(
+                    None, _lower_or_none(res.get("hash")), res.get("name"),
+                    safe_float_conversion(res.get("weight")),
+                )
+            elif res_type == "model" and not columns["ckpt_hash"]:
+                columns["ckpt_hash"] = _lower_or_none(res.get("hash"))
+                columns["ckpt_name"] = columns["ckpt_name"] or res.get("name")
+
+        hashes = meta.get("hashes")
+        if isinstance(hashes, dict):
+            for key, value in hashes.items():
+                if isinstance(value, dict) and key.lower() == "lora":
+                    for lora_hash, weight in value.items():
+                        add_lora(None, _lower_or_none(lora_hash), None, safe_float_conversion(weight))
+                elif key.lower().startswith("lora:"):
+                    name = key[5:].replace("\\", "/").split("/")[-1]
+                    add_lora(None, _lower_or_none(value), name, 1.0)
+                elif key.lower().startswith("model") and not columns["ckpt_hash"]:
+                    columns["ckpt_hash"] = _lower_or_none(value)
+
+    return columns, loras
+
+
+def _file_stem(filename):
+    return filename.replace("\\", "/").rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+
+def _lora_already_counted(filename, lora_hash, counted):
+    """提示词中的 <lora:> 标签是否与结构化字段中已统计的 LoRA 相同（完整哈希、AutoV2 前缀或名称）"""
+    stem = _file_stem(filename).lower()
+    for info in counted:
+        other_hash = (info.get("hash") or "").lower()
+        if lora_hash and other_hash and lora_hash.lower().startswith(other_hash):
+            return True
+        if (info.get("name") or "").lower() == stem:
+            return True
+    return False
+
+
+def _count_prompt_resources(partial, meta, matcher, filename_to_lora_hash_map, counted_loras):
+    """统计提示词中引用的本地 Embedding，以及结构化字段中没有记录的 <lora:> 标签"""
+    embeddings_pos, prompt_loras = matcher.scan(meta.get("prompt"))
+    embeddings_neg, _ = matcher.scan(meta.get("negativePrompt"))
+    embedding_stats = partial["assoc"]["embedding"]
+    for filename in embeddings_pos | embeddings_neg:
+        entry = embedding_stats.setdefault(
+            filename,
+            {
+                "count": 0,
+                "positive": 0,
+                "negative": 0,
+                "name": _file_stem(filename),
+                "local_file": filename,
+            },
+        )
+        entry["count"] += 1
+        entry["positive"] += filename in embeddings_pos
+        entry["negative"] += filename in embeddings_neg
+
+    lora_stats = partial["assoc"]["lora"]
+    for filename, weight in prompt_loras.items():
+        lora_hash = filename_to_lora_hash_map.get(filename)
+        if _lora_already_counted(filename, lora_hash, counted_loras):
+            continue
+        key = lora_hash or filename
+        if key not in lora_stats:
+            lora_stats[key] = {
+                "count": 0,
+                "weight_sum": 0.0,
+                "weight_hist": {},
+                "name": _file_stem(filename),
+                "modelId": None,
+                "local_file": filename,
+            }
+        lora_stats[key]["count"] += 1
+        add_weight(lora_stats[key], weight)
+
+
+def compute_partial(
+    metas, filename_to_lora_hash_map, resources, embedding_names=(), signature=None
+):
+    """
+    计算一组 meta 的部分聚合结果，resources 见 extract_resources_from_meta。
+    embedding_names 为本地 Embedding 文件名，与本地 LoRA 文件名一起用于匹配提示词中的引用；
+    signature 为两者的签名（见 prompt_matcher.matcher_signature），未提供时在此计算。
+    """
+    partial = empty_partial()
+    partial["total"] = len(metas)
+    assoc_stats = partial["assoc"]
+    signature = signature or matcher_signature(filename_to_lora_hash_map, embedding_names)
+    partial["matcher"] = signature
+    matcher = get_resource_matcher(filename_to_lora_hash_map, embedding_names, signature)
+
+    for meta in metas:
+        extracted = extract_resources_from_meta(
+            meta, filename_to_lora_hash_map, resources
+        )
+        if isinstance(meta, dict):
+            _count_prompt_resources(
+                partial, meta, matcher, filename_to_lora_hash_map, extracted.get("loras", [])
+            )
+        for lora_info in extracted.get("loras", []):
+            key = lora_info.get("hash") or lora_info.get("name")
+            if not key:
+                continue
+            stats_dict = assoc_stats["lora"]
+            if key not in stats_dict:
+                stats_dict[key] = {
+                    "count": 0,
+                    "weight_sum": 0.0,
+                    "weight_hist": {},
+                    "name": lora_info.get("name") or key,
+                    "modelId": lora_info.get("modelId"),
+                }
+            stats_dict[key]["count"] += 1
+            add_weight(stats_dict[key], lora_info.get("weight", 1.0))
+            if not stats_dict[key].get("modelId") and (
+                vid := lora_info.get("modelVersionId")
+            ):
+                resource = resources.get(vid)
+                if resource and resource.get("model_id"):
+                    stats_dict[key]["modelId"] = resource["model_id"]
+                    if resource.get("name"):
+                        stats_dict[key]["name"] = resource["name"]
+
+        for vae_info in extracted.get("vaes", []):
+            key = vae_info.get("hash") or vae_info.get("name")
+            if not key:
+                continue
+            stats_dict = assoc_stats["vae"]
+            if key not in stats_dict:
+                stats_dict[key] = {"count": 0, "name": vae_info.get("name") or key}
+            stats_dict[key]["count"] += 1
+
+    pos_counter, neg_counter = Counter(), Counter()
+    pos_weights, neg_weights = {}, {}
+    for meta in metas:
+        for field, counter, weight_sums in (
+            ("prompt", pos_counter, pos_weights),
+            ("negativePrompt", neg_counter, neg_weights),
+        ):
+            for tag, weight in tokenize_prompt(meta.get(field, "")):
+                counter[tag] += 1
+                weight_sums[tag] = weight_sums.get(tag, 0.0) + weight
+        for key in PARAM_KEYS:
+            if val := meta.get(key):
+                counts = partial["params"][key]
+                counts[str(val)] = counts.get(str(val), 0) + 1
+    partial["pos"] = sketch_from_counts(pos_counter, pos_weights)
+    partial["neg"] = sketch_from_counts(neg_counter, neg_weights)
+    return partial
+
+
+def merge_partials(partials):
+    """按顺序合并多份部分结果；键的首次出现顺序与一次性分析时一致"""
+    merged = empty_partial()
+    for partial in partials:
+        merged["total"] += partial["total"]
+        for field in ("pos", "neg"):
+            merged[field] = merge_sketches(merged[field], partial[field])
+        for key, counts in partial["params"].items():
+            target = merged["params"].setdefault(key, {})
+            for val, count in counts.items():
+                target[val] = target.get(val, 0) + count
+        for res_type, entries in partial["assoc"].items():
+            target = merged["assoc"].setdefault(res_type, {})
+            for key, entry in entries.items():
+                if key not in target:
+                    target[key] = {**entry}
+                    if "weight_hist" in entry:
+                        target[key]["weight_hist"] = dict(entry["weight_hist"])
+                    continue
+                existing = target[key]
+                existing["count"] += entry["count"]
+                if "weight_hist" in entry:
+                    existing["weight_sum"] += entry["weight_sum"]
+                    hist = existing["weight_hist"]
+                    for bucket, count in entry["weight_hist"].items():
+                        hist[bucket] = hist.get(bucket, 0) + count
+                for field in ("positive", "negative"):
+                    if field in entry:
+                        existing[field] = existing.get(field, 0) + entry[field]
+                if not existing.get("modelId") and entry.get("modelId"):
+                    existing["modelId"] = entry["modelId"]
+                    existing["name"] = entry.get("name") or existing["name"]
+    return merged
+
+
+def finalize_partial(partial):
+    """把合并后的部分结果转换为分析器使用的结果格式"""
+    pos_common = sketch_most_common(partial["pos"], TAG_REPORT_LIMIT)
+    neg_common = sketch_most_common(partial["neg"], TAG_REPORT_LIMIT)
+    return {
+        "pos_common": pos_common,
+        "neg_common": neg_common,
+        "pos_weights": sketch_avg_weights(partial["pos"], [tag for tag, _ in pos_common]),
+        "neg_weights": sketch_avg_weights(partial["neg"], [tag for tag, _ in neg_common]),
+        "assoc_stats": partial["assoc"],
+        "param_counters": partial["params"],
+        "total_images": partial["total"],
+    }
+
+
+# =================================================================================
+# 进程池并行分析
+# 解析 meta、分词与参数计数都是纯 Python 的 CPU 密集循环，受 GIL 限制无法用线程加速。
+# 图片数量较多时把各分片交给进程池分别计算部分结果，再按顺序合并。
+# 子进程使用 spawn 启动，初始化入口是只依赖标准库的 standalone.py（由 runpy.run_path 运行），
+# 它按文件路径加载 STANDALONE_NAMES 中的纯计算模块，不导入本插件包。
+# 注意 spawn 仍会按惯例在子进程中以 __mp_main__ 的名称导入宿主的主模块（ComfyUI 的 main.py）。
+# =================================================================================
+PARALLEL_ANALYSIS_MIN_METAS = 400  # 待分析的 meta 数达到该值时使用进程池
+ANALYSIS_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _standalone_core():
+    """
+    以独立模块名加载本模块。提交给进程池的函数按 模块名.函数名 序列化，
+    子进程通过同样的模块名找到它，无需导入插件包本身。
+    """
+    standalone.load_standalone_modules(standalone.standalone_modules())
+    return sys.modules[standalone.STANDALONE_NAMES["analysis_core.py"]]
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=ANALYSIS_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=runpy.run_path,
+                initargs=(standalone.__file__, None, standalone.WORKER_RUN_NAME),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def use_parallel_analysis(shards):
+    return (
+        ANALYSIS_MAX_WORKERS > 1
+        and len(shards) > 1
+        and sum(len(shard) for shard in shards) >= PARALLEL_ANALYSIS_MIN_METAS
+    )
+
+
+def compute_partials(
+    shards, filename_to_lora_hash_map, resources, embedding_names=(), parallel=None
+):
+    """
+    计算每个分片（一组 meta）的部分结果，按分片顺序返回。
+    parallel 为 None 时根据待分析的 meta 数自动选择串行或进程池；进程池不可用时退回串行。
+    """
+    embedding_names = tuple(embedding_names)
+    signature = matcher_signature(filename_to_lora_hash_map, embedding_names)
+    if parallel is None:
+        parallel = use_parallel_analysis(shards)
+    if parallel:
+        try:
+            core = _standalone_core()
+            # 名称索引需以子进程中可导入的独立模块的类型序列化
+            standalone_index = sys.modules[standalone.STANDALONE_NAMES["name_index.py"]]
+            filename_to_lora_hash_map = standalone_index.NameIndex(
+                dict(filename_to_lora_hash_map), getattr(filename_to_lora_hash_map, "aliases", None)
+            )
+            pool = _get_pool()
+            futures = [
+                pool.submit(
+                    core.compute_partial,
+                    shard,
+                    filename_to_lora_hash_map,
+                    resources,
+                    embedding_names,
+                    signature,
+                )
+                for shard in shards
+            ]
+            return [future.result() for future in futures]
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(f"[Civitai Toolkit] Parallel analysis unavailable, falling back to serial: {e}")
+            _reset_pool()
+    return [
+        compute_partial(
+            shard, filename_to_lora_hash_map, resources, embedding_names, signature
+        )
+        for shard in shards
+    ]
@@ -0,0 +1,483 @@
+import re
+import threading
+
+from . import utils
+
+# =================================================================================
+# 跨模型统计：对 images 表中已缓存的全部图片做 SQL 聚合，不重新请求 Civitai。
+# 生成参数在写入时规范化为 images 的列，LoRA 关联写入 image_resources；
+# LoRA 通过 version_id 或哈希（SHA256 / AutoV2）与 resource_index 对应。
+# =================================================================================
+
+# 可统计的参数 → SQL 表达式
+PARAM_COLUMNS = {
+    "sampler": "i.sampler",
+    "scheduler": "i.scheduler",
+    "steps": "i.steps",
+    "cfg": "i.cfg",
+    "size": "CASE WHEN i.width IS NOT NULL THEN i.width || 'x' || i.height END",
+    "denoise": "i.denoise",
+    "checkpoint": "COALESCE(ckpt.name, i.ckpt_name, i.ckpt_hash)",
+}
+_SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
+
+# image_resources 行对应的 version_id：记录中没有时按哈希在资源索引中查找
+_RESOLVED_VERSION_SQL = """COALESCE(r.version_id, (
+    SELECT x.version_id FROM resource_index x WHERE x.autov2 = r.hash OR x.sha256 = r.hash LIMIT 1
+))"""
+
+
+def is_sha256(value):
+    return bool(value) and bool(_SHA256_RE.match(value))
+
+
+def resolve_local_hash(model_type, value):
+    """筛选条件可以是 SHA256 或本地模型文件名；找不到对应的本地文件时抛出 ValueError"""
+    if not value or is_sha256(value):
+        return value or None
+    file_hash = utils.local_model_index.hash_for(model_type, value)
+    if not file_hash:
+        raise ValueError(f"Local model '{value}' not found in {model_type}.")
+    return file_hash
+
+
+def _hash_keys(sha256):
+    """本地文件的 SHA256 及其 AutoV2 短哈希（前 10 位），meta 中两种写法都会出现"""
+    sha256 = sha256.lower()
+    return [sha256, sha256[:10]]
+
+
+def _version_ids_for_hash(conn, sha256):
+    return [
+        row["version_id"]
+        for row in conn.execute(
+            "SELECT version_id FROM resource_index WHERE sha256 = ?", (sha256.lower(),)
+        )
+    ]
+
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+def _image_filters(conn, lora_hash=None, checkpoint_hash=None, base_model=None, source_type=None):
+    """
+    组合图片筛选条件，返回 (where 子句列表, 参数, 用于排除自身的 LoRA 条件)。
+    base_model / source_type 筛选的是图片所属的模型（即获取这些图片时分析的模型）。
+    """
+    clauses, params, lora_match = [], [], None
+    if lora_hash:
+        keys = _hash_keys(lora_hash)
+        vids = _version_ids_for_hash(conn, lora_hash) or [-1]
+        lora_match = (
+            f"(IFNULL(r.version_id, 0) IN ({_placeholders(vids)}) OR IFNULL(r.hash, '') IN ({_placeholders(keys)}))",
+            vids + keys,
+        )
+        clauses.append(
+            f"EXISTS (SELECT 1 FROM image_resources r WHERE r.image_id = i.image_id AND {lora_match[0]})"
+        )
+        params.extend(lora_match[1])
+    if checkpoint_hash:
+        keys = _hash_keys(checkpoint_hash)
+        vids = _version_ids_for_hash(conn, checkpoint_hash) or [-1]
+        clauses.append(
+            f"(i.ckpt_hash IN ({_placeholders(keys)}) OR i.ckpt_version_id IN ({_placeholders(vids)}))"
+        )
+        params.extend(keys + vids)
+    if base_model:
+        clauses.append("src.base_model LIKE ?")
+        params.append(f"%{base_model}%")
+    if source_type:
+        clauses.append("UPPER(src.type) = UPPER(?)")
+        params.append(source_type)
+    return clauses, params, lora_match
+
+
+def _where(clauses):
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def parameter_distribution(param, top_n=10, **filters):
+    """
+    统计筛选后图片中某个生成参数的取值分布。
+    返回 {"param", "total", "rows": [(取值, 次数)]}，total 为该参数有值的图片数。
+    """
+    if param not in PARAM_COLUMNS:
+        raise ValueError(f"Unknown parameter '{param}'. Choose from: {', '.join(PARAM_COLUMNS)}")
+    utils.db_manager.normalize_cached_images()
+    expr = PARAM_COLUMNS[param]
+    with utils.db_manager.get_connection() as conn:
+        clauses, params, _ = _image_filters(conn, **filters)
+        clauses.append(f"({expr}) IS NOT NULL")
+        source = f"""
+            FROM images i
+            LEFT JOIN resource_index src ON src.version_id = i.version_id
+            LEFT JOIN resource_index ckpt ON ckpt.version_id = i.ckpt_version_id
+            {_where(clauses)}
+        """
+        total = conn.execute(f"SELECT COUNT(*) {source}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {expr} AS value, COUNT(*) AS n {source} GROUP BY value ORDER BY n DESC LIMIT ?",
+            params + [top_n],
+        ).fetchall()
+    return {"param": param, "total": total, "rows": [(row["value"], row["n"]) for row in rows]}
+
+
+def co_used_loras(top_n=10, **filters):
+    """
+    统计筛选后图片中一起使用的 LoRA（指定 lora_hash 时排除它自身）。
+    返回 {"total", "rows": [{"name", "model_id", "count", "avg_weight"}]}，total 为筛选后的图片数。
+    """
+    utils.db_manager.normalize_cached_images()
+    with utils.db_manager.get_connection() as conn:
+        clauses, params, lora_match = _image_filters(conn, **filters)
+        source = f"""
+            FROM images i LEFT JOIN resource_index src ON src.version_id = i.version_id
+            {_where(clauses)}
+        """
+        total = conn.execute(f"SELECT COUNT(*) {source}", params).fetchone()[0]
+
+        lora_clauses, lora_params = list(clauses), list(params)
+        if lora_match:
+            lora_clauses.append(f"NOT {lora_match[0]}")
+            lora_params.extend(lora_match[1])
+        rows = conn.execute(
+            f"""
+            WITH used AS (
+                SELECT r.image_id, r.hash, r.name, r.weight, {_RESOLVED_VERSION_SQL} AS vid
+                FROM image_resources r
+                JOIN images i ON i.image_id = r.image_id
+                LEFT JOIN resource_index src ON src.version_id = i.version_id
+                {_where(lora_clauses)}
+            )
+            SELECT COALESCE(MAX(ri.name), MAX(used.name), MAX(used.hash)) AS name,
+                   MAX(ri.model_id) AS model_id,
+                   COUNT(DISTINCT used.image_id) AS n,
+                   AVG(used.weight) AS avg_weight
+            FROM used LEFT JOIN resource_index ri ON ri.version_id = used.vid
+            GROUP BY COALESCE('v:' || used.vid, 'h:' || used.hash, 'n:' || LOWER(used.name))
+            ORDER BY n DESC LIMIT ?
+            """,
+            lora_params + [top_n],
+        ).fetchall()
+    return {
+        "total": total,
+        "rows": [
+            {
+                "name": row["name"],
+                "model_id": row["model_id"],
+                "count": row["n"],
+                "avg_weight": row["avg_weight"],
+            }
+            for row in rows
+        ],
+    }
+
+
+def cache_overview():
+    utils.db_manager.normalize_cached_images()
+    with utils.db_manager.get_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) AS images,
+                   COUNT(DISTINCT version_id) AS models,
+                   SUM(CASE WHEN sampler IS NOT NULL OR cfg IS NOT NULL THEN 1 ELSE 0 END) AS with_params
+            FROM images
+            """
+        ).fetchone()
+        lora_images = conn.execute(
+            "SELECT COUNT(DISTINCT image_id) FROM image_resources"
+        ).fetchone()[0]
+    return {
+        "images": row["images"],
+        "models": row["models"],
+        "with_params": row["with_params"] or 0,
+        "with_loras": lora_images,
+    }
+
+
+# =================================================================================
+# 资源共现索引
+# cooccurrence 表随每次写入图片增量更新；查询时使用内存中的稀疏（CSR）数组，
+# 表有变化后在下一次查询时重建。重建时把能在资源索引中找到的哈希键归并为版本键。
+# =================================================================================
+class CooccurrenceIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_version = None
+        self.keys = []
+        self.key_ids = {}
+        # 稀疏数组在第一次查询时由 _build 创建
+        self.indptr = self.b_ids = self.counts = None
+        self.weight_sums = self.weight_sq_sums = self.is_lora = None
+
+    @staticmethod
+    def _canonical_hash_keys(conn, rows):
+        """把 "<kind>:h:<哈希>" 键映射为资源索引中对应的 "<kind>:v:<version_id>" 键"""
+        hashes = {
+            key.split(":", 2)[2]
+            for row in rows
+            for key in (row["a_key"], row["b_key"])
+            if key.split(":", 2)[1] == "h"
+        }
+        hash_to_vid, hashes = {}, list(hashes)
+        for i in range(0, len(hashes), 400):
+            chunk = hashes[i : i + 400]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"""SELECT version_id, sha256, autov2 FROM resource_index
+                WHERE sha256 IN ({placeholders}) OR autov2 IN ({placeholders})""",
+                chunk + chunk,
+            ):
+                for file_hash in (row["sha256"], row["autov2"]):
+                    if file_hash:
+                        hash_to_vid[file_hash] = row["version_id"]
+        return hash_to_vid
+
+    def _build(self):
+        import numpy as np
+        with utils.db_manager.get_connection() as conn:
+            rows = conn.execute("SELECT * FROM cooccurrence").fetchall()
+            hash_to_vid = self._canonical_hash_keys(conn, rows)
+
+        def canonical(key):
+            kind, form, value = key.split(":", 2)
+            if form == "h" and value in hash_to_vid:
+                return f"{kind}:v:{hash_to_vid[value]}"
+            return key
+
+        key_ids, a_list, b_list = {}, [], []
+        for row in rows:
+            a_list.append(key_ids.setdefault(canonical(row["a_key"]), len(key_ids)))
+            b_list.append(key_ids.setdefault(canonical(row["b_key"]), len(key_ids)))
+        n = len(key_ids)
+        a = np.asarray(a_list, dtype=np.int64)
+        b = np.asarray(b_list, dtype=np.int64)
+        # 归并后可能出现重复的 (a, b)，按组合键求和；np.unique 的结果按 a 再按 b 排序，正好是 CSR 顺序
+        pairs, inverse = np.unique(a * max(n, 1) + b, return_inverse=True)
+
+        def sums(column):
+            weights = np.asarray([row[column] for row in rows], dtype=float)
+            return np.bincount(inverse, weights=weights, minlength=len(pairs))
+
+        self.keys = list(key_ids)
+        self.key_ids = key_ids
+        self.b_ids = pairs % max(n, 1)
+        self.indptr = np.searchsorted(pairs // max(n, 1), np.arange(n + 1))
+        self.counts = np.rint(sums("count")).astype(np.int64)
+        self.weight_sums = sums("weight_sum")
+        self.weight_sq_sums = sums("weight_sq_sum")
+        self.is_lora = np.fromiter((key.startswith("lora:") for key in self.keys), bool, n)
+
+    def ensure_current(self):
+        with self._lock:
+            version = utils.db_manager.cooccurrence_version
+            if self._built_version != version:
+                self._build()
+                self._built_version = version
+
+    def _self_count(self, key_id):
+        import numpy as np
+        start, end = self.indptr[key_id], self.indptr[key_id + 1]
+        hit = np.searchsorted(self.b_ids[start:end], key_id)
+        if hit < end - start and self.b_ids[start + hit] == key_id:
+            return int(self.counts[start + hit])
+        return 0
+
+    def companions(self, keys, top_k=10, kind=None):
+        """
+        返回与 keys（同一模型的多个键）共同出现最多的资源：
+        [{"key", "count", "share", "avg_weight", "std_weight"}]，share 为包含该模型的图片中的占比。
+        kind 为 "lora" / "ckpt" 时只返回该类资源。
+        """
+        import numpy as np
+        self.ensure_current()
+        ids = sorted({self.key_ids[key] for key in keys if key in self.key_ids})
+        if not ids:
+            return []
+        if len(ids) == 1:
+            span = slice(self.indptr[ids[0]], self.indptr[ids[0] + 1])
+            b, counts = self.b_ids[span], self.counts[span]
+            weight_sums, weight_sq_sums = self.weight_sums[span], self.weight_sq_sums[span]
+        else:
+            spans = np.concatenate(
+                [np.arange(self.indptr[i], self.indptr[i + 1]) for i in ids]
+            )
+            b, inverse = np.unique(self.b_ids[spans], return_inverse=True)
+            counts = np.bincount(inverse, weights=self.counts[spans]).astype(np.int64)
+            weight_sums = np.bincount(inverse, weights=self.weight_sums[spans])
+            weight_sq_sums = np.bincount(inverse, weights=self.weight_sq_sums[spans])
+        total = sum(self._self_count(i) for i in ids)
+
+        mask = ~np.isin(b, ids) & (counts > 0)
+        if kind == "lora":
+            mask &= self.is_lora[b]
+        elif kind == "ckpt":
+            mask &= ~self.is_lora[b]
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > top_k:
+            top = np.argpartition(-counts[candidates], top_k - 1)[:top_k]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-counts[candidates], kind="stable")]
+
+        results = []
+        for i in candidates:
+            count = int(counts[i])
+            mean = weight_sums[i] / count
+            variance = max(weight_sq_sums[i] / count - mean * mean, 0.0)
+            results.append(
+                {
+                    "key": self.keys[b[i]],
+                    "count": count,
+                    "share": count / total if total else 0.0,
+                    "avg_weight": float(mean) if self.is_lora[b[i]] else None,
+                    "std_weight": float(variance ** 0.5) if self.is_lora[b[i]] else None,
+                }
+            )
+        return results
+
+
+cooccurrence_index = CooccurrenceIndex()
+
+
+def model_cooccurrence_keys(kind, sha256):
+    """本地模型在共现统计中可能使用的全部键：版本键以及 SHA256 / AutoV2 哈希键"""
+    with utils.db_manager.get_connection() as conn:
+        vids = _version_ids_for_hash(conn, sha256)
+    keys = [utils.cooccurrence_key(kind, version_id=vid) for vid in vids]
+    keys += [utils.cooccurrence_key(kind, file_hash=key) for key in _hash_keys(sha256)]
+    return keys
+
+
+def _names_for_hash_keys(conn, lora_hashes, ckpt_hashes):
+    """
+    资源索引中没有对应版本的哈希键，取图片记录中该哈希最常见的名称。
+    返回 {(kind, 哈希): 名称}
+    """
+    names = {}
+    for kind, hashes, query in (
+        (
+            "lora",
+            lora_hashes,
+            """SELECT hash, name, COUNT(*) AS n FROM image_resources
+            WHERE hash IN ({}) AND name IS NOT NULL AND name != '' GROUP BY hash, name""",
+        ),
+        (
+            "ckpt",
+            ckpt_hashes,
+            """SELECT ckpt_hash AS hash, ckpt_name AS name, COUNT(*) AS n FROM images
+            WHERE ckpt_hash IN ({}) AND ckpt_name IS NOT NULL AND ckpt_name != '' GROUP BY ckpt_hash, ckpt_name""",
+        ),
+    ):
+        if not hashes:
+            continue
+        hashes = list(hashes)
+        best = {}
+        for row in conn.execute(query.format(_placeholders(hashes)), hashes):
+            if row["n"] > best.get(row["hash"], ("", 0))[1]:
+                best[row["hash"]] = (row["name"], row["n"])
+        names.update({(kind, file_hash): name for file_hash, (name, _) in best.items()})
+    return names
+
+
+def top_companions(lora_hash=None, checkpoint_hash=None, top_k=10, kind=None):
+    """
+    与本地 LoRA / Checkpoint 共同使用最多的资源，附带名称、模型 ID 与本地文件名（如有）。
+    同时指定两者时合并两者的共现统计。
+    """
+    utils.db_manager.normalize_cached_images()
+    keys = []
+    if lora_hash:
+        keys += model_cooccurrence_keys("lora", lora_hash)
+    if checkpoint_hash:
+        keys += model_cooccurrence_keys("ckpt", checkpoint_hash)
+    results = cooccurrence_index.companions(keys, top_k, kind)
+
+    parsed = [result["key"].split(":", 2) for result in results]
+    version_ids = [int(value) for _, form, value in parsed if form == "v"]
+    resources = utils.db_manager.get_resources(version_ids)
+    with utils.db_manager.get_connection() as conn:
+        hash_names = _names_for_hash_keys(
+            conn,
+            {value for kind_name, form, value in parsed if form == "h" and kind_name == "lora"},
+            {value for kind_name, form, value in parsed if form == "h" and kind_name == "ckpt"},
+        )
+    for model_type in ("loras", "checkpoints"):
+        utils.local_model_index.get_maps(model_type)
+    for result, (kind_name, form, value) in zip(results, parsed):
+        result["kind"] = kind_name
+        resource = resources.get(int(value)) if form == "v" else None
+        result["name"] = (resource or {}).get("name") or hash_names.get((kind_name, value)) or value
+        result["model_id"] = (resource or {}).get("model_id")
+        file_hash = (resource or {}).get("sha256") or (value if form == "h" else None)
+        result["local_file"] = utils.local_model_index.filename_for(file_hash)
+    return results
+
+
+def format_companions_markdown(results, scope, domain="civitai.com"):
+    md_lines = ["### Frequently Used Together\n", f"_Scope: {scope}_\n"]
+    if not results:
+        md_lines.append("_No co-occurrence data found. Analyze or browse images of this model first._")
+        return "\n".join(md_lines)
+    md_lines.extend(
+        [
+            "| Rank | Resource | Type | Images | Share | Avg. Weight | Local File |",
+            "|:----:|:---------|:----:|:------:|:-----:|:-----------:|:-----------|",
+        ]
+    )
+    for i, row in enumerate(results):
+        name = row["name"]
+        if row["model_id"]:
+            name = f"[{name}](https://{domain}/models/{row['model_id']})"
+        weight = (
+            f"`{row['avg_weight']:.2f}` ± {row['std_weight']:.2f}" if row["avg_weight"] is not None else "-"
+        )
+        local_file = f"`{row['local_file']}`" if row["local_file"] else "-"
+        kind = "LoRA" if row["kind"] == "lora" else "Checkpoint"
+        md_lines.append(
+            f"| {i + 1} | {name} | {kind} | {row['count']} | **{row['share'] * 100:.1f}%** | {weight} | {local_file} |"
+        )
+    return "\n".join(md_lines)
+
+
+def describe_filters(lora_name=None, checkpoint_name=None, base_model=None, source_type=None):
+    parts = []
+    if source_type:
+        parts.append(f"{source_type} galleries")
+    if base_model:
+        parts.append(f"base model matching `{base_model}`")
+    if lora_name:
+        parts.append(f"using LoRA `{lora_name}`")
+    if checkpoint_name:
+        parts.append(f"using checkpoint `{checkpoint_name}`")
+    return ", ".join(parts) if parts else "all cached images"
+
+
+def format_parameter_distribution_markdown(result, scope):
+    md_lines = [f"### {result['param'].capitalize()} distribution\n", f"_Scope: {scope}_\n"]
+    total = result["total"]
+    if not result["rows"]:
+        md_lines.append("_No data found._")
+        return "\n".join(md_lines)
+    md_lines.extend(["| Rank | Value | Count (Usage) |", "|:----:|:------|:-------------:|"])
+    for i, (value, count) in enumerate(result["rows"]):
+        md_lines.append(f"| {i + 1} | `{value}` | **{count}** ({count / total * 100:.1f}%) |")
+    return "\n".join(md_lines)
+
+
+def format_co_used_loras_markdown(result, scope, domain="civitai.com"):
+    md_lines = ["### Co-used LoRAs\n", f"_Scope: {scope} ({result['total']} images)_\n"]
+    if not result["rows"]:
+        md_lines.append("_No data found._")
+        return "\n".join(md_lines)
+    md_lines.extend(
+        ["| Rank | LoRA Name | Images | Usage | Avg. Weight |", "|:----:|:----------|:------:|:-----:|:-----------:|"]
+    )
+    for i, row in enumerate(result["rows"]):
+        name = row["name"] or "unknown"
+        if row["model_id"]:
+            name = f"[{name}](https://{domain}/models/{row['model_id']})"
+        avg_weight = f"`{row['avg_weight']:.2f}`" if row["avg_weight"] is not None else "-"
+        usage = row["count"] / result["total"] * 100 if result["total"] else 0
+        md_lines.append(f"| {i + 1} | {name} | {row['count']} | **{usage:.1f}%** | {avg_weight} |")
+    return "\n".join(md_lines)
@@ -1,20 +1,47 @@
 import asyncio
+import functools
+import hashlib
 import json
 import os
 import time
-import urllib.request
 import urllib.parse
 import folder_paths
 from aiohttp import web
 import server
 import re
+import threading
 
 from . import utils
+from . import analytics
 
 
 prompt_server = server.PromptServer.instance
 main_loop = asyncio.get_event_loop()
 
+LOOP_WATCHDOG_INTERVAL = 1.0  # 事件循环看门狗的采样间隔（秒）
+LOOP_STALL_THRESHOLD = 0.5  # 事件循环卡顿超过该时长（秒）时打印警告
+ORIGINAL_FILE_MAX_AGE = 24 * 3600  # 已保存原图的浏览器缓存时间（秒）
+THUMB_MAX_AGE = 7 * 24 * 3600  # 缩略图代理的浏览器缓存时间（秒）
+THUMB_MAX_WIDTH = 2048  # 缩略图代理允许请求的最大宽度（像素）
+
+
+async def run_blocking(func, *args):
+    """在线程池中执行阻塞操作（数据库、哈希、网络），避免卡住 ComfyUI 的事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args))
+
+
+async def event_loop_watchdog():
+    """定期测量事件循环的调度延迟，超过阈值时记录一次卡顿"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_WATCHDOG_INTERVAL)
+        lag = loop.time() - started - LOOP_WATCHDOG_INTERVAL
+        if lag > LOOP_STALL_THRESHOLD:
+            print(f"[Civitai Toolkit] Warning: event loop stalled for {lag:.2f}s.")
+
+
 def sanitize_filename(filename):
     filename = filename.replace("..", "").replace("\0", "")
     illegal_chars = r'<>:"/\\|?*\t\n\r'
@@ -27,7 +54,8 @@ def sanitize_filename(filename):
 @prompt_server.routes.get("/civitai_utils/get_db_stats")
 async def get_db_stats(request):
     try:
-        stats = utils.db_manager.get_db_stats()
+        stats = await run_blocking(utils.db_manager.get_db_stats)
+        stats["http_cache"] = await run_blocking(utils.http_cache.stats)
         return web.json_response({"status": "ok", "stats": stats})
     except Exception as e:
         print(f"[Civitai Utils] Error getting DB stats: {e}")
@@ -44,7 +72,9 @@ async def get_scanned_models(request):
         )
     try:
         # force_sync=False 避免不必要的重复扫描
-        model_list = utils.get_model_filenames_from_db(model_type, force_sync=False)
+        model_list = await run_blocking(
+            utils.get_model_filenames_from_db, model_type, False
+        )
         return web.json_response({"status": "ok", "models": model_list})
     except Exception as e:
         print(f"[Civitai Utils] Error getting scanned models: {e}")
@@ -55,7 +85,7 @@ async def get_scanned_models(request):
 async def check_legacy_cache(request):
     """检查旧版缓存文件是否存在的API"""
     try:
-        exists = utils.check_legacy_cache_exists()
+        exists = await run_blocking(utils.check_legacy_cache_exists)
         return web.json_response({"exists": exists})
     except Exception as e:
         return web.json_response({"exists": False, "error": str(e)})
@@ -73,18 +103,21 @@ async def force_rescan(request):
                 {"status": "error", "message": "Invalid model_type"}, status=400
             )
 
-        # 如果是 rehash_all，我们需要先清空数据库中的 mtime
-        if rehash_all:
-            with utils.db_manager.get_connection() as conn:
-                conn.execute(
-                    "UPDATE versions SET local_mtime = 0 WHERE model_type = ?",
-                    (model_type,),
-                )
-
-        # 将计时器清零以确保扫描执行
-        utils.db_manager.set_setting(f"last_sync_{model_type}", 0)
-        # 执行扫描并捕获结果
-        scan_results = utils.sync_local_files_with_db(model_type, force=True)
+        def rescan():
+            # 如果是 rehash_all，我们需要先清空数据库中的 mtime
+            if rehash_all:
+                with utils.db_manager.get_connection() as conn:
+                    conn.execute(
+                        "UPDATE versions SET local_mtime = 0 WHERE model_type = ?",
+                        (model_type,),
+                    )
+
+            # 将计时器清零以确保扫描执行
+            utils.db_manager.set_setting(f"last_sync_{model_type}", 0)
+            # 执行扫描并捕获结果
+            return utils.sync_local_files_with_db(model_type, force=True)
+
+        scan_results = await run_blocking(rescan)
         found_count = scan_results.get("found", 0)
         hashed_count = scan_results.get("hashed", 0)
 
@@ -110,7 +143,7 @@ async def force_rescan(request):
 @prompt_server.routes.post("/civitai_utils/migrate_hashes")
 async def migrate_hashes(request):
     try:
-        results = utils.migrate_legacy_caches()
+        results = await run_blocking(utils.migrate_legacy_caches)
         return web.json_response({"status": "ok", "message": results["message"]})
     except Exception as e:
         print(f"[Civitai Utils] Error migrating hashes: {e}")
@@ -126,25 +159,43 @@ async def clear_cache(request):
         data = await request.json()
         cache_type = data.get("cache_type")
 
-        if cache_type == "analysis":
-            utils.db_manager.clear_analysis_cache()
-            message = "Analyzer cache cleared successfully."
-        elif cache_type == "api_responses":
-            utils.db_manager.clear_api_responses()
-            message = "API response cache cleared successfully."
-        elif cache_type == "triggers":
-            utils.db_manager.clear_all_triggers()
-            message = "Trigger word cache cleared successfully."
-        elif cache_type == "all":
-            utils.db_manager.clear_analysis_cache()
-            utils.db_manager.clear_api_responses()
-            utils.db_manager.clear_all_triggers()
-            message = "All caches have been cleared."
-        else:
+        clear_actions = {
+            "analysis": (
+                [utils.db_manager.clear_analysis_cache],
+                "Analyzer cache cleared successfully.",
+            ),
+            "api_responses": (
+                [
+                    utils.db_manager.clear_api_responses,
+                    utils.http_cache.clear,
+                    utils.thumb_cache.clear,
+                ],
+                "API response cache cleared successfully.",
+            ),
+            "triggers": (
+                [utils.db_manager.clear_all_triggers],
+                "Trigger word cache cleared successfully.",
+            ),
+            "all": (
+                [
+                    utils.db_manager.clear_analysis_cache,
+                    utils.db_manager.clear_api_responses,
+                    utils.http_cache.clear,
+                    utils.thumb_cache.clear,
+                    utils.db_manager.clear_all_triggers,
+                ],
+                "All caches have been cleared.",
+            ),
+        }
+        if cache_type not in clear_actions:
             return web.json_response(
                 {"status": "error", "message": "Invalid cache type"}, status=400
             )
 
+        actions, message = clear_actions[cache_type]
+        for action in actions:
+            await run_blocking(action)
+
         return web.json_response({"status": "ok", "message": message})
     except Exception as e:
         print(f"[Civitai Utils] Error clearing cache: {e}")
@@ -167,11 +218,13 @@ async def fetch_data(request):
             request.query.get("filter_type"),
         )
 
-        _, filename_to_hash = utils.get_local_model_maps(model_type)
-        model_hash = filename_to_hash.get(model_filename)
+        model_hash = await run_blocking(
+            utils.local_model_index.hash_for, model_type, model_filename
+        )
         if not model_hash:
             raise FileNotFoundError(f"Model hash not found for: {model_filename} in type {model_type}")
-        gallery_data = utils.fetch_civitai_data_by_hash(
+        gallery_data = await run_blocking(
+            utils.fetch_civitai_data_by_hash,
             model_hash,
             sort,
             limit,
@@ -184,6 +237,78 @@ async def fetch_data(request):
         return web.json_response({"status": "error", "message": str(e)}, status=500)
 
 
+@prompt_server.routes.get("/civitai_recipe_finder/fetch_data_stream")
+async def fetch_data_stream(request):
+    """
+    流式版本的 fetch_data：以 NDJSON 格式逐行返回，每解析完一页就发送一批已筛选的条目。
+    每一行是 {"type": "images", "images": [...]}，最后以 "done" 或 "error" 结束。
+    """
+    model_type, model_filename, sort, nsfw_level, filter_type = (
+        request.query.get("model_type"),
+        request.query.get("model_filename"),
+        request.query.get("sort"),
+        request.query.get("nsfw_level"),
+        request.query.get("filter_type"),
+    )
+    try:
+        limit = int(request.query.get("limit", 32))
+    except ValueError:
+        return web.json_response(
+            {"status": "error", "message": "Invalid limit"}, status=400
+        )
+
+    response = web.StreamResponse(
+        headers={"Content-Type": "application/x-ndjson", "Cache-Control": "no-store"}
+    )
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def producer():
+        try:
+            model_hash = utils.local_model_index.hash_for(model_type, model_filename)
+            if not model_hash:
+                raise FileNotFoundError(
+                    f"Model hash not found for: {model_filename} in type {model_type}"
+                )
+            batches = utils.stream_civitai_data_by_hash(
+                model_hash,
+                sort,
+                limit,
+                nsfw_level,
+                filter_type if filter_type != "all" else None,
+            )
+            try:
+                for batch in batches:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(
+                        queue.put_nowait, {"type": "images", "images": batch}
+                    )
+            finally:
+                batches.close()
+            message = {"type": "done"}
+        except Exception as e:
+            print(f"Error in fetch_data_stream: {e}")
+            message = {"type": "error", "message": str(e)}
+        loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    loop.run_in_executor(None, producer)
+    try:
+        while True:
+            message = await queue.get()
+            await response.write((json.dumps(message) + "\n").encode("utf-8"))
+            if message["type"] != "images":
+                break
+        await response.write_eof()
+    finally:
+        # 正常结束或客户端断开时，都通知后台线程停止获取
+        cancelled.set()
+    return response
+
+
 @prompt_server.routes.post("/civitai_recipe_finder/set_selection")
 async def set_selection(request):
     try:
@@ -193,15 +318,77 @@ async def set_selection(request):
             data.get("item"),
             data.get("download_image", False),
         )
-        selections = utils.load_selections()
-        selections[node_id] = {"item": item, "download_image": download_image}
-        utils.save_selections(selections)
-        utils.db_manager.set_setting("last_selection_time", time.time())
+        def store_selection():
+            selections = utils.load_selections()
+            selections[node_id] = {"item": item, "download_image": download_image}
+            utils.save_selections(selections)
+            utils.db_manager.set_setting("last_selection_time", time.time())
+
+        await run_blocking(store_selection)
         return web.json_response({"status": "ok"})
     except Exception as e:
         return web.json_response({"status": "error", "message": str(e)}, status=500)
 
 
+def _find_downloaded_image(clean_url):
+    """返回已下载到输出目录的原图路径，不存在时返回 None"""
+    image_record = utils.db_manager.get_image_by_url(clean_url)
+    if image_record and image_record["local_filename"]:
+        local_path = os.path.join(
+            folder_paths.get_output_directory(), image_record["local_filename"]
+        )
+        if os.path.exists(local_path):
+            return local_path
+    return None
+
+
+def _download_original(clean_url, ensure_image_ext=False):
+    """
+    流式下载原图/视频到输出目录：先分块写入以 URL 命名的临时文件（支持断点续传），
+    完成后原子重命名为最终文件名。返回最终文件路径。
+    """
+    output_dir = folder_paths.get_output_directory()
+    url_key = hashlib.sha1(clean_url.encode("utf-8")).hexdigest()[:16]
+    temp_path = os.path.join(output_dir, f".civitai_{url_key}.part")
+    content_type = utils.download_file_resumable(clean_url, temp_path) or "image/png"
+
+    base_filename = os.path.basename(urllib.parse.urlparse(clean_url).path)
+    sanitized_base = sanitize_filename(base_filename)
+    filename = f"civitai_{int(time.time())}_{sanitized_base}"
+    if ensure_image_ext and not any(
+        filename.lower().endswith(ext) for ext in [".png", ".jpg", ".jpeg", ".webp"]
+    ):
+        ext = "." + content_type.split("/")[-1] if "/" in content_type else ".png"
+        filename += ext
+
+    output_path = os.path.join(output_dir, filename)
+    os.replace(temp_path, output_path)
+    utils.db_manager.add_downloaded_image(url=clean_url, local_filename=filename)
+    return output_path
+
+
+_download_inflight = {}
+
+
+async def _download_original_once(clean_url, ensure_image_ext=False):
+    """同一原图的并发请求只下载一次，避免多个线程同时写入同一个临时文件"""
+    future = _download_inflight.get(clean_url)
+    if future is None:
+        future = asyncio.ensure_future(
+            run_blocking(_download_original, clean_url, ensure_image_ext)
+        )
+        _download_inflight[clean_url] = future
+        future.add_done_callback(lambda _: _download_inflight.pop(clean_url, None))
+    return await asyncio.shield(future)
+
+
+def _file_response(local_path):
+    """直接由 aiohttp 以 sendfile 方式返回本地文件，支持 Range 与条件请求"""
+    return web.FileResponse(
+        local_path, headers={"Cache-Control": f"private, max-age={ORIGINAL_FILE_MAX_AGE}"}
+    )
+
+
 @prompt_server.routes.post("/civitai_recipe_finder/save_original_image")
 async def save_original_image(request):
     try:
@@ -212,32 +399,17 @@ async def save_original_image(request):
                 {"status": "error", "message": "URL is missing"}, status=400
             )
         clean_url = re.sub(r"/(width|height|fit|quality|format)=\w+", "", image_url)
-        image_record = utils.db_manager.get_image_by_url(clean_url)
-        if image_record and image_record["local_filename"]:
-            local_path = os.path.join(
-                folder_paths.get_output_directory(), image_record["local_filename"]
+        local_path = await run_blocking(_find_downloaded_image, clean_url)
+        if local_path:
+            return web.json_response(
+                {
+                    "status": "exists",
+                    "message": f"Image already exists: {os.path.basename(local_path)}",
+                }
             )
-            if os.path.exists(local_path):
-                return web.json_response(
-                    {
-                        "status": "exists",
-                        "message": f"Image already exists: {image_record['local_filename']}",
-                    }
-                )
-        headers = {"User-Agent": "Mozilla/5.0"}
-        req = urllib.request.Request(clean_url, headers=headers)
-
-        base_filename = os.path.basename(urllib.parse.urlparse(clean_url).path)
-        sanitized_base = sanitize_filename(base_filename)
-        filename = f"civitai_{int(time.time())}_{sanitized_base}"
-
-        output_path = os.path.join(folder_paths.get_output_directory(), filename)
-        with (
-            urllib.request.urlopen(req, timeout=20) as response,
-            open(output_path, "wb") as f,
-        ):
-            f.write(response.read())
-        utils.db_manager.add_downloaded_image(url=clean_url, local_filename=filename)
+
+        output_path = await _download_original_once(clean_url, False)
+        filename = os.path.basename(output_path)
         return web.json_response(
             {"status": "ok", "message": f"Image saved as {filename}"}
         )
@@ -257,49 +429,170 @@ async def get_workflow_source(request):
         if not image_url:
             return web.Response(status=400, text="URL is missing")
         clean_url = re.sub(r"/(width|height|fit|quality|format)=\w+", "", image_url)
-        image_record = utils.db_manager.get_image_by_url(clean_url)
-        if image_record and image_record["local_filename"]:
-            local_path = os.path.join(
-                folder_paths.get_output_directory(), image_record["local_filename"]
-            )
-            if os.path.exists(local_path):
-                with open(local_path, "rb") as f:
-                    image_data = f.read()
-                ext = os.path.splitext(image_record["local_filename"])[1].lower()
-                content_type = {
-                    ".png": "image/png",
-                    ".jpg": "image/jpeg",
-                    ".jpeg": "image/jpeg",
-                    ".webp": "image/webp",
-                }.get(ext, "image/png")
-                return web.Response(body=image_data, content_type=content_type)
-        headers = {"User-Agent": "Mozilla/5.0"}
-        req = urllib.request.Request(clean_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=20) as response:
-            image_data = response.read()
-            content_type = response.headers.get("Content-Type", "image/png")
-        filename_base = os.path.basename(urllib.parse.urlparse(clean_url).path)
-        sanitized_base = sanitize_filename(filename_base)
-        filename = f"civitai_{int(time.time())}_{sanitized_base}"
-        if not any(
-            filename.lower().endswith(ext) for ext in [".png", ".jpg", ".jpeg", ".webp"]
-        ):
-            ext = "." + content_type.split("/")[-1] if "/" in content_type else ".png"
-            filename += ext
-        output_path = os.path.join(folder_paths.get_output_directory(), filename)
-        with open(output_path, "wb") as f:
-            f.write(image_data)
-        utils.db_manager.add_downloaded_image(url=clean_url, local_filename=filename)
-        return web.Response(body=image_data, content_type=content_type)
+        local_path = await run_blocking(_find_downloaded_image, clean_url)
+        if not local_path:
+            local_path = await _download_original_once(clean_url, True)
+        return _file_response(local_path)
     except Exception as e:
         return web.Response(status=500, text=str(e))
 
 
+_thumb_inflight = {}
+
+
+@prompt_server.routes.get("/civitai_utils/thumb")
+async def get_thumbnail(request):
+    """
+    Civitai 缩略图代理：优先从本地磁盘缓存返回，未命中时下载并缓存。
+    以缓存键作为 ETag，浏览器可长期缓存并用条件请求验证。
+    """
+    width = request.query.get("width")
+    if width:
+        try:
+            width = int(width)
+        except ValueError:
+            return web.Response(status=400, text="Invalid width")
+        if width <= 0:
+            return web.Response(status=400, text="Invalid width")
+        width = min(width, THUMB_MAX_WIDTH)
+    url = utils.thumb_cache.normalize_url(request.query.get("url", ""), width)
+    if not url:
+        return web.Response(status=400, text="Invalid or unsupported image URL")
+
+    key = utils.thumb_cache.key_for(url)
+    etag = f'"{key}"'
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={THUMB_MAX_AGE}, immutable",
+    }
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers=cache_headers)
+
+    try:
+        cached = await run_blocking(utils.thumb_cache.lookup, key)
+        if not cached:
+            # 同一缩略图的并发请求只下载一次
+            future = _thumb_inflight.get(key)
+            if future is None:
+                future = asyncio.ensure_future(
+                    run_blocking(utils.thumb_cache.fetch, key, url)
+                )
+                _thumb_inflight[key] = future
+                future.add_done_callback(lambda _: _thumb_inflight.pop(key, None))
+            cached = await asyncio.shield(future)
+        path, content_type = cached
+        return web.FileResponse(
+            path, headers={**cache_headers, "Content-Type": content_type}
+        )
+    except Exception as e:
+        print(f"[Civitai Toolkit] Thumbnail proxy error for {url}: {e}")
+        return web.Response(status=502, text=str(e))
+
+
+def _civitai_error_response(e):
+    """把上游 HTTP 错误原样转给前端，其余错误返回 502"""
+    upstream = getattr(e, "response", None)
+    if upstream is not None and upstream.status_code >= 400:
+        return web.Response(
+            status=upstream.status_code,
+            body=upstream.content,
+            content_type="application/json",
+        )
+    return web.json_response({"error": {"message": str(e)}}, status=502)
+
+
+def _domain_from_request(request):
+    network = request.query.get("network")
+    if network in ("com", "work"):
+        return f"civitai.{network}"
+    return utils._get_active_domain()
+
+
+@prompt_server.routes.get("/civitai_utils/models")
+async def search_civitai_models(request):
+    """/api/v1/models 的缓存代理，供模型浏览器使用"""
+    params = {}
+    for key in set(request.query.keys()) - {"network"}:
+        values = request.query.getall(key)
+        params[key] = values if len(values) > 1 else values[0]
+    try:
+        data = await run_blocking(
+            utils.CivitaiAPIUtils.search_models, params, _domain_from_request(request)
+        )
+        return web.json_response(data)
+    except Exception as e:
+        print(f"[Civitai Toolkit] Model search proxy error: {e}")
+        return _civitai_error_response(e)
+
+
+@prompt_server.routes.get("/civitai_utils/models/{model_id}")
+async def get_civitai_model(request):
+    """/api/v1/models/{id} 的缓存代理，结果同时写入 models 表"""
+    try:
+        model_id = int(request.match_info["model_id"])
+    except ValueError:
+        return web.json_response({"error": {"message": "Invalid model id"}}, status=400)
+    try:
+        data = await run_blocking(
+            utils.CivitaiAPIUtils.get_model_info_by_id,
+            model_id,
+            _domain_from_request(request),
+        )
+        if not data:
+            return web.json_response({"error": {"message": "Model not found"}}, status=404)
+        return web.json_response(data)
+    except Exception as e:
+        print(f"[Civitai Toolkit] Model details proxy error: {e}")
+        return _civitai_error_response(e)
+
+
+def _run_analytics(query, options):
+    filters = {
+        "lora_hash": analytics.resolve_local_hash("loras", options.get("lora")),
+        "checkpoint_hash": analytics.resolve_local_hash("checkpoints", options.get("checkpoint")),
+        "base_model": options.get("base_model") or None,
+        "source_type": options.get("source_type") or None,
+    }
+    top_n = max(1, min(100, int(options.get("top_n", 10))))
+    if query == "params":
+        return analytics.parameter_distribution(options.get("param", "cfg"), top_n, **filters)
+    if query == "co_used":
+        return analytics.co_used_loras(top_n, **filters)
+    if query == "companions":
+        return analytics.top_companions(
+            filters["lora_hash"], filters["checkpoint_hash"], top_n, options.get("kind") or None
+        )
+    if query == "overview":
+        return analytics.cache_overview()
+    raise ValueError(f"Unknown analytics query '{query}'.")
+
+
+@prompt_server.routes.get("/civitai_utils/analytics")
+async def get_cache_analytics(request):
+    """
+    对已缓存图片做跨模型统计，例如：
+    ?query=params&param=cfg&source_type=LORA&base_model=SDXL  SDXL LoRA 图库中最常用的 CFG
+    ?query=co_used&lora=<文件名或 SHA256>                      与该 LoRA 一起使用最多的 LoRA
+    ?query=companions&checkpoint=<文件名或 SHA256>&kind=lora    共现索引中与该模型最常搭配的资源
+    """
+    options = dict(request.query)
+    try:
+        result = await run_blocking(_run_analytics, options.pop("query", "overview"), options)
+        return web.json_response(result)
+    except ValueError as e:
+        return web.json_response({"error": {"message": str(e)}}, status=400)
+    except Exception as e:
+        print(f"[Civitai Toolkit] Analytics query error: {e}")
+        return web.json_response({"error": {"message": str(e)}}, status=500)
+
+
 @prompt_server.routes.get("/civitai_utils/get_config")
 async def get_config(request):
-    api_key = utils.db_manager.get_setting("civitai_api_key")
+    api_key = await run_blocking(utils.db_manager.get_setting, "civitai_api_key")
     config = {
-        "network_choice": utils.db_manager.get_setting("network_choice", "com"),
+        "network_choice": await run_blocking(
+            utils.db_manager.get_setting, "network_choice", "com"
+        ),
         "api_key_exists": bool(api_key)
     }
     return web.json_response(config)
@@ -310,9 +603,13 @@ async def set_config(request):
     try:
         data = await request.json()
         if "network_choice" in data:
-            utils.db_manager.set_setting("network_choice", data["network_choice"])
+            await run_blocking(
+                utils.db_manager.set_setting, "network_choice", data["network_choice"]
+            )
         if "api_key" in data:
-            utils.db_manager.set_setting("civitai_api_key", data["api_key"])
+            await run_blocking(
+                utils.db_manager.set_setting, "civitai_api_key", data["api_key"]
+            )
 
         return web.json_response({"status": "ok"})
     except Exception as e:
@@ -325,12 +622,11 @@ async def get_local_models(request):
     一个强大、统一的API，一次性获取所有处理好的模型数据。
     """
     try:
-        loop = asyncio.get_event_loop()
         force_refresh = request.query.get("force_refresh", "false").lower() == "true"
 
         # 将所有耗时的操作放入线程池，避免阻塞主服务器线程
-        models = await loop.run_in_executor(
-            None, utils.get_all_local_models_with_details, force_refresh
+        models = await run_blocking(
+            utils.get_all_local_models_with_details, force_refresh
         )
 
         return web.json_response({"status": "ok", "models": models})
@@ -347,14 +643,17 @@ async def get_local_hashes(request):
     """
     一个轻量级的API，仅返回数据库中所有本地文件的哈希列表。
     """
-    try:
+    def query_hashes():
         with utils.db_manager.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT hash FROM versions WHERE hash IS NOT NULL AND local_path IS NOT NULL"
             )
             # 使用集合推导式以获得最佳性能
-            hashes = {row["hash"] for row in cursor.fetchall()}
+            return {row["hash"] for row in cursor.fetchall()}
+
+    try:
+        hashes = await run_blocking(query_hashes)
         return web.json_response({"status": "ok", "hashes": list(hashes)})
     except Exception as e:
         print(f"[Civitai Utils] Error getting local hashes: {e}")
@@ -364,8 +663,16 @@ async def get_local_hashes(request):
 @prompt_server.routes.get("/civitai_utils/get_scan_status")
 async def get_scan_status(request):
     """用于查询后台扫描状态"""
-    is_complete = utils.db_manager.get_setting("initial_scan_complete", False)
-    return web.json_response({"status": "ok", "is_scanning": not is_complete})
+    is_complete = await run_blocking(
+        utils.db_manager.get_setting, "initial_scan_complete", False
+    )
+    return web.json_response(
+        {
+            "status": "ok",
+            "is_scanning": not is_complete,
+            "index": utils.local_model_index.status(),
+        }
+    )
 
 
 # --- WebSocket 部分 ---
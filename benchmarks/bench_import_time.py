@@ -0,0 +1,124 @@
+"""
+插件导入耗时检查（-X importtime 报告）。
+
+在子进程中以 `python -X importtime` 导入插件包（先导入 ComfyUI 自身会加载的 server / folder_paths /
+comfy.samplers 作为基线），解析导入记录，列出插件各模块与由插件引入的最重的依赖。
+同时作为回归检查：若导入插件时加载了应推迟到首次使用的重量级模块，或访问了数据库，则以非零状态退出。
+需要在 ComfyUI 的 Python 环境中运行：
+    python benchmarks/bench_import_time.py --comfyui /path/to/ComfyUI [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "civitai_toolkit_importcheck"
+MARKER = "--- civitai toolkit import starts ---"
+# 导入插件时不应加载的模块（ComfyUI 基线中已加载的除外）
+DEFERRED_MODULES = ("torch", "numpy", "PIL", "requests", "safetensors", "markdown_it", "tqdm")
+
+CHILD_SRC = """
+import asyncio, importlib.util, sys
+sys.path.insert(0, {comfyui!r})
+import server, folder_paths, comfy.samplers
+if getattr(server.PromptServer, "instance", None) is None:
+    server.PromptServer(asyncio.new_event_loop())
+baseline = set(sys.modules)
+print({marker!r}, file=sys.stderr, flush=True)
+spec = importlib.util.spec_from_file_location(
+    {package!r}, {init!r}, submodule_search_locations=[{root!r}]
+)
+package = importlib.util.module_from_spec(spec)
+sys.modules[{package!r}] = package
+spec.loader.exec_module(package)
+print({marker!r}, file=sys.stderr, flush=True)
+loaded = sorted(name for name in set(sys.modules) - baseline if name.split(".")[0] in {deferred!r})
+print("deferred-loaded:" + ",".join(loaded))
+print("schema-ready:" + str(package.utils.db_manager._schema_ready))
+"""
+
+
+def parse_importtime(stderr):
+    """返回标记之间的导入记录 [(模块名, 自身耗时 us, 累计耗时 us, 层级)]"""
+    records, inside = [], False
+    for line in stderr.splitlines():
+        if line.strip() == MARKER:
+            inside = not inside
+            continue
+        if not inside or not line.startswith("import time:"):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            records.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+        except ValueError:
+            continue
+    return records
+
+
+def parent_names(records):
+    """importtime 按完成顺序输出（子模块在前），父模块是其后第一条层级更浅的记录"""
+    parents = []
+    for i, (_, _, _, level) in enumerate(records):
+        parent = next((r[0] for r in records[i + 1 :] if r[3] < level), None)
+        parents.append(parent)
+    return parents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comfyui", default=os.environ.get("COMFYUI_PATH") or ".", help="ComfyUI 根目录")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    child = CHILD_SRC.format(
+        comfyui=os.path.abspath(args.comfyui),
+        marker=MARKER,
+        package=PACKAGE_NAME,
+        init=os.path.join(ROOT, "__init__.py"),
+        root=ROOT,
+        deferred=DEFERRED_MODULES,
+    )
+    try:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", child],
+            capture_output=True,
+            text=True,
+            cwd=args.comfyui,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        print(e.stderr[-4000:])
+        sys.exit(e.returncode)
+
+    records = parse_importtime(result.stderr)
+    total = sum(self_us for _, self_us, _, _ in records)
+    own = [r for r in records if r[0] == PACKAGE_NAME or r[0].startswith(PACKAGE_NAME + ".")]
+    own_names = {r[0] for r in own}
+    print(f"package import total      {total / 1000:>9.1f} ms  ({len(records)} modules)")
+    print("\nplugin modules (self / cumulative):")
+    for name, self_us, cumulative_us, _ in sorted(own, key=lambda r: -r[2]):
+        print(f"  {name.replace(PACKAGE_NAME, '<pkg>'):<28}{self_us / 1000:>8.1f} ms {cumulative_us / 1000:>9.1f} ms")
+    print(f"\nheaviest dependencies imported directly by the plugin (top {args.top}, cumulative):")
+    direct = [record for record, parent in zip(records, parent_names(records)) if record not in own and parent in own_names]
+    for name, _, cumulative_us, _ in sorted(direct, key=lambda r: -r[2])[: args.top]:
+        print(f"  {name:<28}{cumulative_us / 1000:>9.1f} ms")
+
+    output = dict(line.split(":", 1) for line in result.stdout.splitlines() if ":" in line)
+    deferred_loaded = [name for name in output.get("deferred-loaded", "").split(",") if name]
+    schema_ready = output.get("schema-ready") == "True"
+    print()
+    failures = []
+    if deferred_loaded:
+        failures.append(f"heavy modules imported at load time: {', '.join(sorted({n.split('.')[0] for n in deferred_loaded}))}")
+    if schema_ready:
+        failures.append("database schema was initialized during import")
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK    no deferred modules or database access during import")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+节点注册（INPUT_TYPES）时模型下拉列表的耗时基准。
+
+在临时目录中生成一个合成模型库（默认 20000 个空文件：LoRA 与 Checkpoint 按 3:1 分布在多级子文件夹中），
+写入临时数据库后对比：
+  - 旧做法：每次把整个文件列表经 get_full_path 反向映射为绝对路径，再与数据库中的路径对照；
+  - 相对路径索引的单次查询（缓存失效后的首次请求）；
+  - ModelListProvider 的缓存命中；
+  - 全部节点的 INPUT_TYPES（object_info 请求时 ComfyUI 对每个节点调用一次）。
+需要在 ComfyUI 的 Python 环境中运行，不会修改插件自身的数据库与 ComfyUI 的模型目录：
+    python benchmarks/bench_model_lists.py --comfyui /path/to/ComfyUI [--files N] [--repeat N]
+"""
+import argparse
+import asyncio
+import hashlib
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "civitai_toolkit_bench"
+
+
+def load_package(comfyui_path):
+    if comfyui_path:
+        sys.path.insert(0, comfyui_path)
+    import server
+
+    if getattr(server.PromptServer, "instance", None) is None:
+        server.PromptServer(asyncio.new_event_loop())
+    # 只注册包对象而不执行 __init__.py，避免启动后台扫描
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [ROOT]
+    sys.modules[PACKAGE_NAME] = package
+    return importlib.import_module(f"{PACKAGE_NAME}.utils")
+
+
+def build_library(base, count):
+    """生成合成模型库，返回 {模型类型: [相对路径]}"""
+    library = {"loras": [], "checkpoints": []}
+    for i in range(count):
+        model_type = "checkpoints" if i % 4 == 0 else "loras"
+        relative_path = os.path.join(f"group_{i % 40}", f"sub_{i % 7}", f"model_{i:06d}.safetensors")
+        full_path = os.path.join(base, model_type, relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path, "wb").close()
+        library[model_type].append(relative_path)
+    return library
+
+
+def register_folders(folder_paths, base):
+    extensions = set(getattr(folder_paths, "supported_pt_extensions", {".safetensors"}))
+    for model_type in ("loras", "checkpoints"):
+        folder_paths.folder_names_and_paths[model_type] = ([os.path.join(base, model_type)], extensions)
+    for cache_name in ("filename_list_cache",):
+        cache = getattr(folder_paths, cache_name, None)
+        if isinstance(cache, dict):
+            cache.clear()
+
+
+def populate_db(utils, base, library):
+    rows = []
+    for model_type, relative_paths in library.items():
+        for relative_path in relative_paths:
+            rows.append(
+                (
+                    hashlib.sha256(f"{model_type}/{relative_path}".encode()).hexdigest(),
+                    os.path.join(base, model_type, relative_path),
+                    0.0,
+                    os.path.basename(relative_path),
+                    model_type,
+                    relative_path,
+                    0,
+                )
+            )
+    with utils.db_manager.get_connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO versions (hash, local_path, local_mtime, name, model_type, relative_path, base_folder_index)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+    for model_type in library:
+        utils._mark_relative_paths_valid(model_type)
+
+
+def legacy_model_list(utils, folder_paths, model_type):
+    """旧版 get_model_filenames_from_db_cached_only 的反向映射"""
+    with utils.db_manager.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT local_path FROM versions WHERE model_type = ? AND local_path IS NOT NULL ORDER BY local_path ASC",
+            (model_type,),
+        ).fetchall()
+    full_path_map = {
+        os.path.normpath(folder_paths.get_full_path(model_type, f)): f
+        for f in folder_paths.get_filename_list(model_type)
+    }
+    return sorted(
+        {full_path_map[p] for (local_path,) in rows if (p := os.path.normpath(local_path)) in full_path_map}
+    )
+
+
+def timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comfyui", default=os.environ.get("COMFYUI_PATH"), help="ComfyUI 根目录")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    utils = load_package(args.comfyui)
+    folder_paths = utils.folder_paths
+    workdir = tempfile.mkdtemp(prefix="civitai_bench_")
+    try:
+        base = os.path.join(workdir, "models")
+        started = time.perf_counter()
+        library = build_library(base, args.files)
+        register_folders(folder_paths, base)
+        # 使用临时数据库，不影响插件自身的数据
+        utils.db_manager.db_path = os.path.join(workdir, "bench.db")
+        populate_db(utils, base, library)
+        print(f"library: {args.files} files ({len(library['loras'])} loras) built in {time.perf_counter() - started:.1f}s")
+
+        nodes = importlib.import_module(f"{PACKAGE_NAME}.nodes")
+        provider = utils.model_list_provider
+
+        def cold_lists():
+            provider.invalidate()
+            return [provider.get(model_type) for model_type in library]
+
+        def all_input_types():
+            for node_class in nodes.NODE_CLASS_MAPPINGS.values():
+                node_class.INPUT_TYPES()
+
+        def cold_input_types():
+            provider.invalidate()
+            all_input_types()
+
+        legacy, legacy_result = timed(
+            lambda: [legacy_model_list(utils, folder_paths, model_type) for model_type in library], args.repeat
+        )
+        cold, cold_result = timed(cold_lists, args.repeat)
+        warm_repeat = 10000
+        provider.get("loras")
+        warm, _ = timed(lambda: provider.get("loras"), warm_repeat)
+        cold_nodes, _ = timed(cold_input_types, args.repeat)
+        all_input_types()
+        warm_nodes, _ = timed(all_input_types, 100)
+
+        print(f"{'legacy reverse mapping':<28}{legacy * 1000:>10.1f} ms")
+        print(f"{'indexed query (cold)':<28}{cold * 1000:>10.1f} ms")
+        print(f"{'provider hit':<28}{warm * 1e6:>10.2f} us")
+        print(f"{'all INPUT_TYPES (cold)':<28}{cold_nodes * 1000:>10.1f} ms   ({len(nodes.NODE_CLASS_MAPPINGS)} nodes)")
+        print(f"{'all INPUT_TYPES (warm)':<28}{warm_nodes * 1000:>10.3f} ms")
+        print(f"{'results identical':<28}{legacy_result == cold_result!s:>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
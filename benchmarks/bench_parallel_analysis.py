@@ -0,0 +1,174 @@
+"""
+模型分析器串行与进程池模式的对比基准。
+
+语料取自 data/civitai_helper.db 中 images 表缓存的 meta，不足时用合成 meta 补齐；
+meta 按 100 条一片（与 /api/v1/images 每页条目数相同）分片后分别用两种模式计算并合并部分结果。
+用法：
+    python benchmarks/bench_parallel_analysis.py [--db PATH] [--count N] [--workers N] [--repeat N]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARD_SIZE = 100
+
+
+def load_core():
+    # 与进程池子进程相同的独立模块名加载，保证提交的函数可以被子进程找到
+    spec = importlib.util.spec_from_file_location(
+        "civitai_toolkit_standalone", os.path.join(ROOT, "standalone.py")
+    )
+    standalone = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = standalone
+    spec.loader.exec_module(standalone)
+    standalone.load_standalone_modules(standalone.standalone_modules(ROOT))
+    return sys.modules[standalone.STANDALONE_NAMES["analysis_core.py"]]
+
+
+def load_metas(db_path, count):
+    metas = []
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                "SELECT meta FROM images WHERE meta IS NOT NULL LIMIT ?", (count,)
+            ).fetchall()
+        finally:
+            conn.close()
+        for (meta_str,) in rows:
+            try:
+                meta = json.loads(meta_str)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(meta, dict):
+                metas.append(meta)
+    return metas
+
+
+def synthetic_metas(count, seed=0):
+    rng = random.Random(seed)
+    words = [
+        "masterpiece", "best quality", "1girl", "solo", "long hair", "blue eyes",
+        "smile", "outdoors", "sky", "cinematic lighting", "detailed background",
+        "red dress", "looking at viewer", "upper body", "night", "city lights",
+    ] + [f"tag{i}" for i in range(400)]
+
+    def prompt(n):
+        parts = []
+        for _ in range(n):
+            word = rng.choice(words)
+            parts.append(f"({word}:{rng.choice(['0.9', '1.1', '1.2'])})" if rng.random() < 0.2 else word)
+        return ", ".join(parts)
+
+    metas = []
+    for _ in range(count):
+        metas.append(
+            {
+                "prompt": prompt(rng.randint(15, 60)),
+                "negativePrompt": prompt(rng.randint(5, 25)),
+                "sampler": rng.choice(["Euler a", "DPM++ 2M Karras", "DPM++ SDE"]),
+                "steps": rng.choice([20, 25, 30]),
+                "cfgScale": rng.choice([5, 6, 7]),
+                "Size": rng.choice(["832x1216", "1024x1024"]),
+                "civitaiResources": [
+                    {"type": "lora", "modelVersionId": rng.randint(1, 50), "weight": rng.choice([0.6, 0.8, 1.0])}
+                    for _ in range(rng.randint(0, 3))
+                ],
+                "resources": [
+                    {"type": "lora", "name": f"lora_{rng.randint(1, 80)}", "weight": rng.random()}
+                    for _ in range(rng.randint(0, 2))
+                ],
+            }
+        )
+    return metas
+
+
+def worker_rss_mb(core):
+    """各子进程的常驻内存（MB），读取 /proc，非 Linux 平台返回空列表"""
+    pool = core._pool
+    sizes = []
+    for pid in sorted(getattr(pool, "_processes", None) or {}):
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, ValueError):
+            continue
+        sizes.append(rss_kb / 1024)
+    return sizes
+
+
+def timed(func, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=os.path.join(ROOT, "data", "civitai_helper.db"))
+    parser.add_argument("--count", type=int, default=1000, help="参与分析的 meta 数")
+    parser.add_argument("--workers", type=int, default=None, help="进程池大小（默认与插件相同）")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    core = load_core()
+    if args.workers:
+        core.ANALYSIS_MAX_WORKERS = args.workers
+
+    metas = load_metas(args.db, args.count)
+    recorded = len(metas)
+    metas += synthetic_metas(args.count - recorded)
+    shards = [metas[i : i + SHARD_SIZE] for i in range(0, len(metas), SHARD_SIZE)]
+    resources = {
+        vid: {
+            "version_id": vid,
+            "sha256": f"{vid:064x}",
+            "autov2": None,
+            "model_id": vid * 10,
+            "type": "LORA",
+            "name": f"LoRA {vid}",
+        }
+        for vid in range(1, 51)
+    }
+    lora_map = {f"lora_{i}.safetensors": f"{i:064x}" for i in range(1, 81)}
+    print(
+        f"Corpus: {len(metas)} metas ({recorded} recorded, {len(metas) - recorded} synthetic), "
+        f"{len(shards)} shards, {core.ANALYSIS_MAX_WORKERS} workers, "
+        f"auto mode would pick {'parallel' if core.use_parallel_analysis(shards) else 'serial'}\n"
+    )
+
+    serial_time, serial_partials = timed(
+        lambda: core.compute_partials(shards, lora_map, resources, parallel=False), args.repeat
+    )
+    # 提交与进程数相同的分片，使所有子进程都在计时内启动
+    start = time.perf_counter()
+    core.compute_partials(
+        [shards[0]] * core.ANALYSIS_MAX_WORKERS, lora_map, resources, parallel=True
+    )
+    startup = time.perf_counter() - start
+    rss = worker_rss_mb(core)
+    parallel_time, parallel_partials = timed(
+        lambda: core.compute_partials(shards, lora_map, resources, parallel=True), args.repeat
+    )
+    merge_time, _ = timed(lambda: core.merge_partials(serial_partials), args.repeat)
+
+    print(f"serial              {serial_time * 1000:9.1f} ms")
+    print(f"parallel (warm)     {parallel_time * 1000:9.1f} ms   speedup x{serial_time / parallel_time:.2f}")
+    print(f"pool startup        {startup * 1000:9.1f} ms   (once per ComfyUI session)")
+    if rss:
+        print(f"worker RSS          {sum(rss) / len(rss):9.1f} MB   (avg of {len(rss)} workers)")
+    print(f"merge partials      {merge_time * 1000:9.1f} ms")
+    print(f"results identical   {serial_partials == parallel_partials}")
+
+
+if __name__ == "__main__":
+    main()
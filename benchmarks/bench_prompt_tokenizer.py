@@ -0,0 +1,124 @@
+"""
+提示词分词器微基准：对比旧的正则切分 (_parse_prompts) 与 prompt_tokenizer。
+
+语料取自 data/civitai_helper.db 中 images 表缓存的 meta；数据库不存在或为空时使用合成语料。
+用法：
+    python benchmarks/bench_prompt_tokenizer.py [--db PATH] [--limit N] [--repeat N]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(name, filename):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_parse_prompts(prompt_text):
+    """原 CivitaiAPIUtils._parse_prompts 的实现（每次调用都编译正则）"""
+    if not isinstance(prompt_text, str) or not prompt_text.strip():
+        return []
+    pattern = re.compile(r"\(.+?:\d+\.\d+\)|<[^>]+>|\[[^\]]+\]|\([^)]+\)|[^,]+")
+    tags = pattern.findall(prompt_text)
+    return [tag.strip() for tag in tags if tag.strip()]
+
+
+def load_corpus(db_path, limit):
+    prompts = []
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                "SELECT meta FROM images WHERE meta IS NOT NULL LIMIT ?", (limit,)
+            ).fetchall()
+        finally:
+            conn.close()
+        for (meta_str,) in rows:
+            try:
+                meta = json.loads(meta_str)
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(meta, dict):
+                continue
+            for field in ("prompt", "negativePrompt"):
+                if isinstance(meta.get(field), str) and meta[field].strip():
+                    prompts.append(meta[field])
+    return prompts
+
+
+def synthetic_corpus(size, seed=0):
+    rng = random.Random(seed)
+    words = [
+        "masterpiece", "best quality", "1girl", "solo", "long hair", "blue eyes",
+        "smile", "outdoors", "sky", "cinematic lighting", "detailed background",
+        "red dress", "looking at viewer", "upper body", "night", "city lights",
+    ]
+
+    def tag():
+        word = rng.choice(words)
+        roll = rng.random()
+        if roll < 0.15:
+            return f"({word}:{rng.choice(['0.8', '1.1', '1.2', '1.3'])})"
+        if roll < 0.25:
+            return f"(({word}))"
+        if roll < 0.3:
+            return f"[{word}]"
+        if roll < 0.35:
+            return f"<lora:{word.replace(' ', '_')}:{rng.choice(['0.6', '0.8', '1'])}>"
+        return word
+
+    prompts = []
+    for _ in range(size):
+        parts = [tag() for _ in range(rng.randint(8, 40))]
+        if rng.random() < 0.2:
+            parts.insert(rng.randint(0, len(parts)), "BREAK")
+        prompts.append(", ".join(parts))
+    return prompts
+
+
+def bench(name, func, prompts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for prompt in prompts:
+            func(prompt)
+        best = min(best, time.perf_counter() - start)
+    distinct = len(Counter(tag for prompt in prompts for tag in func(prompt)))
+    print(
+        f"{name:<22} {best * 1000:9.1f} ms  {len(prompts) / best:12.0f} prompts/s  {distinct:8d} distinct tags"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=os.path.join(ROOT, "data", "civitai_helper.db"))
+    parser.add_argument("--limit", type=int, default=5000, help="最多读取的图片条目数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tokenizer = load_module("prompt_tokenizer", "prompt_tokenizer.py")
+    prompts = load_corpus(args.db, args.limit)
+    source = f"{args.db} (images table)"
+    if not prompts:
+        prompts = synthetic_corpus(args.limit)
+        source = "synthetic corpus"
+    print(f"Corpus: {len(prompts)} prompts from {source}, best of {args.repeat} runs\n")
+
+    bench("legacy _parse_prompts", legacy_parse_prompts, prompts, args.repeat)
+    bench("parse_prompt_tags", tokenizer.parse_prompt_tags, prompts, args.repeat)
+    bench("tokenize_prompt", tokenizer.tokenize_prompt, prompts, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
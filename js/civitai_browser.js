@@ -38,8 +38,7 @@ async function fetchModelDetails(modelId) {
     if (browserState.isLoading) return;
     browserState.isLoading = true;
     try {
-        const baseUrl = `https://civitai.${browserState.network}/api/v1/models/${modelId}`;
-        const response = await fetch(baseUrl);
+        const response = await api.fetchApi(`/civitai_utils/models/${modelId}?network=${browserState.network}`);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -50,6 +49,11 @@ async function fetchModelDetails(modelId) {
 }
 
 // --- 渲染图片画廊和默认信息面板的辅助函数 ---
+// 通过后端缩略图缓存代理加载 Civitai 图片
+function thumbnailUrl(url, width) {
+    return api.apiURL(`/civitai_utils/thumb?url=${encodeURIComponent(url)}&width=${width}`);
+}
+
 function renderVersionDetails(modelData, versionId, galleryContainer, infoContainer) {
     const version = modelData.modelVersions.find(v => v.id == versionId);
     if (!version) return;
@@ -63,7 +67,7 @@ function renderVersionDetails(modelData, versionId, galleryContainer, infoContai
             const item = document.createElement('div');
             item.className = 'gallery-item';
             const img = document.createElement('img');
-            img.src = image.url.replace('/width=dpr', '/width=450');
+            img.src = thumbnailUrl(image.url, 450);
             img.loading = 'lazy';
             img.onclick = () => { // 点击图片，在右侧显示Prompt
                 galleryContainer.querySelectorAll('.gallery-item.selected').forEach(i => i.classList.remove('selected'));
@@ -317,7 +321,7 @@ function createCivitaiCard(model) {
         } else {
             const img = document.createElement('img');
             img.className = 'browser-preview-img';
-            img.src = mediaUrl;
+            img.src = thumbnailUrl(mediaUrl, 450);
             img.alt = model.name;
             img.loading = 'lazy';
             img.onload = () => { placeholder.style.display = 'none'; };
@@ -358,8 +362,8 @@ async function fetchCivitaiModels(container, isLoadMore = false) {
         if (isLoadMore && browserState.nextCursor) {
             params.append('cursor', browserState.nextCursor);
         }
-        const baseUrl = `https://civitai.${browserState.network}/api/v1/models`;
-        const response = await fetch(`${baseUrl}?${params.toString()}`);
+        params.append('network', browserState.network);
+        const response = await api.fetchApi(`/civitai_utils/models?${params.toString()}`);
         if (!response.ok) {
             const errorData = await response.json();
             throw new Error(`HTTP error! status: ${response.status} - ${errorData?.error?.message || 'Unknown API error'}`);
@@ -2,6 +2,11 @@ import { app } from "/scripts/app.js";
 import { api } from "/scripts/api.js";
 
 
+// 通过后端缩略图缓存代理加载 Civitai 图片
+function thumbnailUrl(url, width) {
+    return api.apiURL(`/civitai_utils/thumb?url=${encodeURIComponent(url)}&width=${width}`);
+}
+
 function setupGlobalLightbox() {
     if (document.getElementById('civitai-gallery-lightbox')) return;
 
@@ -110,49 +115,65 @@ app.registerExtension({
                 grid.style.height = `${Math.max(...columnHeights)}px`;
             };
 
-            // [修改] 渲染函数不再需要自己做筛选
-            const renderGalleryImages = (images) => {
+            // 画廊状态：支持按批次追加（流式加载）
+            const galleryState = { total: 0, processed: 0, loaded: 0, finished: false, observer: null };
+
+            const updateGalleryStatus = () => {
                 const grid = widget.element.querySelector('.civitai-gallery-masonry');
                 const statusSpan = widget.element.querySelector('.status');
+                if (!grid || !galleryState.finished || galleryState.processed !== galleryState.total) return;
+
+                requestAnimationFrame(() => {
+                    rebuildMasonryLayout(grid);
+                });
+                statusSpan.textContent = `Displayed ${galleryState.loaded} of ${galleryState.total} items.`;
+                if (!selectedImageData) {
+                    const firstVisibleItem = grid.querySelector('.civitai-gallery-item:not([style*="display: none"])');
+                    if (firstVisibleItem) {
+                        firstVisibleItem.click();
+                    }
+                }
+            };
+
+            const resetGallery = () => {
+                const grid = widget.element.querySelector('.civitai-gallery-masonry');
                 const saveBtn = widget.element.querySelector('.save-btn');
                 const loadWorkflowBtn = widget.element.querySelector('.load-workflow-btn');
                 if (!grid) return;
 
                 grid.innerHTML = "";
+                grid.style.height = "0px";
                 selectedImageData = null;
                 saveBtn.disabled = true;
                 loadWorkflowBtn.disabled = true;
-
-                if (!images || images.length === 0) {
-                    statusSpan.textContent = 'No items found matching your criteria.';
-                    rebuildMasonryLayout(grid);
-                    return;
+                Object.assign(galleryState, { total: 0, processed: 0, loaded: 0, finished: false });
+                if (!galleryState.observer) {
+                    galleryState.observer = new ResizeObserver(() => rebuildMasonryLayout(grid));
+                    galleryState.observer.observe(grid);
                 }
+            };
 
-                let processedImages = 0;
-                let successfulLoads = 0;
-
-                const checkCompletion = () => {
-                    if (processedImages === images.length) {
-
-                        requestAnimationFrame(() => {
-                            rebuildMasonryLayout(grid);
-                        });
-                        statusSpan.textContent = `Displayed ${successfulLoads} of ${images.length} items.`;
-                        const firstVisibleItem = grid.querySelector('.civitai-gallery-item:not([style*="display: none"])');
-                        if (firstVisibleItem) {
-                            firstVisibleItem.click();
-                        }
-                    }
+            // 追加一批已筛选的条目，每个媒体加载完成后立即重新排布
+            const appendGalleryImages = (images) => {
+                const grid = widget.element.querySelector('.civitai-gallery-masonry');
+                const saveBtn = widget.element.querySelector('.save-btn');
+                const loadWorkflowBtn = widget.element.querySelector('.load-workflow-btn');
+                if (!grid || !images || images.length === 0) return;
+
+                galleryState.total += images.length;
+                let layoutScheduled = false;
+                const scheduleLayout = () => {
+                    if (layoutScheduled) return;
+                    layoutScheduled = true;
+                    requestAnimationFrame(() => { layoutScheduled = false; rebuildMasonryLayout(grid); });
                 };
 
-                // 直接遍历后端返回的已筛选数组
                 images.forEach(imgData => {
                     const item = document.createElement('div');
                     item.className = 'civitai-gallery-item';
 
                     let mediaElement;
-                    const onMediaProcessed = () => { processedImages++; checkCompletion(); };
+                    const onMediaProcessed = () => { galleryState.processed++; scheduleLayout(); updateGalleryStatus(); };
 
                     if (imgData.type === 'video') {
                         mediaElement = document.createElement('video');
@@ -160,7 +181,7 @@ app.registerExtension({
                         mediaElement.muted = true;
                         mediaElement.loop = true;
                         mediaElement.playsinline = true;
-                        mediaElement.onloadedmetadata = () => { successfulLoads++; onMediaProcessed(); };
+                        mediaElement.onloadedmetadata = () => { galleryState.loaded++; onMediaProcessed(); };
                         mediaElement.onerror = () => {
                             console.error("Civitai Recipe Gallery: Failed to load video:", imgData.url);
                             item.remove(); onMediaProcessed();
@@ -169,8 +190,8 @@ app.registerExtension({
                         item.addEventListener('mouseleave', () => mediaElement.pause());
                     } else {
                         mediaElement = document.createElement('img');
-                        mediaElement.src = imgData.url.replace(/\/(width|height)=\d+/g, '/width=300');
-                        mediaElement.onload = () => { successfulLoads++; onMediaProcessed(); };
+                        mediaElement.src = thumbnailUrl(imgData.url, 300);
+                        mediaElement.onload = () => { galleryState.loaded++; onMediaProcessed(); };
                         mediaElement.onerror = () => {
                             console.error("Civitai Recipe Gallery: Failed to load image:", imgData.url);
                             item.remove(); onMediaProcessed();
@@ -218,7 +239,62 @@ app.registerExtension({
                         lightbox.style.display = 'flex';
                     });
                 });
-                new ResizeObserver(() => rebuildMasonryLayout(grid)).observe(grid);
+            };
+
+            const finishGallery = () => {
+                const grid = widget.element.querySelector('.civitai-gallery-masonry');
+                const statusSpan = widget.element.querySelector('.status');
+                galleryState.finished = true;
+                if (galleryState.total === 0) {
+                    statusSpan.textContent = 'No items found matching your criteria.';
+                    rebuildMasonryLayout(grid);
+                    return;
+                }
+                updateGalleryStatus();
+            };
+
+            const renderGalleryImages = (images) => {
+                resetGallery();
+                appendGalleryImages(images);
+                finishGallery();
+            };
+
+            // 读取 NDJSON 流：每解析完一页就立即渲染该批条目
+            const streamGalleryImages = async (params) => {
+                const statusSpan = widget.element.querySelector('.status');
+                const response = await api.fetchApi(`/civitai_recipe_finder/fetch_data_stream?${params}`, { cache: "no-store" });
+                if (!response.ok) throw new Error(`HTTP Error: ${response.status}`);
+                if (!response.body) {
+                    throw new Error("Streaming is not supported by this browser.");
+                }
+
+                resetGallery();
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = "";
+                const handleLine = (line) => {
+                    if (!line.trim()) return;
+                    const message = JSON.parse(line);
+                    if (message.type === "images") {
+                        appendGalleryImages(message.images);
+                        statusSpan.textContent = `Loading... ${galleryState.total} items received.`;
+                    } else if (message.type === "error") {
+                        throw new Error(message.message);
+                    }
+                };
+
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    let newlineIndex;
+                    while ((newlineIndex = buffer.indexOf("\n")) >= 0) {
+                        handleLine(buffer.slice(0, newlineIndex));
+                        buffer = buffer.slice(newlineIndex + 1);
+                    }
+                }
+                handleLine(buffer);
+                finishGallery();
             };
 
             const bindButtonEvents = () => {
@@ -248,13 +324,7 @@ app.registerExtension({
                             filter_type: filterTypeWidget.value
                         });
 
-                        const response = await api.fetchApi(`/civitai_recipe_finder/fetch_data?${params}`, { cache: "no-store" });
-                        if(!response.ok) throw new Error(`HTTP Error: ${response.status}`);
-                        const data = await response.json();
-                        if(data.status !== "ok") throw new Error(data.message);
-
-                        statusSpan.textContent = 'Data received. Rendering...';
-                        renderGalleryImages(data.images);
+                        await streamGalleryImages(params);
                     } catch (e) {
                         statusSpan.textContent = `Error: ${e.message}`;
                         renderGalleryImages([]);
@@ -0,0 +1,176 @@
+import difflib
+import re
+
+# =================================================================================
+# 本地模型名称索引
+# meta 中的 LoRA 名称写法各异：带或不带子文件夹、大小写不同、扩展名不同（.pt / .ckpt）、
+# 带版本后缀（_v1.5、-v2）或使用 Civitai 上的原始文件名。索引把每个本地文件登记在多个
+# 规范化的键下，查询时按精确到宽松的顺序逐级查找，每级都是一次字典查询；
+# 全部未命中时才做模糊匹配，结果会被缓存。
+# 宽松键与模糊匹配只在候选唯一且版本后缀一致时采用，模糊匹配还要求词数相同，
+# 避免 "detail_tweaker_xl"、"add_detail_v2" 之类的名称被错认为另一个模型。
+# 本模块不依赖 ComfyUI 或数据库，可在分析子进程中直接加载。
+# =================================================================================
+
+MODEL_EXTENSIONS = (".safetensors", ".ckpt", ".pt", ".pth", ".bin", ".sft", ".gguf")
+FUZZY_CUTOFF = 0.85  # 模糊匹配的最低相似度
+FUZZY_CACHE_SIZE = 10000
+
+_VERSION_SUFFIX_RE = re.compile(r"[\s_\-.]*v(?:er(?:sion)?)?[\s_\-.]*\d+(?:[._]\d+)*$", re.IGNORECASE)
+_SEPARATOR_RE = re.compile(r"[\s_\-.]+")
+# 按分隔符、大小写边界与数字切词："DetailTweakerXL" → Detail / Tweaker / XL
+_WORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+|[^\W\d_]+")
+
+
+def normalize_path(name):
+    """大小写折叠、统一路径分隔符并去掉模型扩展名"""
+    name = name.strip().replace("\\", "/").casefold()
+    for ext in MODEL_EXTENSIONS:
+        if name.endswith(ext):
+            return name[: -len(ext)]
+    return name
+
+
+def basename_key(name):
+    return normalize_path(name).rsplit("/", 1)[-1]
+
+
+def _stem(name):
+    """去掉子文件夹与模型扩展名，保留大小写"""
+    name = name.strip().replace("\\", "/").rsplit("/", 1)[-1]
+    for ext in MODEL_EXTENSIONS:
+        if name.lower().endswith(ext):
+            return name[: -len(ext)]
+    return name
+
+
+def version_suffix(name):
+    """版本后缀中的数字，例如 "anime-lineart_v2.1" → "2.1"；没有版本后缀时返回空字符串"""
+    match = _VERSION_SUFFIX_RE.search(basename_key(name))
+    return ".".join(re.findall(r"\d+", match.group())) if match else ""
+
+
+def word_count(name):
+    """去掉版本后缀后的词数"""
+    stem = _stem(name)
+    return len(_WORD_RE.findall(_VERSION_SUFFIX_RE.sub("", stem) or stem))
+
+
+def loose_key(name):
+    """去掉版本后缀与所有分隔符的宽松键，例如 "Detail-Tweaker_v1.5" → "detailtweaker" """
+    stem = basename_key(name)
+    stem = _VERSION_SUFFIX_RE.sub("", stem) or stem
+    return _SEPARATOR_RE.sub("", stem)
+
+
+class NameIndex(dict):
+    """
+    相对路径 → 哈希的字典（与 get_local_model_maps 返回的映射相同），附带规范化的名称索引。
+    aliases 为 {别名: 哈希}，例如 Civitai 上的原始文件名或模型名称，优先级低于本地文件名。
+    """
+
+    def __init__(self, filename_to_hash=None, aliases=None):
+        super().__init__(filename_to_hash or {})
+        self.aliases = dict(aliases or {})
+        self._levels = None
+        self._loose_keys = None
+        self._fuzzy_cache = {}
+
+    def _build(self):
+        path_keys, basename_keys, alias_keys, loose_keys = {}, {}, {}, {}
+        # 同名文件位于不同子文件夹时，较短（层级较浅）的路径优先
+        for filename in sorted(self, key=lambda f: (f.count("/") + f.count("\\"), f)):
+            file_hash = self[filename]
+            path_keys.setdefault(normalize_path(filename), file_hash)
+            basename_keys.setdefault(basename_key(filename), file_hash)
+            self._add_loose(loose_keys, filename, file_hash)
+        for alias, file_hash in self.aliases.items():
+            alias_keys.setdefault(basename_key(alias), file_hash)
+            self._add_loose(loose_keys, alias, file_hash)
+        loose_keys.pop("", None)
+        self._levels = [
+            (normalize_path, path_keys),
+            (basename_key, basename_keys),
+            (basename_key, alias_keys),
+        ]
+        self._loose_keys = loose_keys
+
+    @staticmethod
+    def _add_loose(loose_keys, name, file_hash):
+        # 宽松键 → [(哈希, 原名称)]，同一宽松键下可能有多个模型；版本与词数在命中时才计算
+        loose_keys.setdefault(loose_key(name), []).append((file_hash, name))
+
+    @staticmethod
+    def _pick(name, entries, match_words):
+        """
+        在宽松候选中选出唯一的哈希。查询名带版本后缀时只接受版本相同的候选；
+        match_words 为真时还要求词数相同。候选不唯一时返回 None。
+        """
+        version = version_suffix(name)
+        words = word_count(name) if match_words else None
+        hashes = {
+            file_hash
+            for file_hash, entry_name in entries
+            if (not version or version_suffix(entry_name) == version)
+            and (words is None or word_count(entry_name) == words)
+        }
+        return hashes.pop() if len(hashes) == 1 else None
+
+    def resolve(self, name, fuzzy=True):
+        """返回名称对应的本地文件哈希，找不到时返回 None"""
+        if not name or not isinstance(name, str):
+            return None
+        if name in self:
+            return self[name]
+        if self._levels is None:
+            self._build()
+        for normalize, keys in self._levels:
+            file_hash = keys.get(normalize(name))
+            if file_hash:
+                return file_hash
+        entries = self._loose_keys.get(loose_key(name))
+        if entries:
+            # 宽松键已命中但候选不唯一或版本不符时不再做模糊匹配
+            return self._pick(name, entries, match_words=False)
+        return self._fuzzy(name) if fuzzy else None
+
+    def _fuzzy(self, name):
+        """在宽松键中做相似度匹配，达到阈值的候选中版本与词数相符的只有一个模型时才采用"""
+        key = loose_key(name)
+        cache_key = (key, version_suffix(name), word_count(name))
+        if cache_key in self._fuzzy_cache:
+            return self._fuzzy_cache[cache_key]
+        loose_keys = self._loose_keys
+        matches = (
+            difflib.get_close_matches(key, loose_keys, n=max(1, len(loose_keys)), cutoff=FUZZY_CUTOFF)
+            if key
+            else []
+        )
+        result = self._pick(name, [entry for match in matches for entry in loose_keys[match]], match_words=True)
+        if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[cache_key] = result
+        return result
+
+    def __reduce__(self):
+        # 传给分析子进程时只序列化映射与别名，索引在子进程中按需重建
+        return (self.__class__, (dict(self), self.aliases))
+
+
+_last_index = (None, None)
+
+
+def as_name_index(filename_to_hash):
+    """把普通的 文件名 → 哈希 字典包装为 NameIndex；同一个字典连续调用时复用已建好的索引"""
+    global _last_index
+    if isinstance(filename_to_hash, NameIndex):
+        return filename_to_hash
+    source, index = _last_index
+    if source is not filename_to_hash:
+        index = NameIndex(filename_to_hash)
+        _last_index = (filename_to_hash, index)
+    return index
+
+
+def resolve_name(filename_to_hash, name, fuzzy=True):
+    return as_name_index(filename_to_hash).resolve(name, fuzzy)
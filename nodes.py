@@ -4,19 +4,39 @@ import urllib.parse
 import io
 import time
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import hashlib
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, as_completed
+# 采样器列表用于类定义时的 RETURN_TYPES；ComfyUI 在加载插件之前已导入 comfy.samplers
 import comfy.samplers
-import torch
-from PIL import Image
-import numpy as np
-from tqdm import tqdm
+import folder_paths
 
 from . import utils
+from . import analysis
+from . import analytics
+from .analysis_core import PARTIAL_VERSION, extract_resources_from_meta, finalize_partial
+from .prompt_matcher import matcher_signature
 
 
 def get_model_list(model_type: str):
-    return utils.get_model_filenames_from_db_cached_only(model_type)
+    return utils.model_list_provider.get(model_type)
+
+
+def _resolve_model_hash(model_type, model_name, filename_to_hash=None):
+    if filename_to_hash is None:
+        _, filename_to_hash = utils.local_model_index.get_maps(model_type)
+    file_hash = filename_to_hash.get(model_name)
+
+    if not file_hash:
+        print(
+            f"[Civitai Utils] Hash for '{model_name}' not found. Forcing a refresh of the local file list..."
+        )
+        file_hash = utils.local_model_index.hash_for(model_type, model_name, force_sync=True)
+        if not file_hash:
+            raise Exception(
+                f"Hash for '{model_name}' still not in DB after refresh. Please check the file."
+            )
+    return file_hash
 
 
 # =================================================================================
@@ -30,13 +50,7 @@ class CivitaiRecipeGallery:
     @classmethod
     def INPUT_TYPES(cls):
         supported_types = ["checkpoints", "loras", "vae", "embeddings", "diffusion_models", "text_encoders", "hypernetworks"]
-
-        all_model_filenames = []
-        for model_type in supported_types:
-            filenames = utils.get_model_filenames_from_db_cached_only(model_type)
-            if filenames:
-                all_model_filenames.extend(filenames)
-        all_model_filenames = sorted(list(set(all_model_filenames)))
+        all_model_filenames = utils.model_list_provider.get(*supported_types)
 
         return {
             "required": {
@@ -59,8 +73,8 @@ class CivitaiRecipeGallery:
     def execute(
         self, model_type, model_name, sort, nsfw_level, image_limit, filter_type, unique_id
     ):
-        lora_hash_map, lora_name_map = utils.get_local_model_maps("loras")
-        ckpt_hash_map, _ = utils.get_local_model_maps("checkpoints")
+        import torch
+        lora_hash_map, lora_name_map = utils.local_model_index.get_maps("loras")
         selections = utils.load_selections()
         node_selection = selections.get(str(unique_id), {})
         item_data = node_selection.get("item", {})
@@ -69,10 +83,14 @@ class CivitaiRecipeGallery:
         if not isinstance(meta, dict):
             meta = {}
 
-        session_cache = {}
-        extracted = utils.extract_resources_from_meta(
-            meta, lora_name_map, session_cache
+        resources = utils.db_manager.get_resources(
+            [
+                vid
+                for res in meta.get("civitaiResources") or []
+                if (vid := analysis.resource_version_id(res))
+            ]
         )
+        extracted = extract_resources_from_meta(meta, lora_name_map, resources)
 
         ckpt_hash = extracted.get("ckpt_hash")
         missing_ckpt_hash = None
@@ -87,7 +105,7 @@ class CivitaiRecipeGallery:
             )
 
         if ckpt_hash:
-            found_local_name = ckpt_hash_map.get(ckpt_hash.lower())
+            found_local_name = utils.local_model_index.filename_for(ckpt_hash, "checkpoints")
             if found_local_name:
                 final_ckpt_name = found_local_name
             else:
@@ -146,6 +164,9 @@ class CivitaiRecipeGallery:
         )
 
     def download_image(self, url):
+        import numpy as np
+        import torch
+        from PIL import Image
         try:
             req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
             with urllib.request.urlopen(req, timeout=20) as response:
@@ -164,7 +185,8 @@ class RecipeParamsParser:
         return {"required": {"recipe_params": ("RECIPE_PARAMS",)}}
 
     RETURN_TYPES = (
-        get_model_list("checkpoints"),
+        # 在类定义（导入）时求值：直接使用 ComfyUI 的文件列表，导入插件时不访问数据库
+        folder_paths.get_filename_list("checkpoints"),
         "STRING",
         "STRING",
         "INT",
@@ -233,8 +255,7 @@ class LoraTriggerWords:
         )
         civitai_triggers_list = []
         try:
-            _, filename_to_hash = utils.get_local_model_maps("loras")
-            file_hash = filename_to_hash.get(lora_name)
+            file_hash = utils.local_model_index.hash_for("loras", lora_name)
             if file_hash:
                 civitai_triggers_list = utils.get_civitai_triggers(
                     lora_name, file_hash, force_refresh
@@ -315,11 +336,28 @@ class CivitaiModelAnalyzer:
     FUNCTION = "execute"
     CATEGORY = "Civitai/📊 Analyzer"
 
+    @classmethod
+    def _analysis_fingerprint(
+        cls, model_name, image_limit, sort, nsfw_level, filter_type, filename_to_lora_hash_map, embedding_names
+    ):
+        """分析结果缓存键：本地 LoRA / Embedding 列表或部分结果格式变化后，缓存的结果不再可用"""
+        data_identity = "-".join(
+            (
+                cls.IS_CHANGED(model_name, image_limit, sort, nsfw_level, filter_type, "no"),
+                matcher_signature(filename_to_lora_hash_map, embedding_names),
+                str(PARTIAL_VERSION),
+            )
+        )
+        return hashlib.sha256(data_identity.encode()).hexdigest()
+
     def _get_analysis_data(
         self, model_name, image_limit, sort, nsfw_level, filter_type, force_refresh
     ):
-        data_fingerprint = self.IS_CHANGED(
-            model_name, image_limit, sort, nsfw_level, filter_type, "no"
+        _, filename_to_lora_hash_map = utils.local_model_index.get_maps("loras")
+        embedding_names = utils.get_local_embedding_names()
+        data_fingerprint = self._analysis_fingerprint(
+            model_name, image_limit, sort, nsfw_level, filter_type,
+            filename_to_lora_hash_map, embedding_names,
         )
 
         if force_refresh == "no":
@@ -330,154 +368,112 @@ class CivitaiModelAnalyzer:
                 )
                 return cached_data
 
-        _, filename_to_hash = utils.get_local_model_maps(self.FOLDER_KEY)
-        file_hash = filename_to_hash.get(model_name)
+        file_hash = _resolve_model_hash(self.FOLDER_KEY, model_name)
 
-        if not file_hash:
-            print(
-                f"[Civitai Utils] Hash for '{model_name}' not found. Forcing a refresh of the local file list..."
-            )
-            _, filename_to_hash = utils.get_local_model_maps(
-                self.FOLDER_KEY, force_sync=True
-            )
-            file_hash = filename_to_hash.get(model_name)
-            if not file_hash:
-                raise Exception(
-                    f"Hash for '{model_name}' still not in DB after refresh. Please check the file."
-                )
-
-        fetched_items = utils.fetch_civitai_data_by_hash(
+        # 原始 meta 按页保存：提高 image_limit 时只获取缺少的尾部页，聚合结果按页增量合并
+        stream_key, pages = utils.load_analysis_pages(
             file_hash,
             sort,
             image_limit,
             nsfw_level,
             filter_type if filter_type != "all" else None,
+            force_refresh=force_refresh == "yes",
         )
-        all_metas = [item["meta"] for item in fetched_items if "meta" in item]
-        if not all_metas:
+        if not any(page["item_count"] for page in pages):
             raise Exception("No images with metadata found on Civitai.")
 
-        _, filename_to_lora_hash_map = utils.get_local_model_maps("loras")
-        session_cache = {}
-        required_version_ids = set()
-        for meta in all_metas:
-            if isinstance(meta.get("civitaiResources"), list):
-                for res in meta["civitaiResources"]:
-                    if isinstance(res, dict) and (
-                        version_id := res.get("modelVersionId")
-                    ):
-                        required_version_ids.add(version_id)
-
-        domain = utils._get_active_domain()
-
-        if required_version_ids:
-            print(
-                f"[Civitai Utils] Pre-caching {len(required_version_ids)} unique resource details..."
-            )
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = {
-                    executor.submit(
-                        utils.CivitaiAPIUtils.get_model_version_info_by_id, vid, domain
-                    ): vid
-                    for vid in required_version_ids
-                }
-                for future in tqdm(
-                    as_completed(futures),
-                    total=len(futures),
-                    desc="Pre-caching Resources",
-                ):
-                    version_info = future.result()
-                    vid = futures[future]
-                    if version_info:
-                        file_hash_val = (
-                            version_info.get("files", [{}])[0]
-                            .get("hashes", {})
-                            .get("SHA256")
-                        )
-                        session_cache[str(vid)] = {
-                            "info": version_info,
-                            "hash": file_hash_val.lower() if file_hash_val else None,
-                        }
-
-        assoc_stats = {"lora": {}, "model": {}, "vae": {}}
-        for meta in tqdm(all_metas, desc="Analyzing Resources (Fast)"):
-            extracted = utils.extract_resources_from_meta(
-                meta, filename_to_lora_hash_map, session_cache
-            )
-            for lora_info in extracted.get("loras", []):
-                key = lora_info.get("hash") or lora_info.get("name")
-                if not key:
-                    continue
-                stats_dict = assoc_stats["lora"]
-                if key not in stats_dict:
-                    stats_dict[key] = {
-                        "count": 0,
-                        "weights": [],
-                        "name": lora_info.get("name") or key,
-                        "modelId": lora_info.get("modelId"),
-                    }
-
-                # 下面这两行是之前被误删的关键代码，现在已恢复
-                stats_dict[key]["count"] += 1
-                stats_dict[key]["weights"].append(lora_info.get("weight", 1.0))
-                if not stats_dict[key].get("modelId") and (
-                    vid := lora_info.get("modelVersionId")
-                ):
-                    cached_resource = session_cache.get(str(vid))
-                    if cached_resource and (
-                        version_info := cached_resource.get("info")
-                    ):
-                        if "modelId" in version_info:
-                            stats_dict[key]["modelId"] = version_info["modelId"]
-                            if version_info.get("model", {}).get("name"):
-                                stats_dict[key]["name"] = version_info["model"]["name"]
-
-            for vae_info in extracted.get("vaes", []):
-                key = vae_info.get("hash") or vae_info.get("name")
-                if not key:
-                    continue
-                stats_dict = assoc_stats["vae"]
-                if key not in stats_dict:
-                    stats_dict[key] = {"count": 0, "name": vae_info.get("name") or key}
-                stats_dict[key]["count"] += 1
-
-        pos_tokens, neg_tokens = [], []
-        for meta in all_metas:
-            pos_tokens.extend(
-                utils.CivitaiAPIUtils._parse_prompts(meta.get("prompt", ""))
-            )
-            neg_tokens.extend(
-                utils.CivitaiAPIUtils._parse_prompts(meta.get("negativePrompt", ""))
-            )
-        pos_common = Counter(pos_tokens).most_common()
-        neg_common = Counter(neg_tokens).most_common()
-
-        param_counters = {
-            key: Counter()
-            for key in [
-                "sampler",
-                "scheduler",
-                "cfgScale",
-                "steps",
-                "Size",
-                "Denoising strength",
-            ]
-        }
-        for meta in all_metas:
-            for key in param_counters:
-                if val := meta.get(key):
-                    param_counters[key].update([str(val)])
-
-        analysis_result = {
-            "pos_common": pos_common,
-            "neg_common": neg_common,
-            "assoc_stats": assoc_stats,
-            "param_counters": {k: dict(v) for k, v in param_counters.items()},
-            "total_images": len(all_metas),
-        }
+        merged = analysis.analyze_pages(
+            stream_key, pages, image_limit, filename_to_lora_hash_map, embedding_names=embedding_names
+        )
+        analysis_result = finalize_partial(merged)
         utils.db_manager.set_analysis_cache(data_fingerprint, analysis_result)
         return analysis_result
 
+    @staticmethod
+    def _build_report(model_name, analysis_data, summary_top_n):
+        """由分析结果生成 Markdown 报告、摘要与参数管道"""
+        pos_common = analysis_data["pos_common"]
+        neg_common = analysis_data["neg_common"]
+        assoc_stats = analysis_data["assoc_stats"]
+        param_counts_dict = analysis_data["param_counters"]
+        total_images = analysis_data["total_images"]
+
+        tag_report_md = utils.format_tags_as_markdown(
+            pos_common,
+            neg_common,
+            summary_top_n,
+            analysis_data.get("pos_weights"),
+            analysis_data.get("neg_weights"),
+        )
+        resource_report_md = utils.format_resources_as_markdown(
+            assoc_stats, total_images, summary_top_n
+        )
+        numeric_stats = analysis.numeric_param_stats(param_counts_dict)
+        param_report_md = utils.format_parameters_as_markdown(
+            param_counts_dict, total_images, summary_top_n, numeric_stats
+        )
+
+        top_sampler_raw = (
+            Counter(param_counts_dict.get("sampler", {})).most_common(1)[0][0]
+            if param_counts_dict.get("sampler")
+            else "Euler a"
+        )
+        top_scheduler_raw = (
+            Counter(param_counts_dict.get("scheduler", {})).most_common(1)[0][0]
+            if param_counts_dict.get("scheduler")
+            else "Karras"
+        )
+        final_sampler, final_scheduler = top_sampler_raw, top_scheduler_raw
+        for sched in ["Karras", "SGM Uniform"]:
+            if top_sampler_raw.endswith(f" {sched}"):
+                final_sampler, final_scheduler = (
+                    top_sampler_raw[: -len(f" {sched}")],
+                    sched,
+                )
+                break
+        top_sampler_cleaned = utils.SAMPLER_SCHEDULER_MAP.get(
+            final_sampler.strip(), "euler_ancestral"
+        )
+        top_scheduler_cleaned = utils.SAMPLER_SCHEDULER_MAP.get(
+            final_scheduler.strip(), "karras"
+        )
+        # 数值参数按数值合并后取众数（"7" 与 "7.0" 计为同一取值）
+        top_steps = numeric_stats["steps"]["mode"] if "steps" in numeric_stats else 25
+        top_cfg = float(numeric_stats["cfgScale"]["mode"]) if "cfgScale" in numeric_stats else 7.0
+        top_width, top_height = 512, 512
+        if numeric_stats.get("sizes"):
+            top_width, top_height = map(int, numeric_stats["sizes"][0][0].split("x"))
+        top_denoise = (
+            float(numeric_stats["Denoising strength"]["mode"])
+            if "Denoising strength" in numeric_stats
+            else 1.0
+        )
+
+        full_report_md = (
+            f"# Civitai Analysis for: {model_name}\n\n"
+            + param_report_md
+            + "\n\n"
+            + resource_report_md
+            + "\n\n"
+            + tag_report_md
+        )
+        summary = f"Analyzed {total_images} items for '{model_name}'."
+        params_pipe = (
+            model_name,
+            "",
+            "",
+            -1,
+            top_steps,
+            top_cfg,
+            top_sampler_cleaned,
+            top_scheduler_cleaned,
+            top_width,
+            top_height,
+            top_denoise,
+        )
+
+        return (full_report_md, summary, params_pipe)
+
     def execute(
         self,
         model_name,
@@ -495,101 +491,7 @@ class CivitaiModelAnalyzer:
             if not analysis_data:
                 return ("Analysis failed.", "No data.", ())
 
-            pos_common = analysis_data["pos_common"]
-            neg_common = analysis_data["neg_common"]
-            assoc_stats = analysis_data["assoc_stats"]
-            param_counts_dict = analysis_data["param_counters"]
-            total_images = analysis_data["total_images"]
-
-            tag_report_md = utils.format_tags_as_markdown(
-                pos_common, neg_common, summary_top_n
-            )
-            resource_report_md = utils.format_resources_as_markdown(
-                assoc_stats, total_images, summary_top_n
-            )
-            param_report_md = utils.format_parameters_as_markdown(
-                param_counts_dict, total_images, summary_top_n
-            )
-
-            top_sampler_raw = (
-                Counter(param_counts_dict.get("sampler", {})).most_common(1)[0][0]
-                if param_counts_dict.get("sampler")
-                else "Euler a"
-            )
-            top_scheduler_raw = (
-                Counter(param_counts_dict.get("scheduler", {})).most_common(1)[0][0]
-                if param_counts_dict.get("scheduler")
-                else "Karras"
-            )
-            final_sampler, final_scheduler = top_sampler_raw, top_scheduler_raw
-            for sched in ["Karras", "SGM Uniform"]:
-                if top_sampler_raw.endswith(f" {sched}"):
-                    final_sampler, final_scheduler = (
-                        top_sampler_raw[: -len(f" {sched}")],
-                        sched,
-                    )
-                    break
-            top_sampler_cleaned = utils.SAMPLER_SCHEDULER_MAP.get(
-                final_sampler.strip(), "euler_ancestral"
-            )
-            top_scheduler_cleaned = utils.SAMPLER_SCHEDULER_MAP.get(
-                final_scheduler.strip(), "karras"
-            )
-            top_steps = (
-                int(Counter(param_counts_dict.get("steps", {})).most_common(1)[0][0])
-                if param_counts_dict.get("steps")
-                else 25
-            )
-            top_cfg = (
-                float(
-                    Counter(param_counts_dict.get("cfgScale", {})).most_common(1)[0][0]
-                )
-                if param_counts_dict.get("cfgScale")
-                else 7.0
-            )
-            top_size_str = (
-                Counter(param_counts_dict.get("Size", {})).most_common(1)[0][0]
-                if param_counts_dict.get("Size")
-                else "512x512"
-            )
-            try:
-                top_width, top_height = map(int, top_size_str.split("x"))
-            except Exception:
-                top_width, top_height = 512, 512
-            top_denoise = (
-                float(
-                    Counter(
-                        param_counts_dict.get("Denoising strength", {})
-                    ).most_common(1)[0][0]
-                )
-                if param_counts_dict.get("Denoising strength")
-                else 1.0
-            )
-
-            full_report_md = (
-                f"# Civitai Analysis for: {model_name}\n\n"
-                + param_report_md
-                + "\n\n"
-                + resource_report_md
-                + "\n\n"
-                + tag_report_md
-            )
-            summary = f"Analyzed {total_images} items for '{model_name}'."
-            params_pipe = (
-                model_name,
-                "",
-                "",
-                -1,
-                top_steps,
-                top_cfg,
-                top_sampler_cleaned,
-                top_scheduler_cleaned,
-                top_width,
-                top_height,
-                top_denoise,
-            )
-
-            return (full_report_md, summary, params_pipe)
+            return self._build_report(model_name, analysis_data, summary_top_n)
 
         except Exception as e:
             print(f"[{self.__class__.__name__}] An error occurred: {e}")
@@ -607,6 +509,280 @@ class CivitaiModelAnalyzerLORA(CivitaiModelAnalyzer):
     FOLDER_KEY = "loras"
 
 
+class CivitaiBatchModelAnalyzer:
+    """
+    一次分析多个本地模型：并发获取各模型的图片页，所有模型共享同一个资源解析缓存，
+    输出逐模型报告以及所有模型合并后的汇总报告。
+    """
+
+    @classmethod
+    def IS_CHANGED(cls, force_refresh, **kwargs):
+        if force_refresh == "yes":
+            return time.time()
+        data_identity = "-".join(f"{k}={kwargs[k]}" for k in sorted(kwargs))
+        return hashlib.sha256(data_identity.encode()).hexdigest()
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "model_type": (["loras", "checkpoints"],),
+                "models": (
+                    "STRING",
+                    # 每行一项：模型文件名、以 "/" 结尾的文件夹，或通配符（如 "SDXL/*.safetensors"）
+                    {"multiline": True, "default": "*"},
+                ),
+                "image_limit": ("INT", {"default": 100, "min": 1, "max": 1000}),
+                "sort": (["Most Reactions", "Most Comments", "Newest"],),
+                "nsfw_level": (["None", "Soft", "Mature", "X"],),
+                "filter_type": (["all", "image", "video"],),
+                "summary_top_n": ("INT", {"default": 5, "min": 1, "max": 100}),
+                "max_concurrent_models": ("INT", {"default": 4, "min": 1, "max": 16}),
+                "force_refresh": (["no", "yes"],),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("combined_report_md", "per_model_reports_md", "fetch_summary")
+    FUNCTION = "execute"
+    CATEGORY = "Civitai/📊 Analyzer"
+
+    @staticmethod
+    def _select_models(patterns_text, filenames):
+        """按文件名、文件夹或通配符选择模型，保持本地列表的顺序"""
+        patterns = []
+        for line in patterns_text.splitlines():
+            pattern = line.strip().replace("\\", "/")
+            if not pattern:
+                continue
+            if pattern.endswith("/"):
+                pattern += "*"
+            patterns.append(pattern)
+        # 按本地列表顺序遍历一次，每个模型最多选中一次
+        selected = []
+        for name in filenames:
+            normalized = name.replace("\\", "/")
+            if any(normalized == pattern or fnmatch.fnmatch(normalized, pattern) for pattern in patterns):
+                selected.append(name)
+        return selected
+
+    def execute(
+        self,
+        model_type,
+        models,
+        image_limit,
+        sort,
+        nsfw_level,
+        filter_type,
+        summary_top_n,
+        max_concurrent_models,
+        force_refresh,
+    ):
+        from tqdm import tqdm
+        _, filename_to_hash = utils.local_model_index.get_maps(model_type)
+        selected = self._select_models(models, sorted(filename_to_hash))
+        if not selected:
+            return ("No local models matched the selection.", "", "Analyzed 0 models.")
+
+        if model_type == "loras":
+            filename_to_lora_hash_map = filename_to_hash
+        else:
+            _, filename_to_lora_hash_map = utils.local_model_index.get_maps("loras")
+        embedding_names = utils.get_local_embedding_names()
+
+        # 1. 并发获取各模型的图片页（全局限速器控制总请求速率）
+        fetched, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max_concurrent_models) as executor:
+            futures = {
+                executor.submit(
+                    utils.load_analysis_pages,
+                    filename_to_hash[name],
+                    sort,
+                    image_limit,
+                    nsfw_level,
+                    filter_type if filter_type != "all" else None,
+                    force_refresh == "yes",
+                ): name
+                for name in selected
+            }
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Fetching Models"
+            ):
+                name = futures[future]
+                try:
+                    stream_key, pages = future.result()
+                    if any(page["item_count"] for page in pages):
+                        fetched[name] = (stream_key, pages)
+                    else:
+                        errors[name] = "No images with metadata found on Civitai."
+                except Exception as e:
+                    errors[name] = str(e)
+
+        # 2. 一次性解析所有模型引用到的资源，之后各模型共享解析结果
+        resources = {}
+        all_pending = [
+            meta
+            for _, pages in fetched.values()
+            for meta in analysis.pending_metas(pages, image_limit)
+        ]
+        if all_pending:
+            analysis.resolve_resources(all_pending, resources=resources)
+
+        # 3. 逐模型合并部分结果并生成报告
+        per_model_reports, summary_rows, model_partials = [], [], []
+        for name in selected:
+            if name not in fetched:
+                per_model_reports.append(
+                    f"# Civitai Analysis for: {name}\n\n_Skipped: {errors.get(name, 'unknown error')}_"
+                )
+                continue
+            stream_key, pages = fetched[name]
+            merged = analysis.analyze_pages(
+                stream_key, pages, image_limit, filename_to_lora_hash_map, resources, embedding_names
+            )
+            model_partials.append(merged)
+            analysis_data = finalize_partial(merged)
+            utils.db_manager.set_analysis_cache(
+                CivitaiModelAnalyzer._analysis_fingerprint(
+                    name, image_limit, sort, nsfw_level, filter_type,
+                    filename_to_lora_hash_map, embedding_names,
+                ),
+                analysis_data,
+            )
+            report_md, _, params_pipe = CivitaiModelAnalyzer._build_report(
+                name, analysis_data, summary_top_n
+            )
+            per_model_reports.append(report_md)
+
+            loras = analysis_data["assoc_stats"].get("lora", {})
+            top_lora = max(loras.values(), key=lambda item: item["count"], default=None)
+            summary_rows.append(
+                f"| `{name}` | {analysis_data['total_images']} | `{params_pipe[6]}` | {params_pipe[4]} | "
+                f"{params_pipe[5]} | {params_pipe[8]}x{params_pipe[9]} | "
+                f"{top_lora['name'] if top_lora else '-'} |"
+            )
+
+        # 4. 所有模型合并后的汇总
+        combined_md = [
+            f"# Batch Analysis: {len(fetched)}/{len(selected)} {model_type}\n",
+            "| Model | Images | Top Sampler | Steps | CFG | Size | Top LoRA |",
+            "|:------|:------:|:------------|:-----:|:---:|:----:|:---------|",
+            *summary_rows,
+        ]
+        if errors:
+            combined_md.append("\n### Skipped Models\n")
+            combined_md.extend(f"- `{name}`: {reason}" for name, reason in errors.items())
+        if model_partials:
+            combined_data = finalize_partial(analysis.merge_partials(model_partials))
+            combined_report, _, _ = CivitaiModelAnalyzer._build_report(
+                f"all {len(model_partials)} models", combined_data, summary_top_n
+            )
+            combined_md.append("\n" + combined_report)
+
+        summary = (
+            f"Analyzed {len(fetched)} of {len(selected)} {model_type} "
+            f"({sum(p['total'] for p in model_partials)} items total)."
+        )
+        return ("\n".join(combined_md), "\n\n---\n\n".join(per_model_reports), summary)
+
+
+class CivitaiCacheAnalytics:
+    """
+    对本地已缓存的全部图片做跨模型统计（不会重新请求 Civitai），例如
+    “SDXL LoRA 图库中最常用的 CFG” 或 “与某个 LoRA 一起使用最多的 LoRA”。
+    """
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # 缓存会随每次获取图片增长，每次执行都重新统计
+        return time.time()
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "query": (["parameter distribution", "co-used LoRAs"],),
+                "parameter": (list(analytics.PARAM_COLUMNS),),
+                "lora": (["any"] + get_model_list("loras"),),
+                "checkpoint": (["any"] + get_model_list("checkpoints"),),
+                "source_type": (["any", "LORA", "Checkpoint"],),
+                "base_model": ("STRING", {"default": ""}),
+                "top_n": ("INT", {"default": 10, "min": 1, "max": 100}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("report_md",)
+    FUNCTION = "execute"
+    CATEGORY = "Civitai/📊 Analyzer"
+
+    def execute(self, query, parameter, lora, checkpoint, source_type, base_model, top_n):
+        lora = None if lora == "any" else lora
+        checkpoint = None if checkpoint == "any" else checkpoint
+        source_type = None if source_type == "any" else source_type
+        base_model = base_model.strip() or None
+        filters = {
+            "lora_hash": analytics.resolve_local_hash("loras", lora),
+            "checkpoint_hash": analytics.resolve_local_hash("checkpoints", checkpoint),
+            "base_model": base_model,
+            "source_type": source_type,
+        }
+        scope = analytics.describe_filters(lora, checkpoint, base_model, source_type)
+        if query == "co-used LoRAs":
+            result = analytics.co_used_loras(top_n, **filters)
+            report_md = analytics.format_co_used_loras_markdown(
+                result, scope, utils._get_active_domain()
+            )
+        else:
+            result = analytics.parameter_distribution(parameter, top_n, **filters)
+            report_md = analytics.format_parameter_distribution_markdown(result, scope)
+        overview = analytics.cache_overview()
+        report_md += (
+            f"\n\n_Based on {overview['images']} cached images from {overview['models']} models._"
+        )
+        return (report_md,)
+
+
+class CivitaiModelCompanions:
+    """根据本地已缓存图片的共现统计，推荐与所选 LoRA / Checkpoint 最常搭配的资源"""
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return time.time()
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "lora": (["none"] + get_model_list("loras"),),
+                "checkpoint": (["none"] + get_model_list("checkpoints"),),
+                "companion_type": (["lora", "ckpt", "all"],),
+                "top_k": ("INT", {"default": 10, "min": 1, "max": 100}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("report_md", "local_companions")
+    FUNCTION = "execute"
+    CATEGORY = "Civitai/📊 Analyzer"
+
+    def execute(self, lora, checkpoint, companion_type, top_k):
+        lora = None if lora == "none" else lora
+        checkpoint = None if checkpoint == "none" else checkpoint
+        if not lora and not checkpoint:
+            return ("Select a LoRA and/or a checkpoint.", "")
+        results = analytics.top_companions(
+            analytics.resolve_local_hash("loras", lora),
+            analytics.resolve_local_hash("checkpoints", checkpoint),
+            top_k,
+            None if companion_type == "all" else companion_type,
+        )
+        scope = analytics.describe_filters(lora, checkpoint)
+        report_md = analytics.format_companions_markdown(results, scope, utils._get_active_domain())
+        local_companions = "\n".join(r["local_file"] for r in results if r["local_file"])
+        return (report_md, local_companions)
+
+
 class CivitaiParameterUnpacker:
     @classmethod
     def INPUT_TYPES(cls):
@@ -680,6 +856,9 @@ NODE_CLASS_MAPPINGS = {
     "LoraTriggerWords": LoraTriggerWords,
     "CivitaiModelAnalyzerCKPT": CivitaiModelAnalyzerCKPT,
     "CivitaiModelAnalyzerLORA": CivitaiModelAnalyzerLORA,
+    "CivitaiBatchModelAnalyzer": CivitaiBatchModelAnalyzer,
+    "CivitaiCacheAnalytics": CivitaiCacheAnalytics,
+    "CivitaiModelCompanions": CivitaiModelCompanions,
     "CivitaiParameterUnpacker": CivitaiParameterUnpacker,
 }
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -688,5 +867,8 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "LoraTriggerWords": "Lora Trigger Words",
     "CivitaiModelAnalyzerCKPT": "Model Analyzer (Checkpoint)",
     "CivitaiModelAnalyzerLORA": "Model Analyzer (LoRA)",
+    "CivitaiBatchModelAnalyzer": "Batch Model Analyzer",
+    "CivitaiCacheAnalytics": "Cache Analytics",
+    "CivitaiModelCompanions": "Model Companions",
     "CivitaiParameterUnpacker": "Get Parameters from Analysis",
 }
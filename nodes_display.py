@@ -1,6 +1,3 @@
-from markdown_it import MarkdownIt
-
-
 class MarkdownPresenter:
     @classmethod
     def INPUT_TYPES(cls):
@@ -26,6 +23,8 @@ class MarkdownPresenter:
             parts.append(text)
         md_text = "\n\n".join(parts)
 
+        from markdown_it import MarkdownIt
+
         md = MarkdownIt("commonmark", {"html": True}).enable("table")
 
         def link_open_renderer(self, tokens, idx, options, env):
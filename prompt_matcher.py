@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+
+# =================================================================================
+# 提示词中的本地资源匹配
+# 用 Aho-Corasick 自动机一次扫描同时查找所有本地 Embedding 文件名与 <lora:名称> 标签，
+# 扫描时间只与提示词长度成正比，与本地文件数量无关。
+# 本模块不依赖 ComfyUI 或数据库，可在分析子进程中直接加载。
+# =================================================================================
+
+MIN_EMBEDDING_NAME = 3  # 过短的 Embedding 名称容易误匹配普通单词，不参与匹配
+_LORA_WEIGHT_RE = re.compile(r"\s*:\s*([+-]?(?:\d+\.?\d*|\.\d+))")
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机；patterns 为 {模式: 值}"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern, value in patterns.items():
+            if pattern:
+                self._add(pattern, value)
+        self._build()
+
+    def _add(self, pattern, value):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), value))
+
+    def _build(self):
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """按结束位置顺序产生 (起始位置, 结束位置, 值)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                end = index + 1
+                for length, value in out[state]:
+                    yield end - length, end, value
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def _stem(filename):
+    return os.path.splitext(filename.replace("\\", "/"))[0].lower()
+
+
+class ResourceMatcher:
+    """
+    由本地 LoRA 与 Embedding 文件名构建的匹配器。
+    Embedding 以文件名（不含扩展名）或 "embedding:名称" 出现，要求前后为单词边界；
+    LoRA 以 <lora:名称:权重> 出现，名称可以带子文件夹，也可以只写文件名。
+    """
+
+    def __init__(self, lora_names=(), embedding_names=()):
+        patterns = {}
+        for filename in embedding_names:
+            stem = _stem(filename)
+            if len(stem.rsplit("/", 1)[-1]) >= MIN_EMBEDDING_NAME:
+                patterns.setdefault(stem.rsplit("/", 1)[-1], ("embedding", filename))
+                patterns.setdefault(stem, ("embedding", filename))
+        for filename in lora_names:
+            stem = _stem(filename)
+            patterns.setdefault(f"<lora:{stem}", ("lora", filename))
+            patterns.setdefault(f"<lora:{stem.rsplit('/', 1)[-1]}", ("lora", filename))
+        self.automaton = AhoCorasick(patterns)
+
+    def scan(self, prompt):
+        """
+        返回 (embeddings, loras)：embeddings 为匹配到的 Embedding 文件名集合，
+        loras 为 {LoRA 文件名: 权重}。同一位置有多个候选时取最长的匹配。
+        """
+        if not isinstance(prompt, str) or not prompt:
+            return set(), {}
+        text = prompt.lower().replace("\\", "/")
+        best = {}
+        for start, end, (kind, filename) in self.automaton.iter_matches(text):
+            if kind == "embedding":
+                if (start and _is_word_char(text[start - 1])) or (
+                    end < len(text) and _is_word_char(text[end])
+                ):
+                    continue
+            elif end < len(text) and text[end] not in ":>":
+                continue
+            if start not in best or end > best[start][0]:
+                best[start] = (end, kind, filename)
+
+        embeddings, loras = set(), {}
+        covered_until = -1
+        for start in sorted(best):
+            end, kind, filename = best[start]
+            if start < covered_until:
+                continue
+            covered_until = end
+            if kind == "embedding":
+                embeddings.add(filename)
+            else:
+                match = _LORA_WEIGHT_RE.match(text, end)
+                weight = 1.0
+                if match:
+                    try:
+                        weight = float(match.group(1))
+                    except ValueError:
+                        pass
+                loras.setdefault(filename, weight)
+        return embeddings, loras
+
+
+def matcher_signature(lora_names, embedding_names):
+    """本地文件列表的签名；列表变化（同步后新增或删除文件）时签名随之变化"""
+    digest = hashlib.sha1()
+    for name in sorted(lora_names):
+        digest.update(b"l:" + name.encode("utf-8", "replace") + b"\0")
+    for name in sorted(embedding_names):
+        digest.update(b"e:" + name.encode("utf-8", "replace") + b"\0")
+    return digest.hexdigest()[:16]
+
+
+_matcher_cache = {}
+
+
+def get_resource_matcher(lora_names, embedding_names, signature=None):
+    """按文件列表签名缓存匹配器，文件列表不变时只构建一次"""
+    signature = signature or matcher_signature(lora_names, embedding_names)
+    matcher = _matcher_cache.get(signature)
+    if matcher is None:
+        _matcher_cache.clear()
+        matcher = _matcher_cache[signature] = ResourceMatcher(lora_names, embedding_names)
+    return matcher
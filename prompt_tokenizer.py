@@ -0,0 +1,221 @@
+import re
+
+# =================================================================================
+# 提示词分词器
+# 单次扫描解析 A1111 / ComfyUI 的强调语法，返回 (规范化标签, 有效权重)：
+#   (tag)      权重 x1.1，可嵌套：((tag)) = 1.21
+#   [tag]      权重 /1.1
+#   (tag:1.3)  显式权重，对括号内的所有标签生效，并与外层括号相乘
+#   \( \) \[ \] \, \\  转义字符按字面处理
+#   <lora:name:0.8>    作为独立标签 "<lora:name>"，权重为模型强度
+#   逗号、换行与 BREAK 为标签分隔符，括号分组的开始与结束处也分隔标签
+# 本模块不依赖 ComfyUI 或数据库，可在子进程和基准测试脚本中直接加载。
+# =================================================================================
+
+EMPHASIS_MULTIPLIER = 1.1
+WEIGHT_DIGITS = 4
+
+_TOKEN_RE = re.compile(
+    r"""
+      (?P<text>[^\\<()\[\]:,\n]+)                  # 普通文本
+    | (?P<sep>[,\n])                                 # 标签分隔符
+    | :\s*(?P<weight>[+-]?(?:\d+\.?\d*|\.\d+))\s*\)  # 显式权重并闭合圆括号
+    | (?P<open>[(\[])
+    | (?P<close>[)\]])
+    | \\(?P<escaped>.)                              # 转义字符
+    | <(?P<network>[^<>:]+):(?P<net_args>[^<>]*)>     # <lora:name:0.8> 等附加网络
+    | (?P<other>[<:\\])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_BREAK_RE = re.compile(r"\bBREAK\b")
+_SEPARATOR_RE = re.compile(r"[,\n]")
+_SPECIAL_RE = re.compile(r"[\\<()\[\]:]")
+
+
+def normalize_tag(text):
+    """统一大小写与空白，使不同写法的同一标签合并计数"""
+    return " ".join(text.split()).lower()
+
+
+def _network_tag(raw):
+    inner = raw[1:-1]
+    parts = inner.split(":")
+    strength = 1.0
+    if len(parts) >= 3:
+        try:
+            strength = float(parts[2])
+        except ValueError:
+            pass
+    tag = f"<{parts[0].strip().lower()}:{parts[1].strip()}>" if len(parts) >= 2 else f"<{inner}>"
+    return tag, strength
+
+
+def _multiply_range(entries, start, multiplier):
+    last = len(entries) - 1
+    for i in range(start, len(entries)):
+        entry = entries[i]
+        # 固定权重的附加网络标签与尚无文本的当前标签不受括号影响
+        if entry[2] or (i == last and not entry[0].strip()):
+            continue
+        entry[1] *= multiplier
+
+
+def _end_tag(entries):
+    """括号分组的边界也是标签边界："(a)(b)" 与 "(masterpiece:1.2) best quality" 各为两个标签"""
+    if entries[-1][0].strip():
+        entries.append(["", 1.0, False])
+
+
+def _scan_into(text, entries, round_stack, square_stack):
+    """
+    扫描一段文本并写入 entries。每个条目是 [文本, 权重, 是否固定权重]，最后一项是正在构建的标签。
+    括号闭合时对开括号之后开始的标签整体乘以权重（与 A1111 的 parse_prompt_attention 一致）。
+    返回是否遇到了没有可配对开括号的闭括号。
+    """
+    unmatched_close = False
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "text":
+            entries[-1][0] += m.group("text")
+        elif kind == "sep":
+            if entries[-1][0].strip():
+                entries.append(["", 1.0, False])
+            else:
+                entries[-1][0] = ""
+        elif kind == "weight":
+            if round_stack:
+                _multiply_range(entries, round_stack.pop(), float(m.group("weight")))
+                _end_tag(entries)
+            else:
+                unmatched_close = True
+                entries[-1][0] += m.group(0)
+        elif kind == "open":
+            # 括号前已有文本时另起一个标签；尚无文本的当前标签会落在括号内，因此也在作用范围内
+            _end_tag(entries)
+            (round_stack if m.group("open") == "(" else square_stack).append(len(entries) - 1)
+        elif kind == "close":
+            if m.group("close") == ")":
+                stack, multiplier = round_stack, EMPHASIS_MULTIPLIER
+            else:
+                stack, multiplier = square_stack, 1 / EMPHASIS_MULTIPLIER
+            if stack:
+                _multiply_range(entries, stack.pop(), multiplier)
+                _end_tag(entries)
+            else:
+                unmatched_close = True
+        elif kind == "escaped":
+            entries[-1][0] += m.group("escaped")
+        elif kind == "net_args":
+            tag, strength = _network_tag(m.group(0))
+            if entries[-1][0].strip():
+                entries.append([tag, strength, True])
+            else:
+                entries[-1] = [tag, strength, True]
+            entries.append(["", 1.0, False])
+        else:
+            entries[-1][0] += m.group(0)
+    return unmatched_close
+
+
+# 括号自成一体的分段（如 "(best quality:1.2)"）的解析结果与上下文无关，可以缓存复用；
+# 值为 (条目, 最终标签)，None 表示该分段与相邻分段的括号相互配对，每次都需在完整上下文中扫描。
+_segment_cache = {}
+SEGMENT_CACHE_SIZE = 50000
+
+
+_MISSING = object()
+
+
+def _parse_segment(segment):
+    result = _segment_cache.get(segment, _MISSING)
+    if result is not _MISSING:
+        return result
+    entries, round_stack, square_stack = [["", 1.0, False]], [], []
+    unmatched_close = _scan_into(segment, entries, round_stack, square_stack)
+    result = None
+    if not (unmatched_close or round_stack or square_stack):
+        tags = []
+        _finish_tags(entries, tags)
+        result = (tuple(tuple(entry) for entry in entries), tuple(tags))
+    if len(_segment_cache) >= SEGMENT_CACHE_SIZE:
+        _segment_cache.clear()
+    _segment_cache[segment] = result
+    return result
+
+
+def _finish_tags(entries, tags):
+    for text, weight, fixed in entries:
+        tag = text if fixed else " ".join(text.split()).lower()
+        if tag:
+            tags.append((tag, 1.0 if weight == 1.0 else round(weight, WEIGHT_DIGITS)))
+
+
+def tokenize_prompt(prompt):
+    """
+    返回 [(规范化标签, 有效权重), ...]，按出现顺序排列。
+    括号分组的边界同时是标签边界，例如 "a (b) c" 得到 a、b、c 三个标签。
+
+    先按分隔符切段。没有跨段的括号时各段结果与上下文无关：不含特殊字符的段（大多数标签）
+    直接规范化，括号自成一体的段使用缓存的最终结果。只有与相邻段括号配对的段才在完整上下文中
+    逐词扫描，括号全部闭合后再回到快速路径；含转义字符时分隔符可能被转义，整段扫描。
+    """
+    if not isinstance(prompt, str) or not prompt.strip():
+        return []
+    if "BREAK" in prompt:
+        prompt = _BREAK_RE.sub(",", prompt)
+
+    tags = []
+    round_stack, square_stack = [], []
+    if "\\" in prompt:
+        entries = [["", 1.0, False]]
+        _scan_into(prompt, entries, round_stack, square_stack)
+    else:
+        entries = None  # 存在跨段括号时正在构建的条目
+        special = _SPECIAL_RE.search
+        for segment in _SEPARATOR_RE.split(prompt):
+            if entries is None:
+                if not special(segment):
+                    tag = " ".join(segment.split()).lower()
+                    if tag:
+                        tags.append((tag, 1.0))
+                    continue
+                parsed = _parse_segment(segment)
+                if parsed is not None:
+                    tags.extend(parsed[1])
+                    continue
+                entries = [["", 1.0, False]]
+                _scan_into(segment, entries, round_stack, square_stack)
+            else:
+                current = entries[-1]
+                if current[0].strip():
+                    current = ["", 1.0, False]
+                    entries.append(current)
+                if not special(segment):
+                    current[0] = segment
+                    continue
+                current[0] = ""
+                parsed = _parse_segment(segment)
+                if parsed is None:
+                    _scan_into(segment, entries, round_stack, square_stack)
+                else:
+                    entries[-1:] = [list(entry) for entry in parsed[0]]
+            if not (round_stack or square_stack):
+                # 括号已全部闭合，之前的条目不会再被乘以权重
+                _finish_tags(entries, tags)
+                entries = None
+    if entries is None:
+        return tags
+
+    # 未闭合的括号按 A1111 的方式仍然生效
+    for start in round_stack:
+        _multiply_range(entries, start, EMPHASIS_MULTIPLIER)
+    for start in square_stack:
+        _multiply_range(entries, start, 1 / EMPHASIS_MULTIPLIER)
+    _finish_tags(entries, tags)
+    return tags
+
+
+def parse_prompt_tags(prompt):
+    """只返回规范化后的标签列表"""
+    return [tag for tag, _ in tokenize_prompt(prompt)]
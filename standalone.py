@@ -0,0 +1,46 @@
+import importlib.util
+import os
+import sys
+
+# =================================================================================
+# 纯计算模块的独立加载
+# 分析进程池的子进程无法按插件包名导入本插件（ComfyUI 按文件路径加载自定义节点），
+# 因此按文件路径把纯计算模块登记为独立的模块名。本模块只依赖标准库：
+# 父进程中作为普通模块导入；子进程中由 runpy.run_path 以 WORKER_RUN_NAME 运行，作为进程池的初始化入口。
+# =================================================================================
+
+WORKER_RUN_NAME = "__civitai_toolkit_analysis_worker__"
+
+# 文件名 → 独立模块名，按依赖顺序排列
+STANDALONE_NAMES = {
+    "standalone.py": "civitai_toolkit_standalone",
+    "name_index.py": "civitai_toolkit_name_index",
+    "prompt_tokenizer.py": "civitai_toolkit_prompt_tokenizer",
+    "prompt_matcher.py": "civitai_toolkit_prompt_matcher",
+    "analysis_core.py": "civitai_toolkit_analysis_core",
+}
+
+
+def standalone_modules(base_dir=None):
+    """返回 [(独立模块名, 文件路径)]"""
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    return [(name, os.path.join(base_dir, filename)) for filename, name in STANDALONE_NAMES.items()]
+
+
+def load_standalone_modules(modules):
+    """按文件路径加载 [(模块名, 路径)] 并登记到 sys.modules，已加载的模块跳过"""
+    for name, path in modules:
+        if name in sys.modules:
+            continue
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+
+
+if __name__ == WORKER_RUN_NAME:
+    load_standalone_modules(standalone_modules())
@@ -1,21 +1,28 @@
+import asyncio
 import sqlite3
 import threading
-import urllib
+import urllib.parse
 
-import requests
 import hashlib
 import json
 import os
+import math
 import re
+import zlib
 from collections import Counter
 import folder_paths
 import time
 import statistics
+from collections import OrderedDict
 
-from safetensors import safe_open
-from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 from . import api
+from . import prompt_tokenizer
+from .name_index import NameIndex
+from .analysis_core import (
+    normalize_image_meta,
+    safe_float_conversion,
+)
 
 try:
     import orjson as json_lib
@@ -28,6 +35,31 @@ except ImportError:
 
 HASH_CACHE_REFRESH_INTERVAL = 3600
 SINGLE_FILE_HASH_TIMEOUT = 90  # 为单个文件哈希设置90秒的超时
+BATCH_HASH_LOOKUP_SIZE = 100  # 批量哈希查询每次请求的哈希数量
+MODEL_CACHE_TTL = 7 * 24 * 3600  # 模型主页信息缓存7天后重新验证
+API_CACHE_POSITIVE_TTL = 7 * 24 * 3600  # 版本信息缓存7天后在后台重新验证
+API_CACHE_NEGATIVE_TTL = 24 * 3600  # “未找到”的负缓存1天后重新查询
+# HTTP 响应缓存：按接口路径匹配 TTL（秒），未匹配的接口不缓存
+HTTP_CACHE_TTL_RULES = [
+    (r"/api/v1/images$", 30 * 60),
+    (r"/api/v1/model-versions/by-hash/", 24 * 3600),
+    (r"/api/v1/model-versions/\d+$", 24 * 3600),
+    (r"/api/v1/models/\d+$", 6 * 3600),
+    (r"/api/v1/models$", 15 * 60),
+]
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+API_MIN_REQUEST_INTERVAL = 0.1  # 所有 Civitai 请求之间的最小间隔（秒）
+IMAGE_PAGE_SIZE = 100  # /api/v1/images 每页条目数
+IMAGE_PREFETCH_PAGES = 4  # 获取图片列表时最多同时在途的页数
+ANALYSIS_STREAM_TTL = 24 * 3600  # 分析器保存的图片页（及由其得出的分析结果）1天后重新获取
+THUMB_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 本地缩略图缓存的磁盘上限
+THUMB_MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024  # 单个缩略图的最大下载大小
+THUMB_REENCODE_WEBP = True  # 是否把缩略图重新编码为 WebP 以节省空间和带宽
+THUMB_ALLOWED_HOSTS = ("civitai.com", "civitai.work")
+RESOURCE_LRU_SIZE = 20000  # 内存中保留的 version_id → 资源索引条目数
+IMAGE_META_VERSION = 2  # 图片 meta 规范化列的格式版本，变化时后台重新规范化
+COOCCURRENCE_SINCE_META_VERSION = 2  # 从该格式版本起，规范化的图片已计入共现统计
+STARTUP_TASK_DELAY = 5  # 服务器启动后延迟多少秒开始后台扫描与索引构建
 SUPPORTED_MODEL_TYPES = { "checkpoints": "checkpoints", "loras": "Lora", "vae": "VAE", "embeddings": "embeddings", "diffusion_models":"diffusion_models", "text_encoders":"text_encoders","hypernetworks": "hypernetworks" }
 
 
@@ -50,18 +82,35 @@ class DatabaseManager:
             return
         project_root = os.path.dirname(os.path.abspath(__file__))
         self.db_path = os.path.join(project_root, "data", "civitai_helper.db")
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        self._create_tables()
+        self._resource_lru = OrderedDict()
+        self._resource_lock = threading.Lock()
+        self.cooccurrence_version = 0  # 共现统计每次写入后递增，内存索引据此判断是否需要重建
+        # 建表与迁移推迟到第一次取连接时执行，导入插件时不访问数据库
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
         self._initialized = True
-        print(f"[Civitai Toolkit] Database initialized at: {self.db_path}")
 
-    def get_connection(self):
+    def _connect(self):
         conn = sqlite3.connect(self.db_path, timeout=10)
         conn.row_factory = sqlite3.Row
         return conn
 
+    def get_connection(self):
+        if not self._schema_ready:
+            self._ensure_schema()
+        return self._connect()
+
+    def _ensure_schema(self):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._create_tables()
+            self._schema_ready = True
+        print(f"[Civitai Toolkit] Database initialized at: {self.db_path}")
+
     def _create_tables(self):
-        with self.get_connection() as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)"
@@ -87,12 +136,152 @@ class DatabaseManager:
                 FOREIGN KEY (version_id) REFERENCES versions (version_id)
             )""")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_images_url ON images (url)")
+            # 从 meta 中规范化出的生成参数，供跨模型的 SQL 统计使用
+            self._ensure_columns(
+                cursor,
+                "images",
+                {
+                    "sampler": "TEXT",
+                    "scheduler": "TEXT",
+                    "steps": "INTEGER",
+                    "cfg": "REAL",
+                    "width": "INTEGER",
+                    "height": "INTEGER",
+                    "seed": "INTEGER",
+                    "denoise": "REAL",
+                    "ckpt_hash": "TEXT",
+                    "ckpt_name": "TEXT",
+                    "ckpt_version_id": "INTEGER",
+                    "meta_version": "INTEGER",
+                },
+            )
+            for column in ("version_id", "sampler", "cfg", "ckpt_hash", "meta_version"):
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_images_{column} ON images ({column})"
+                )
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS image_resources (
+                image_id INTEGER,
+                version_id INTEGER,
+                hash TEXT,
+                name TEXT,
+                weight REAL,
+                FOREIGN KEY (image_id) REFERENCES images (image_id)
+            )""")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_image_resources_image ON image_resources (image_id)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_image_resources_version ON image_resources (version_id)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_image_resources_hash ON image_resources (hash)"
+            )
+            # 资源共现统计：(a_key, b_key) 表示 b 与 a 出现在同一张图片中，权重统计为 b 的权重
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cooccurrence (
+                a_key TEXT,
+                b_key TEXT,
+                count INTEGER,
+                weight_sum REAL,
+                weight_sq_sum REAL,
+                PRIMARY KEY (a_key, b_key)
+            )""")
             cursor.execute("""
             CREATE TABLE IF NOT EXISTS analysis_cache (
                 fingerprint TEXT PRIMARY KEY,
                 analysis_data TEXT,
                 last_updated INTEGER
             )""")
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_streams (
+                stream_key TEXT PRIMARY KEY,
+                version_id INTEGER,
+                resume_token TEXT,
+                exhausted INTEGER DEFAULT 0,
+                updated_at INTEGER,
+                created_at INTEGER
+            )""")
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_pages (
+                stream_key TEXT,
+                page_index INTEGER,
+                item_count INTEGER,
+                metas BLOB,
+                partial TEXT,
+                fetched_at INTEGER,
+                PRIMARY KEY (stream_key, page_index)
+            )""")
+            self._ensure_columns(
+                cursor,
+                "models",
+                {"api_response": "TEXT", "etag": "TEXT", "last_api_check": "INTEGER"},
+            )
+            self._ensure_columns(
+                cursor,
+                "versions",
+                {
+                    "etag": "TEXT",
+                    "last_modified": "TEXT",
+                    "relative_path": "TEXT",
+                    "base_folder_index": "INTEGER",
+                },
+            )
+            self._ensure_columns(cursor, "analysis_streams", {"created_at": "INTEGER"})
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_versions_type_relative_path ON versions (model_type, relative_path)"
+            )
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                cache_key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                size INTEGER,
+                fetched_at INTEGER,
+                last_access INTEGER
+            )""")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_http_cache_last_access ON http_cache (last_access)"
+            )
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS thumb_cache (
+                cache_key TEXT PRIMARY KEY,
+                url TEXT,
+                content_type TEXT,
+                size INTEGER,
+                last_access INTEGER
+            )""")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_thumb_cache_last_access ON thumb_cache (last_access)"
+            )
+            # 供分析 civitaiResources 使用的精简索引，避免反复解析 versions.api_response
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS resource_index (
+                version_id INTEGER PRIMARY KEY,
+                sha256 TEXT,
+                autov2 TEXT,
+                model_id INTEGER,
+                type TEXT,
+                name TEXT
+            )""")
+            self._ensure_columns(cursor, "resource_index", {"base_model": "TEXT"})
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_resource_index_sha256 ON resource_index (sha256)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_resource_index_autov2 ON resource_index (autov2)"
+            )
+
+    @staticmethod
+    def _ensure_columns(cursor, table, columns):
+        """为旧版数据库补齐新增的列"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, col_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
 
     def get_setting(self, key, default=None):
         with self.get_connection() as conn:
@@ -122,8 +311,8 @@ class DatabaseManager:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT analysis_data FROM analysis_cache WHERE fingerprint = ?",
-                (fingerprint,),
+                "SELECT analysis_data FROM analysis_cache WHERE fingerprint = ? AND last_updated >= ?",
+                (fingerprint, int(time.time()) - ANALYSIS_STREAM_TTL),
             )
             row = cursor.fetchone()
         if row and row["analysis_data"]:
@@ -142,14 +331,96 @@ class DatabaseManager:
                 (fingerprint, data_str, int(time.time())),
             )
 
+    def get_analysis_stream(self, stream_key):
+        """返回分析数据流的状态以及已保存的各页（按页序），页中的 metas 已解压"""
+        with self.get_connection() as conn:
+            stream = conn.execute(
+                "SELECT * FROM analysis_streams WHERE stream_key = ?", (stream_key,)
+            ).fetchone()
+            rows = conn.execute(
+                """
+                SELECT page_index, item_count, metas, partial FROM analysis_pages
+                WHERE stream_key = ? ORDER BY page_index ASC
+                """,
+                (stream_key,),
+            ).fetchall()
+        pages = [
+            {
+                "page_index": row["page_index"],
+                "item_count": row["item_count"],
+                "metas": json_lib.loads(zlib.decompress(row["metas"])),
+                "partial": json_lib.loads(row["partial"]) if row["partial"] else None,
+            }
+            for row in rows
+        ]
+        return stream, pages
+
+    def append_analysis_page(self, stream_key, version_id, page_index, metas, resume_token):
+        """追加一页原始 meta，并在同一事务中记录继续获取所需的位置"""
+        metas_str = json_lib.dumps(metas)
+        if isinstance(metas_str, str):
+            metas_str = metas_str.encode("utf-8")
+        token_str = json_lib.dumps(resume_token) if resume_token else None
+        if isinstance(token_str, bytes):
+            token_str = token_str.decode("utf-8")
+        now = int(time.time())
+        with self.get_connection() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO analysis_pages
+                    (stream_key, page_index, item_count, metas, partial, fetched_at)
+                VALUES (?, ?, ?, ?, NULL, ?)
+                """,
+                (stream_key, page_index, len(metas), zlib.compress(metas_str), now),
+            )
+            # created_at 只在数据流的第一页写入，续取时保持不变
+            conn.execute(
+                """
+                INSERT INTO analysis_streams
+                    (stream_key, version_id, resume_token, exhausted, updated_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(stream_key) DO UPDATE SET
+                    version_id = excluded.version_id, resume_token = excluded.resume_token,
+                    exhausted = excluded.exhausted, updated_at = excluded.updated_at
+                """,
+                (stream_key, version_id, token_str, 0 if resume_token else 1, now, now),
+            )
+
+    def set_analysis_page_partials(self, stream_key, partials):
+        """保存各页的部分聚合结果：partials 为 {page_index: partial}"""
+        rows = []
+        for page_index, partial in partials.items():
+            partial_str = json_lib.dumps(partial)
+            if isinstance(partial_str, bytes):
+                partial_str = partial_str.decode("utf-8")
+            rows.append((partial_str, stream_key, page_index))
+        with self.get_connection() as conn:
+            conn.executemany(
+                "UPDATE analysis_pages SET partial = ? WHERE stream_key = ? AND page_index = ?",
+                rows,
+            )
+
+    def clear_analysis_stream(self, stream_key):
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM analysis_pages WHERE stream_key = ?", (stream_key,))
+            conn.execute("DELETE FROM analysis_streams WHERE stream_key = ?", (stream_key,))
+
     def clear_analysis_cache(self):
         with self.get_connection() as conn:
             conn.execute("DELETE FROM analysis_cache")
+            conn.execute("DELETE FROM analysis_pages")
+            conn.execute("DELETE FROM analysis_streams")
         print("[Civitai Toolkit] Analysis cache cleared.")
 
     def clear_api_responses(self):
         with self.get_connection() as conn:
             conn.execute("UPDATE versions SET api_response = NULL, last_api_check = 0")
+            conn.execute(
+                "UPDATE models SET api_response = NULL, etag = NULL, last_api_check = 0"
+            )
+            conn.execute("DELETE FROM resource_index")
+        with self._resource_lock:
+            self._resource_lru.clear()
         print("[Civitai Toolkit] All API response caches cleared.")
 
     def clear_all_triggers(self):
@@ -183,6 +454,39 @@ class DatabaseManager:
             cursor.execute("SELECT * FROM models WHERE model_id = ?", (model_id,))
             return cursor.fetchone()
 
+    def set_model_api_data(self, model_id, data, etag=None):
+        """缓存模型级别的完整API响应，每个 model_id 只保存一份"""
+        data_str = json_lib.dumps(data)
+        if isinstance(data_str, bytes):
+            data_str = data_str.decode("utf-8")
+        with self.get_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO models (model_id, name, type, api_response, etag, last_api_check)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(model_id) DO UPDATE SET
+                    name = excluded.name, type = excluded.type,
+                    api_response = excluded.api_response, etag = excluded.etag,
+                    last_api_check = excluded.last_api_check
+                """,
+                (
+                    model_id,
+                    data.get("name"),
+                    data.get("type"),
+                    data_str,
+                    etag,
+                    int(time.time()),
+                ),
+            )
+
+    def touch_model_api_check(self, model_id):
+        """条件请求返回 304 时，只刷新检查时间"""
+        with self.get_connection() as conn:
+            conn.execute(
+                "UPDATE models SET last_api_check = ? WHERE model_id = ?",
+                (int(time.time()), model_id),
+            )
+
     def get_image_by_url(self, url):
         if not url:
             return None
@@ -191,7 +495,9 @@ class DatabaseManager:
             cursor.execute("SELECT * FROM images WHERE url = ?", (url,))
             return cursor.fetchone()
 
-    def add_or_update_version_from_api(self, data, original_hash=None):
+    def add_or_update_version_from_api(
+        self, data, original_hash=None, etag=None, last_modified=None
+    ):
         """
         从API数据更新数据库，并精确处理多文件版本。
         """
@@ -202,6 +508,9 @@ class DatabaseManager:
             print(f"[DB Manager] Error: Missing version_id({version_id}) or model_id({model_id}). Aborting.")
             return
 
+        # 没有文件的版本同样写入资源索引，分析时仍可得到其类型与名称
+        self.put_resources([_resource_entry(data, original_hash)])
+
         files = data.get("files", [])
         if not files:
             return
@@ -229,7 +538,18 @@ class DatabaseManager:
             except TypeError:
                 return json_lib.dumps(data_obj)
 
-        api_response_str = robust_dumps(data)
+        # 完整的模型主页信息只在 models 表中保存一份，版本记录里只保留精简引用
+        model_data = data.get("model", {})
+        version_record, model_response_str = data, None
+        if _is_full_model_payload(model_data):
+            version_record = dict(data)
+            version_record["model"] = _slim_model_ref(model_data)
+            version_record.pop("model_description", None)
+            model_response_str = robust_dumps(model_data)
+            if isinstance(model_response_str, bytes):
+                model_response_str = model_response_str.decode("utf-8")
+
+        api_response_str = robust_dumps(version_record)
         trained_words_str = robust_dumps(data.get("trainedWords", []))
 
         with self.get_connection() as conn:
@@ -240,26 +560,35 @@ class DatabaseManager:
             )
 
             # 使用更可靠的model数据源
-            model_data = data.get("model", {})
             conn.execute(
                 """
-                INSERT INTO models (model_id, name, type) VALUES (?, ?, ?)
-                ON CONFLICT(model_id) DO UPDATE SET name = excluded.name, type = excluded.type
+                INSERT INTO models (model_id, name, type, api_response, last_api_check) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(model_id) DO UPDATE SET name = excluded.name, type = excluded.type,
+                    api_response = COALESCE(models.api_response, excluded.api_response),
+                    last_api_check = COALESCE(models.last_api_check, excluded.last_api_check)
                 """,
-                (model_id, model_data.get("name"), model_data.get("type")),
+                (
+                    model_id,
+                    model_data.get("name"),
+                    model_data.get("type"),
+                    model_response_str,
+                    int(time.time()) if model_response_str else None,
+                ),
             )
 
             conn.execute(
                 """
-                INSERT INTO versions (hash, version_id, model_id, name, trained_words, api_response, last_api_check) 
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO versions (hash, version_id, model_id, name, trained_words, api_response, last_api_check, etag, last_modified) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(hash) DO UPDATE SET 
                     version_id = excluded.version_id, 
                     model_id = excluded.model_id, 
                     name = excluded.name,
                     trained_words = excluded.trained_words, 
                     api_response = excluded.api_response, 
-                    last_api_check = excluded.last_api_check
+                    last_api_check = excluded.last_api_check,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified
                 """,
                 (
                     file_hash,
@@ -269,9 +598,16 @@ class DatabaseManager:
                     trained_words_str,
                     api_response_str,
                     int(time.time()),
+                    etag,
+                    last_modified,
                 ),
             )
 
+        # 本地文件获取到新信息后，其 Civitai 名称会作为名称索引的别名
+        model_type = local_model_index.type_of(file_hash)
+        if model_type:
+            local_model_index.invalidate_aliases(model_type)
+
     def add_downloaded_image(self, url, local_filename, version_id=None, meta=None):
         with self.get_connection() as conn:
             meta_str = (
@@ -283,11 +619,302 @@ class DatabaseManager:
                 """
                 INSERT INTO images (url, local_filename, version_id, meta) VALUES (?, ?, ?, ?)
                 ON CONFLICT(url) DO UPDATE SET local_filename = excluded.local_filename,
-                version_id = COALESCE(excluded.version_id, version_id), meta = COALESCE(excluded.meta, meta)
+                version_id = COALESCE(excluded.version_id, version_id), meta = COALESCE(excluded.meta, meta),
+                meta_version = CASE WHEN excluded.meta IS NULL THEN meta_version END
             """,
                 (url, local_filename, version_id, meta_str),
             )
 
+    def add_models_from_api(self, models):
+        """
+        批量写入模型搜索结果中的完整模型数据。
+        模型与版本记录都只在本地缺少完整数据时补充，不覆盖按 ID 或哈希获取到的数据。
+        """
+        now = int(time.time())
+        model_rows, version_rows, resource_rows = [], [], []
+        for model in models or []:
+            model_id = model.get("id")
+            if not model_id:
+                continue
+            model_str = json_lib.dumps(model)
+            if isinstance(model_str, bytes):
+                model_str = model_str.decode("utf-8")
+            model_rows.append((model_id, model.get("name"), model.get("type"), model_str, now))
+
+            model_ref = _slim_model_ref(model)
+            for version in model.get("modelVersions") or []:
+                if version.get("id"):
+                    resource_rows.append(
+                        _resource_entry({**version, "modelId": model_id, "model": model_ref})
+                    )
+                files = version.get("files") or []
+                if not version.get("id") or not files:
+                    continue
+                primary = next((f for f in files if f.get("primary")), files[0])
+                file_hash = (primary.get("hashes") or {}).get("SHA256")
+                if not file_hash:
+                    continue
+                version_record = {**version, "modelId": model_id, "model": model_ref}
+                version_str = json_lib.dumps(version_record)
+                trained_words_str = json_lib.dumps(version.get("trainedWords", []))
+                if isinstance(version_str, bytes):
+                    version_str = version_str.decode("utf-8")
+                    trained_words_str = trained_words_str.decode("utf-8")
+                version_rows.append(
+                    (
+                        file_hash.lower(),
+                        version["id"],
+                        model_id,
+                        version.get("name"),
+                        trained_words_str,
+                        version_str,
+                        now,
+                    )
+                )
+
+        if not model_rows:
+            return
+        with self.get_connection() as conn:
+            # 搜索结果只补充尚未缓存完整数据的模型（包括扫描时只记录了名称的行）；
+            # 已有的 /models/{id} 响应及其 ETag 与检查时间保持不变
+            conn.executemany(
+                """
+                INSERT INTO models (model_id, name, type, api_response, etag, last_api_check)
+                VALUES (?, ?, ?, ?, NULL, ?)
+                ON CONFLICT(model_id) DO UPDATE SET
+                    api_response = COALESCE(models.api_response, excluded.api_response),
+                    last_api_check = COALESCE(models.last_api_check, excluded.last_api_check)
+                """,
+                model_rows,
+            )
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO versions
+                    (hash, version_id, model_id, name, trained_words, api_response, last_api_check)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                version_rows,
+            )
+        self.put_resources(resource_rows)
+
+    def put_resources(self, entries):
+        """写入资源索引条目（见 _resource_entry），并同步内存中的 LRU"""
+        entries = [e for e in entries if e and e.get("version_id")]
+        if not entries:
+            return
+        with self.get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO resource_index (version_id, sha256, autov2, model_id, type, name, base_model)
+                VALUES (:version_id, :sha256, :autov2, :model_id, :type, :name, :base_model)
+                ON CONFLICT(version_id) DO UPDATE SET
+                    sha256 = COALESCE(excluded.sha256, resource_index.sha256),
+                    autov2 = COALESCE(excluded.autov2, resource_index.autov2),
+                    model_id = COALESCE(excluded.model_id, resource_index.model_id),
+                    type = COALESCE(excluded.type, resource_index.type),
+                    name = COALESCE(excluded.name, resource_index.name),
+                    base_model = COALESCE(excluded.base_model, resource_index.base_model)
+                """,
+                entries,
+            )
+        with self._resource_lock:
+            # 数据库中可能合并了旧值，淘汰内存条目，下次读取时重新加载
+            for entry in entries:
+                self._resource_lru.pop(entry["version_id"], None)
+
+    def get_resources(self, version_ids):
+        """
+        按 version_id 批量读取资源索引，返回 {version_id: 条目}，只包含已知的版本。
+        依次查询内存 LRU、resource_index 表；表中没有但 versions 表有缓存的版本在此一次性回填索引。
+        """
+        found, missing = {}, []
+        with self._resource_lock:
+            for vid in dict.fromkeys(version_ids):
+                entry = self._resource_lru.get(vid)
+                if entry is None:
+                    missing.append(vid)
+                else:
+                    self._resource_lru.move_to_end(vid)
+                    found[vid] = entry
+        if not missing:
+            return found
+
+        loaded, backfill = {}, []
+        with self.get_connection() as conn:
+            for i in range(0, len(missing), 500):
+                chunk = missing[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT * FROM resource_index WHERE version_id IN ({placeholders})", chunk
+                ):
+                    loaded[row["version_id"]] = dict(row)
+                unindexed = [vid for vid in chunk if vid not in loaded]
+                if not unindexed:
+                    continue
+                placeholders = ",".join("?" * len(unindexed))
+                for row in conn.execute(
+                    f"""SELECT hash, version_id, api_response FROM versions
+                    WHERE version_id IN ({placeholders}) AND api_response IS NOT NULL""",
+                    unindexed,
+                ):
+                    try:
+                        entry = _resource_entry(json_lib.loads(row["api_response"]), row["hash"])
+                    except (ValueError, AttributeError) as e:
+                        # JSON 损坏或不是对象：跳过该版本，不写入资源索引
+                        print(f"[Civitai Toolkit] Skipping unreadable cached version {row['version_id']}: {e}")
+                        continue
+                    if entry:
+                        loaded[row["version_id"]] = entry
+                        backfill.append(entry)
+        if backfill:
+            self.put_resources(backfill)
+
+        with self._resource_lock:
+            for vid, entry in loaded.items():
+                self._resource_lru[vid] = entry
+                self._resource_lru.move_to_end(vid)
+            while len(self._resource_lru) > RESOURCE_LRU_SIZE:
+                self._resource_lru.popitem(last=False)
+        found.update(loaded)
+        return found
+
+    def add_fetched_images(self, items, version_id):
+        """批量写入从 Civitai 获取到的图片记录，不覆盖已下载的本地文件名；同时写入规范化的生成参数"""
+        rows, normalized = [], {}
+        for img in items:
+            meta_str = json_lib.dumps(img.get("meta"))
+            if isinstance(meta_str, bytes):
+                meta_str = meta_str.decode("utf-8")
+            rows.append((img["url"], version_id, meta_str))
+            normalized[img["url"]] = normalize_image_meta(img.get("meta"))
+        if not rows:
+            return
+        with self.get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO images (url, version_id, meta) VALUES (?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                version_id = COALESCE(excluded.version_id, version_id), meta = COALESCE(excluded.meta, meta)
+            """,
+                rows,
+            )
+            urls = list(normalized)
+            placeholders = ",".join("?" * len(urls))
+            image_ids = {
+                row["url"]: row["image_id"]
+                for row in conn.execute(
+                    f"SELECT image_id, url FROM images WHERE url IN ({placeholders})", urls
+                )
+            }
+            self._write_normalized_images(
+                conn, [(image_ids[url], normalized[url]) for url in urls if url in image_ids]
+            )
+
+    def _write_normalized_images(self, conn, entries):
+        """
+        entries 为 [(image_id, normalize_image_meta 的结果)]，写入规范化列并重建 LoRA 关联。
+        共现统计随之增量更新：先减去图片原有的贡献（若已计入），再加上新的贡献。
+        """
+        if not entries:
+            return
+        image_ids = [image_id for image_id, _ in entries]
+        placeholders = ",".join("?" * len(image_ids))
+        previous = {}
+        for row in conn.execute(
+            f"""SELECT image_id, ckpt_hash, ckpt_version_id FROM images
+            WHERE image_id IN ({placeholders}) AND meta_version >= ?""",
+            image_ids + [COOCCURRENCE_SINCE_META_VERSION],
+        ):
+            previous[row["image_id"]] = (
+                {"ckpt_hash": row["ckpt_hash"], "ckpt_version_id": row["ckpt_version_id"]},
+                [],
+            )
+        if previous:
+            for row in conn.execute(
+                f"SELECT * FROM image_resources WHERE image_id IN ({placeholders})", image_ids
+            ):
+                if row["image_id"] in previous:
+                    previous[row["image_id"]][1].append(dict(row))
+
+        conn.executemany(
+            """
+            UPDATE images SET sampler = :sampler, scheduler = :scheduler, steps = :steps,
+                cfg = :cfg, width = :width, height = :height, seed = :seed, denoise = :denoise,
+                ckpt_hash = :ckpt_hash, ckpt_name = :ckpt_name, ckpt_version_id = :ckpt_version_id,
+                meta_version = :meta_version
+            WHERE image_id = :image_id
+            """,
+            [
+                {**columns, "image_id": image_id, "meta_version": IMAGE_META_VERSION}
+                for image_id, (columns, _) in entries
+            ],
+        )
+        conn.executemany(
+            "DELETE FROM image_resources WHERE image_id = ?",
+            [(image_id,) for image_id, _ in entries],
+        )
+        conn.executemany(
+            "INSERT INTO image_resources (image_id, version_id, hash, name, weight) VALUES (?, ?, ?, ?, ?)",
+            [
+                (image_id, lora["version_id"], lora["hash"], lora["name"], lora["weight"])
+                for image_id, (_, loras) in entries
+                for lora in loras
+            ],
+        )
+
+        deltas = {}
+        for columns, loras in previous.values():
+            _add_cooccurrence_deltas(deltas, columns, loras, -1)
+        for _, (columns, loras) in entries:
+            _add_cooccurrence_deltas(deltas, columns, loras, 1)
+        deltas = {pair: delta for pair, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        conn.executemany(
+            """
+            INSERT INTO cooccurrence (a_key, b_key, count, weight_sum, weight_sq_sum)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(a_key, b_key) DO UPDATE SET
+                count = count + excluded.count,
+                weight_sum = weight_sum + excluded.weight_sum,
+                weight_sq_sum = weight_sq_sum + excluded.weight_sq_sum
+            """,
+            [(a, b, *delta) for (a, b), delta in deltas.items()],
+        )
+        if previous:
+            conn.execute("DELETE FROM cooccurrence WHERE count <= 0")
+        self.cooccurrence_version += 1
+
+    def normalize_cached_images(self, batch_size=1000):
+        """
+        为尚未规范化（或格式版本较旧）的图片记录补齐规范化列，返回处理的记录数。
+        已是最新格式时只需一次索引查询，可在每次统计前调用。
+        """
+        total = 0
+        while True:
+            with self.get_connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT image_id, meta FROM images
+                    WHERE meta_version IS NULL OR meta_version < ? LIMIT ?
+                    """,
+                    (IMAGE_META_VERSION, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                entries = []
+                for row in rows:
+                    try:
+                        meta = json_lib.loads(row["meta"]) if row["meta"] else None
+                    except Exception:
+                        meta = None
+                    entries.append((row["image_id"], normalize_image_meta(meta)))
+                self._write_normalized_images(conn, entries)
+            total += len(rows)
+        if total:
+            print(f"[Civitai Toolkit] Normalized generation parameters for {total} cached images.")
+        return total
+
     def get_db_stats(self):
         stats = {}
         with self.get_connection() as conn:
@@ -305,27 +932,7 @@ class DatabaseManager:
 
     def get_scanned_models(self, model_type):
         """从数据库中获取指定类型的所有模型相对路径列表"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT local_path FROM versions WHERE model_type = ? AND local_path IS NOT NULL ORDER BY local_path ASC",
-                (model_type,),
-            )
-            rows = cursor.fetchall()
-
-        known_relative_paths = folder_paths.get_filename_list(model_type)
-        full_path_map = {
-            os.path.normpath(folder_paths.get_full_path(model_type, f)): f
-            for f in known_relative_paths
-        }
-
-        db_relative_paths = []
-        for row in rows:
-            full_path = os.path.normpath(row["local_path"])
-            relative_path = full_path_map.get(full_path)
-            if relative_path:
-                db_relative_paths.append(relative_path)
-        return db_relative_paths
+        return get_listed_relative_paths(model_type)
 
     def mark_hash_as_not_found(self, file_hash):
         """为未在Civitai上找到的哈希存入一个空标记，避免重复查询。"""
@@ -336,10 +943,18 @@ class DatabaseManager:
                 empty_response = empty_response.decode("utf-8")
 
             conn.execute(
-                "UPDATE versions SET api_response = ?, last_api_check = ? WHERE hash = ?",
+                "UPDATE versions SET api_response = ?, last_api_check = ?, etag = NULL, last_modified = NULL WHERE hash = ?",
                 (empty_response, int(time.time()), file_hash.lower()),
             )
 
+    def touch_version_api_check(self, file_hash):
+        """条件请求返回 304 时，只刷新检查时间"""
+        with self.get_connection() as conn:
+            conn.execute(
+                "UPDATE versions SET last_api_check = ? WHERE hash = ?",
+                (int(time.time()), file_hash.lower()),
+            )
+
     def get_version_by_path(self, local_path):
         """通过绝对路径从数据库获取版本信息"""
         if not local_path:
@@ -363,6 +978,150 @@ class DatabaseManager:
 db_manager = DatabaseManager()
 
 
+class CachePolicy:
+    """
+    API 缓存策略：正缓存与负缓存（未找到）分别设置 TTL。
+    过期的缓存照常返回给调用方，同时在后台线程中重新验证（stale-while-revalidate）。
+    """
+
+    def __init__(self, positive_ttl, negative_ttl, max_workers=2):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def is_stale(self, last_check, negative=False):
+        ttl = self.negative_ttl if negative else self.positive_ttl
+        return time.time() - (last_check or 0) >= ttl
+
+    def schedule_refresh(self, key, func, *args):
+        """提交一次后台刷新；同一个 key 在刷新完成前不会重复提交。"""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="civitai-revalidate"
+                )
+
+        def run():
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"[Civitai Toolkit] Background revalidation failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        self._executor.submit(run)
+        return True
+
+
+api_cache_policy = CachePolicy(API_CACHE_POSITIVE_TTL, API_CACHE_NEGATIVE_TTL)
+
+
+def _is_full_model_payload(model_data):
+    """判断版本数据中的 model 字段是否为 /models/{id} 返回的完整对象"""
+    return isinstance(model_data, dict) and (
+        "modelVersions" in model_data or "description" in model_data
+    )
+
+
+def _slim_model_ref(model_data):
+    """版本记录中保留的模型引用字段"""
+    return {
+        k: model_data[k] for k in ("id", "name", "type", "nsfw", "poi") if k in model_data
+    }
+
+
+def _resource_entry(version_data, file_hash=None):
+    """从版本数据中提取资源索引条目；file_hash 指定时优先使用与之匹配的文件"""
+    version_id = version_data.get("id")
+    if not version_id:
+        return None
+    files = version_data.get("files") or []
+    target = None
+    if file_hash:
+        target = next(
+            (f for f in files
+             if (f.get("hashes") or {}).get("SHA256", "").lower() == file_hash.lower()),
+            None,
+        )
+    if target is None and files:
+        target = next((f for f in files if f.get("primary")), files[0])
+    hashes = (target or {}).get("hashes") or {}
+    model = version_data.get("model") or {}
+    sha256, autov2 = hashes.get("SHA256"), hashes.get("AutoV2")
+    return {
+        "version_id": version_id,
+        "sha256": sha256.lower() if sha256 else None,
+        "autov2": autov2.lower() if autov2 else None,
+        "model_id": version_data.get("modelId") or model.get("id"),
+        "type": model.get("type"),
+        "name": model.get("name"),
+        "base_model": version_data.get("baseModel"),
+    }
+
+
+def cooccurrence_key(kind, version_id=None, file_hash=None, name=None):
+    """
+    共现统计中的资源键："<lora|ckpt>:v:<version_id>"、"<lora|ckpt>:h:<哈希>" 或 "lora:n:<名称>"。
+    键只由图片记录本身决定，保证减去旧贡献时与当初加入时一致；哈希到版本的归并在读取时进行。
+    """
+    if version_id:
+        return f"{kind}:v:{version_id}"
+    if file_hash:
+        return f"{kind}:h:{file_hash.lower()}"
+    if name:
+        return f"{kind}:n:{name.strip().lower()}"
+    return None
+
+
+def _add_cooccurrence_deltas(deltas, columns, loras, sign):
+    """把一张图片中 Checkpoint×LoRA 与 LoRA×LoRA 的共现累加到 deltas：{(a, b): [次数, 权重和, 权重平方和]}"""
+    keyed = {}
+    for lora in loras:
+        key = cooccurrence_key("lora", lora["version_id"], lora["hash"], lora["name"])
+        if key and key not in keyed:
+            keyed[key] = lora["weight"] if lora["weight"] is not None else 1.0
+    ckpt_key = cooccurrence_key("ckpt", columns.get("ckpt_version_id"), columns.get("ckpt_hash"))
+
+    def add(a, b, weight):
+        delta = deltas.setdefault((a, b), [0, 0.0, 0.0])
+        delta[0] += sign
+        delta[1] += sign * weight
+        delta[2] += sign * weight * weight
+
+    # 对角项 (a, a) 记录包含 a 的图片数及 a 自身的权重，用作共现比例的分母
+    if ckpt_key:
+        add(ckpt_key, ckpt_key, 0.0)
+    for a, weight_a in keyed.items():
+        if ckpt_key:
+            add(ckpt_key, a, weight_a)
+            add(a, ckpt_key, 0.0)
+        for b, weight_b in keyed.items():
+            add(a, b, weight_b)
+
+
+def _hydrate_version_data(api_data, model_api_response):
+    """读取时把 models 表中缓存的完整模型信息还原到版本数据中"""
+    if not api_data or not model_api_response:
+        return api_data
+    try:
+        full_model_data = json_lib.loads(model_api_response)
+    except Exception:
+        return api_data
+    if not isinstance(full_model_data, dict):
+        return api_data
+    if not _is_full_model_payload(api_data.get("model")):
+        api_data["model"] = full_model_data
+    api_data.setdefault("model_description", full_model_data.get("description", ""))
+    return api_data
+
+
 # =================================================================================
 # 2. 配置与全局函数
 # =================================================================================
@@ -409,22 +1168,229 @@ SAMPLER_SCHEDULER_MAP = {
 # =================================================================================
 # 3. Civitai API & 本地文件核心工具
 # =================================================================================
+class CachedResponse:
+    """从 HTTP 缓存还原出的响应对象，提供与 requests.Response 相同的常用接口"""
+
+    from_cache = True
+
+    def __init__(self, url, status_code, headers, content):
+        import requests
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json_lib.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+class HttpResponseCache:
+    """
+    基于 SQLite 的 Civitai GET 响应缓存。
+    以 URL + 参数为键，按接口设置不同的 TTL，总大小超过上限时按 LRU 淘汰，
+    过期条目在有 ETag / Last-Modified 时做条件请求重新验证。
+    """
+
+    CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+    def __init__(self, ttl_rules, max_bytes):
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in ttl_rules]
+        self.max_bytes = max_bytes
+        self.metrics = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, url):
+        path = urllib.parse.urlparse(url).path
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(path):
+                return ttl
+        return None
+
+    @staticmethod
+    def make_key(url, params=None, api_key=None):
+        query = urllib.parse.urlencode(sorted((params or {}).items()), doseq=True)
+        # 带 API Key 的请求可能返回不同的内容（例如 NSFW 结果），因此区分缓存
+        auth = hashlib.sha1(api_key.encode()).hexdigest()[:8] if api_key else ""
+        return f"{url}?{query}#{auth}"
+
+    def _count(self, metric):
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def get(self, key):
+        with db_manager.get_connection() as conn:
+            row = conn.execute(
+                "SELECT * FROM http_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE http_cache SET last_access = ? WHERE cache_key = ?",
+                    (int(time.time()), key),
+                )
+        return row
+
+    def to_response(self, row):
+        headers = json_lib.loads(row["headers"]) if row["headers"] else {}
+        return CachedResponse(row["url"], row["status"], headers, zlib.decompress(row["body"]))
+
+    def put(self, key, response):
+        headers = {
+            h: response.headers[h] for h in self.CACHED_HEADERS if h in response.headers
+        }
+        headers_str = json_lib.dumps(headers)
+        if isinstance(headers_str, bytes):
+            headers_str = headers_str.decode("utf-8")
+        body = zlib.compress(response.content, 1)
+        now = int(time.time())
+        with db_manager.get_connection() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO http_cache
+                (cache_key, url, status, headers, body, size, fetched_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, response.url, response.status_code, headers_str, body, len(body), now, now),
+            )
+        self._count("stores")
+        self._evict_if_needed()
+
+    def touch(self, key):
+        """条件请求返回 304：条目重新视为新鲜"""
+        now = int(time.time())
+        with db_manager.get_connection() as conn:
+            conn.execute(
+                "UPDATE http_cache SET fetched_at = ?, last_access = ? WHERE cache_key = ?",
+                (now, now, key),
+            )
+
+    def _evict_if_needed(self):
+        with db_manager.get_connection() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # 淘汰到上限的 90%，避免每次写入都触发淘汰
+            target = total - int(self.max_bytes * 0.9)
+            freed, evicted = 0, []
+            for row in conn.execute(
+                "SELECT cache_key, size FROM http_cache ORDER BY last_access ASC"
+            ):
+                evicted.append((row["cache_key"],))
+                freed += row["size"] or 0
+                if freed >= target:
+                    break
+            conn.executemany("DELETE FROM http_cache WHERE cache_key = ?", evicted)
+        with self._lock:
+            self.metrics["evictions"] += len(evicted)
+
+    def clear(self):
+        with db_manager.get_connection() as conn:
+            conn.execute("DELETE FROM http_cache")
+        print("[Civitai Toolkit] HTTP response cache cleared.")
+
+    def stats(self):
+        with db_manager.get_connection() as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache"
+            ).fetchone()
+        with self._lock:
+            metrics = dict(self.metrics)
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics.update(
+            {
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(metrics["hits"] / lookups, 3) if lookups else 0.0,
+            }
+        )
+        return metrics
+
+
+http_cache = HttpResponseCache(HTTP_CACHE_TTL_RULES, HTTP_CACHE_MAX_BYTES)
+
+
+class RateLimiter:
+    """全局请求节流：保证相邻两次网络请求之间至少间隔 min_interval 秒（线程安全）"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+civitai_rate_limiter = RateLimiter(API_MIN_REQUEST_INTERVAL)
+
+
 class CivitaiAPIUtils:
     @staticmethod
-    def _request_with_retry(url, params=None, timeout=15, retries=3, delay=5):
+    def _request_with_retry(
+        url,
+        params=None,
+        timeout=15,
+        retries=3,
+        delay=5,
+        method="GET",
+        json_body=None,
+        extra_headers=None,
+        use_cache=True,
+    ):
+        import requests
+
         # 伪装成一个普通的 Windows Chrome 浏览器
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
         }
+        if extra_headers:
+            headers.update(extra_headers)
 
         # 从数据库读取 API Key
         api_key = db_manager.get_setting("civitai_api_key")
         if api_key and isinstance(api_key, str):
             headers['Authorization'] = f'Bearer {api_key}'
+        else:
+            api_key = None
+
+        # HTTP 响应缓存：调用方自带条件请求头时说明需要网络上的最新结果，跳过读取
+        cache_key, cache_entry = None, None
+        ttl = http_cache.ttl_for(url) if method == "GET" else None
+        if ttl is not None:
+            cache_key = http_cache.make_key(url, params, api_key)
+            if use_cache and not extra_headers:
+                cache_entry = http_cache.get(cache_key)
+                if cache_entry and time.time() - cache_entry["fetched_at"] < ttl:
+                    http_cache._count("hits")
+                    return http_cache.to_response(cache_entry)
+                http_cache._count("misses")
+                if cache_entry:
+                    cached_headers = json_lib.loads(cache_entry["headers"] or "{}")
+                    if cached_headers.get("ETag"):
+                        headers["If-None-Match"] = cached_headers["ETag"]
+                    if cached_headers.get("Last-Modified"):
+                        headers["If-Modified-Since"] = cached_headers["Last-Modified"]
 
         for i in range(retries + 1):
             try:
-                if params:
+                civitai_rate_limiter.wait()
+                if method == "POST":
+                    response = requests.post(
+                        url, json=json_body, timeout=timeout, headers=headers
+                    )
+                elif params:
                     response = requests.get(
                         url, params=params, timeout=timeout, headers=headers
                     )
@@ -432,6 +1398,13 @@ class CivitaiAPIUtils:
                     response = requests.get(url, timeout=timeout, headers=headers)
 
                 response.raise_for_status()
+                if cache_key:
+                    if response.status_code == 304 and cache_entry:
+                        http_cache.touch(cache_key)
+                        http_cache._count("revalidated")
+                        return http_cache.to_response(cache_entry)
+                    if response.status_code == 200:
+                        http_cache.put(cache_key, response)
                 return response
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429:
@@ -466,11 +1439,19 @@ class CivitaiAPIUtils:
         if not force_refresh:
             version = db_manager.get_version_by_id(version_id)
             if version and version["api_response"]:
+                if api_cache_policy.is_stale(version["last_api_check"]):
+                    api_cache_policy.schedule_refresh(
+                        f"version:{version_id}",
+                        cls.get_model_version_info_by_id,
+                        version_id,
+                        domain,
+                        True,
+                    )
                 return json_lib.loads(version["api_response"])
 
         url = f"https://{domain}/api/v1/model-versions/{version_id}"
         try:
-            resp = cls._request_with_retry(url)
+            resp = cls._request_with_retry(url, use_cache=not force_refresh)
             data = resp.json()
             if data:
                 db_manager.add_or_update_version_from_api(data)
@@ -480,20 +1461,59 @@ class CivitaiAPIUtils:
         return None
 
     @classmethod
-    def get_model_info_by_id(cls, model_id, domain):
-        """根据模型ID获取最详细的模型主页信息"""
+    def get_model_info_by_id(cls, model_id, domain, force_refresh=False):
+        """
+        根据模型ID获取最详细的模型主页信息。
+        结果按 model_id 缓存在 models 表中，过期后使用 ETag 做条件请求重新验证。
+        """
         if not model_id:
             return None
+
+        cached_data, etag = None, None
+        model_row = db_manager.get_model_by_id(model_id)
+        if model_row and model_row["api_response"]:
+            try:
+                cached_data = json_lib.loads(model_row["api_response"])
+                etag = model_row["etag"]
+            except Exception:
+                cached_data = None
+            last_check = model_row["last_api_check"] or 0
+            if cached_data and not force_refresh and time.time() - last_check < MODEL_CACHE_TTL:
+                return cached_data
+
         url = f"https://{domain}/api/v1/models/{model_id}"
         print(
             f"[Civitai Toolkit] Step 2 Fetch: Getting full model details for ID: {model_id}"
         )
         try:
-            resp = cls._request_with_retry(url)
-            return resp.json()
+            extra_headers = {"If-None-Match": etag} if cached_data and etag else None
+            resp = cls._request_with_retry(
+                url, extra_headers=extra_headers, use_cache=not force_refresh
+            )
+            if resp.status_code == 304 and cached_data:
+                db_manager.touch_model_api_check(model_id)
+                return cached_data
+            data = resp.json()
+            if data and data.get("id"):
+                db_manager.set_model_api_data(model_id, data, etag=resp.headers.get("ETag"))
+            return data
         except Exception as e:
             print(f"[Civitai Toolkit] API Error fetching model by ID {model_id}: {e}")
-            return None
+            # 网络失败时退回到已过期的缓存
+            return cached_data
+
+    @classmethod
+    def search_models(cls, params, domain):
+        """
+        代理 /api/v1/models 搜索，结果经过 HTTP 缓存与限速。
+        新获取到的模型数据会写入 models / versions 表，供之后按 ID 或哈希查询时直接使用。
+        """
+        url = f"https://{domain}/api/v1/models"
+        resp = cls._request_with_retry(url, params=params)
+        data = resp.json()
+        if not getattr(resp, "from_cache", False):
+            db_manager.add_models_from_api(data.get("items", []))
+        return data
 
     @classmethod
     def get_model_version_info_by_hash(cls, sha256_hash, force_refresh=False, more_info=False):
@@ -515,31 +1535,72 @@ class CivitaiAPIUtils:
             return None
         sha256_hash = sha256_hash.lower()
 
-        # 尝试从数据库缓存中获取版本信息
+        # 尝试从数据库缓存中获取版本信息；过期的缓存先返回，再在后台重新验证
         if not force_refresh:
             version_entry = db_manager.get_version_by_hash(sha256_hash)
             if version_entry and version_entry["api_response"] is not None:
                 try:
                     cached_data = json_lib.loads(version_entry["api_response"])
+                except Exception:
+                    cached_data = None
+                if cached_data is not None:
+                    if api_cache_policy.is_stale(
+                        version_entry["last_api_check"], negative=cached_data == {}
+                    ):
+                        api_cache_policy.schedule_refresh(
+                            f"hash:{sha256_hash}", cls._revalidate_hash, sha256_hash
+                        )
                     if cached_data == {}:
                         return None
                     print(
                         f"[Civitai Toolkit] Using cache for hash: {sha256_hash[:12]}"
                     )
-                    return cached_data
-                except Exception:
-                    pass
+                    # 版本记录只保存精简的模型引用，与网络获取的结果一样还原完整模型信息
+                    model_entry = db_manager.get_model_by_id(version_entry["model_id"])
+                    return _hydrate_version_data(
+                        cached_data, model_entry["api_response"] if model_entry else None
+                    )
+
+        return cls._fetch_version_info_by_hash(
+            sha256_hash, more_info=more_info, force_refresh=force_refresh
+        )
+
+    @classmethod
+    def _revalidate_hash(cls, sha256_hash):
+        """后台重新验证一个过期的哈希缓存（包括负缓存）"""
+        cls._fetch_version_info_by_hash(sha256_hash, more_info=True, conditional=True)
 
+    @classmethod
+    def _fetch_version_info_by_hash(cls, sha256_hash, more_info=False, conditional=False, force_refresh=False):
+        """
+        通过网络获取哈希对应的版本信息。
+        conditional=True 时携带已缓存的 ETag / Last-Modified，服务器返回 304 则只刷新检查时间。
+        force_refresh=True 时不读取 HTTP 响应缓存与模型主页缓存。
+        """
+        import requests
         domain = _get_active_domain()
         try:
             # 第一步：通过哈希获取模型版本信息
             url_by_hash = (
                 f"https://{domain}/api/v1/model-versions/by-hash/{sha256_hash}"
             )
+            extra_headers = {}
+            if conditional:
+                version_entry = db_manager.get_version_by_hash(sha256_hash)
+                if version_entry and version_entry["api_response"]:
+                    if version_entry["etag"]:
+                        extra_headers["If-None-Match"] = version_entry["etag"]
+                    if version_entry["last_modified"]:
+                        extra_headers["If-Modified-Since"] = version_entry["last_modified"]
             print(
                 f"[Civitai Toolkit] Step 1 Fetch: Getting version info for hash: {sha256_hash[:12]}..."
             )
-            resp_version = cls._request_with_retry(url_by_hash)
+            resp_version = cls._request_with_retry(
+                url_by_hash, extra_headers=extra_headers, use_cache=not (conditional or force_refresh)
+            )
+            if resp_version.status_code == 304:
+                db_manager.touch_version_api_check(sha256_hash)
+                return None
             version_data = resp_version.json()
 
             if not version_data or not version_data.get("id"):
@@ -553,23 +1614,21 @@ class CivitaiAPIUtils:
             # 第二步：如果存在 modelId，尝试获取完整模型信息并合并
             if more_info:
                 if model_id:
-                    full_model_data = cls.get_model_info_by_id(model_id, domain)
+                    full_model_data = cls.get_model_info_by_id(model_id, domain, force_refresh=force_refresh)
 
                     if full_model_data:
                         print(f"[Civitai Toolkit] Step 2 Success: Merging data for model ID: {model_id}")
-
-                        # 保留版本描述和模型主页描述
-                        final_data["version_description"] = final_data.pop("description", "")
-                        final_data["model_description"] = full_model_data.get("description", "")
-
-                        # 替换为完整模型对象（包含 tags 等信息）
-                        final_data["model"] = full_model_data
-
+                        cls._merge_model_info(final_data, full_model_data)
                         merge_successful = True
 
                 # 如果合并成功或无 modelId，将结果缓存到数据库
                 if merge_successful or not model_id:
-                    db_manager.add_or_update_version_from_api(final_data, original_hash=sha256_hash)
+                    db_manager.add_or_update_version_from_api(
+                        final_data,
+                        original_hash=sha256_hash,
+                        etag=resp_version.headers.get("ETag"),
+                        last_modified=resp_version.headers.get("Last-Modified"),
+                    )
                 else:
                     print(f"[Civitai Toolkit] Merge failed for model ID {model_id}, API response will not be cached to allow retries.")
 
@@ -589,6 +1648,53 @@ class CivitaiAPIUtils:
             print(f"[Civitai Toolkit] General Error on API call (hash {sha256_hash[:12]}): {e}")
             return None
 
+    @staticmethod
+    def _merge_model_info(version_data, full_model_data):
+        """将模型主页信息合并进版本信息（原地修改）。"""
+        # 保留版本描述和模型主页描述
+        version_data["version_description"] = version_data.pop("description", "")
+        version_data["model_description"] = full_model_data.get("description", "")
+
+        # 替换为完整模型对象（包含 tags 等信息）
+        version_data["model"] = full_model_data
+        return version_data
+
+    @classmethod
+    def get_model_versions_by_hashes(cls, hashes, domain):
+        """
+        使用 Civitai 的批量哈希接口一次性查询多个哈希。
+
+        Returns:
+            dict or None: {hash: version_data}，只包含在 Civitai 上找到的哈希；
+            若批量接口不可用或请求失败则返回 None，由调用方回退到逐个查询。
+        """
+        wanted = {h.lower() for h in hashes if h}
+        if not wanted:
+            return {}
+
+        url = f"https://{domain}/api/v1/model-versions/by-hash"
+        try:
+            resp = cls._request_with_retry(
+                url, method="POST", json_body=sorted(wanted), retries=1
+            )
+            versions = resp.json()
+        except Exception as e:
+            print(f"[Civitai Toolkit] Batch hash lookup unavailable: {e}")
+            return None
+
+        if not isinstance(versions, list):
+            return None
+
+        results = {}
+        for version_data in versions:
+            if not isinstance(version_data, dict) or not version_data.get("id"):
+                continue
+            for f in version_data.get("files", []):
+                file_hash = (f.get("hashes", {}).get("SHA256") or "").lower()
+                if file_hash in wanted:
+                    results[file_hash] = version_data
+        return results
+
     @classmethod
     def get_civitai_info_from_hash(cls, model_hash):
         try:
@@ -611,11 +1717,7 @@ class CivitaiAPIUtils:
 
     @staticmethod
     def _parse_prompts(prompt_text: str):
-        if not isinstance(prompt_text, str) or not prompt_text.strip():
-            return []
-        pattern = re.compile(r"\(.+?:\d+\.\d+\)|<[^>]+>|\[[^\]]+\]|\([^)]+\)|[^,]+")
-        tags = pattern.findall(prompt_text)
-        return [tag.strip() for tag in tags if tag.strip()]
+        return prompt_tokenizer.parse_prompt_tags(prompt_text)
 
 
 def scan_all_supported_model_types(force=False):
@@ -636,6 +1738,91 @@ def scan_all_supported_model_types(force=False):
             )
 
 
+# =================================================================================
+# 相对路径索引
+# 扫描时把每个文件在 ComfyUI 中的相对路径与所在基础文件夹的序号写入 versions 表，
+# 列表函数只需一次按 (model_type, relative_path) 索引的查询，不再反向映射绝对路径。
+# 基础文件夹（extra_model_paths 等）变化时，按新的文件夹列表重新计算。
+# =================================================================================
+_valid_folder_paths = {}  # model_type -> 已验证与数据库一致的基础文件夹列表
+
+
+def _normalized_base_folders(model_type):
+    try:
+        return [os.path.normpath(f) for f in folder_paths.get_folder_paths(model_type) if f]
+    except Exception:
+        return []
+
+
+def _base_folder_index(path, base_folders):
+    """返回包含该文件的第一个基础文件夹的序号（与 ComfyUI 预览接口的 path_index 一致）"""
+    norm_path = os.path.normcase(os.path.normpath(path))
+    for i, folder in enumerate(base_folders):
+        folder = os.path.normcase(folder)
+        if norm_path.startswith(folder.rstrip(os.sep) + os.sep):
+            return i
+    return None
+
+
+def _mark_relative_paths_valid(model_type, base_folders=None):
+    base_folders = base_folders if base_folders is not None else _normalized_base_folders(model_type)
+    if _valid_folder_paths.get(model_type) != base_folders:
+        db_manager.set_setting(f"folder_paths_{model_type}", base_folders)
+        _valid_folder_paths[model_type] = base_folders
+
+
+def ensure_relative_paths(model_type):
+    """基础文件夹列表与上次写入相对路径时不同（或旧版数据库尚无相对路径）时重新计算"""
+    base_folders = _normalized_base_folders(model_type)
+    if _valid_folder_paths.get(model_type) == base_folders:
+        return
+    if db_manager.get_setting(f"folder_paths_{model_type}") == base_folders:
+        _valid_folder_paths[model_type] = base_folders
+        return
+
+    print(f"[Civitai Toolkit] Model folders for {model_type} changed. Rebuilding relative paths...")
+    with db_manager.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT local_path FROM versions WHERE model_type = ? AND local_path IS NOT NULL",
+            (model_type,),
+        ).fetchall()
+
+    updates = []
+    for row in rows:
+        local_path = os.path.normpath(row["local_path"])
+        index = _base_folder_index(local_path, base_folders)
+        relative_path = None
+        if index is not None:
+            relative_path = os.path.relpath(local_path, base_folders[index])
+            # 同一相对路径存在于多个基础文件夹时，ComfyUI 只使用第一个，其余文件被遮蔽
+            full_path = folder_paths.get_full_path(model_type, relative_path)
+            if not full_path or os.path.normcase(os.path.normpath(full_path)) != os.path.normcase(local_path):
+                relative_path = index = None
+        updates.append((relative_path, index, row["local_path"]))
+
+    with db_manager.get_connection() as conn:
+        conn.executemany(
+            "UPDATE versions SET relative_path = ?, base_folder_index = ? WHERE local_path = ?",
+            updates,
+        )
+    _mark_relative_paths_valid(model_type, base_folders)
+    _local_files_changed(model_type)
+
+
+def get_listed_relative_paths(model_type, known_relative_paths=None):
+    """数据库中已索引、且仍在 ComfyUI 文件列表中的相对路径（已排序）"""
+    ensure_relative_paths(model_type)
+    with db_manager.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT relative_path FROM versions WHERE model_type = ? AND relative_path IS NOT NULL",
+            (model_type,),
+        ).fetchall()
+    if known_relative_paths is None:
+        known_relative_paths = folder_paths.get_filename_list(model_type)
+    listed = set(known_relative_paths or [])
+    return sorted(row["relative_path"] for row in rows if row["relative_path"] in listed)
+
+
 def update_hash_in_db(file_info):
     """
     一个线程安全的函数，用于将单个文件的哈希结果写入数据库。
@@ -647,18 +1834,32 @@ def update_hash_in_db(file_info):
     try:
         with db_manager.get_connection() as conn:
             conn.execute(
-                "UPDATE versions SET local_path = NULL, local_mtime = NULL WHERE local_path = ?",
+                """
+                UPDATE versions SET local_path = NULL, local_mtime = NULL, relative_path = NULL, base_folder_index = NULL
+                WHERE local_path = ?
+                """,
                 (file_info["path"],),
             )
             conn.execute(
                 """
-                INSERT INTO versions (hash, local_path, local_mtime, name, model_type) VALUES (?, ?, ?, ?, ?)
+                INSERT INTO versions (hash, local_path, local_mtime, name, model_type, relative_path, base_folder_index)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(hash) DO UPDATE SET
                     local_path = excluded.local_path,
                     local_mtime = excluded.local_mtime,
-                    model_type = excluded.model_type
+                    model_type = excluded.model_type,
+                    relative_path = excluded.relative_path,
+                    base_folder_index = excluded.base_folder_index
                 """,
-                (file_info["hash"].lower(), file_info["path"], file_info["mtime"], os.path.basename(file_info["path"]), file_info["model_type"]),
+                (
+                    file_info["hash"].lower(),
+                    file_info["path"],
+                    file_info["mtime"],
+                    os.path.basename(file_info["path"]),
+                    file_info["model_type"],
+                    file_info.get("relative_path"),
+                    file_info.get("base_folder_index"),
+                ),
             )
             conn.commit()
         return True
@@ -668,6 +1869,7 @@ def update_hash_in_db(file_info):
 
 
 def sync_local_files_with_db(model_type: str, force=False):
+    from tqdm import tqdm
     if model_type not in SUPPORTED_MODEL_TYPES:
         return {"new": 0, "modified": 0, "hashed": 0}
 
@@ -680,29 +1882,63 @@ def sync_local_files_with_db(model_type: str, force=False):
     print(f"[Civitai Toolkit] Performing smart sync for local {model_type}...")
     local_files_on_disk = folder_paths.get_filename_list(model_type)
 
+    base_folders = _normalized_base_folders(model_type)
+
     with db_manager.get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT local_path, local_mtime FROM versions WHERE model_type = ?", (model_type,))
+        cursor.execute(
+            "SELECT local_path, local_mtime, relative_path, base_folder_index FROM versions WHERE model_type = ?",
+            (model_type,),
+        )
         db_files = {
-            os.path.normcase(os.path.normpath(row["local_path"])): row["local_mtime"]
+            os.path.normcase(os.path.normpath(row["local_path"])): row
             for row in cursor.fetchall() if row["local_path"]
         }
 
     files_to_hash = []
+    location_updates = []
+    seen_paths = set()
     for relative_path in local_files_on_disk:
         full_path = folder_paths.get_full_path(model_type, relative_path)
         if not full_path or not os.path.exists(full_path) or os.path.isdir(full_path):
             continue
 
         norm_full_path = os.path.normcase(os.path.normpath(full_path))
+        seen_paths.add(norm_full_path)
+        base_folder_index = _base_folder_index(norm_full_path, base_folders)
         try:
             mtime = os.path.getmtime(norm_full_path)
+            db_row = db_files.get(norm_full_path)
             # 关键逻辑：文件是全新的，或者修改时间不一致时，才需要哈希
-            if norm_full_path not in db_files or db_files[norm_full_path] != mtime:
-                files_to_hash.append({"path": full_path, "mtime": mtime})
+            if db_row is None or db_row["local_mtime"] != mtime:
+                files_to_hash.append(
+                    {
+                        "path": full_path,
+                        "mtime": mtime,
+                        "relative_path": relative_path,
+                        "base_folder_index": base_folder_index,
+                    }
+                )
+            elif (db_row["relative_path"], db_row["base_folder_index"]) != (relative_path, base_folder_index):
+                location_updates.append((relative_path, base_folder_index, db_row["local_path"]))
         except Exception as e:
             print(f"[Civitai Toolkit] Warning: Could not process file {relative_path}: {e}")
 
+    # 不在文件列表中的记录（已删除或被同名文件遮蔽）清空相对路径，不再出现在模型列表中
+    location_updates.extend(
+        (None, None, row["local_path"])
+        for norm_path, row in db_files.items()
+        if norm_path not in seen_paths and row["relative_path"] is not None
+    )
+    if location_updates:
+        with db_manager.get_connection() as conn:
+            conn.executemany(
+                "UPDATE versions SET relative_path = ?, base_folder_index = ? WHERE local_path = ?",
+                location_updates,
+            )
+        _local_files_changed(model_type)
+    _mark_relative_paths_valid(model_type)
+
     if not files_to_hash:
         db_manager.set_setting(last_sync_key, time.time())
         print(f"[Civitai Toolkit] Smart sync for {model_type} complete. No new or modified files found.")
@@ -733,83 +1969,277 @@ def sync_local_files_with_db(model_type: str, force=False):
                 print(f"\n[Civitai Toolkit] Error hashing file {os.path.basename(failed_file_info['path'])}: {e}. Skipping.")
 
     db_manager.set_setting(last_sync_key, time.time())
+    if hashed_count:
+        _local_files_changed(model_type)
     print(f"[Civitai Toolkit] Smart sync for {model_type} complete. Hashed {hashed_count} files.")
     return {"found": len(files_to_hash), "hashed": hashed_count}
 
 
-def get_local_model_maps(model_type: str, force_sync=False):
-    sync_local_files_with_db(model_type, force=force_sync)
-
-    # 1. 从数据库获取所有已知文件的绝对路径 -> 哈希映射
+def _build_local_model_maps(model_type: str, known_relative_paths=None):
+    ensure_relative_paths(model_type)
     with db_manager.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT hash, local_path FROM versions WHERE hash IS NOT NULL AND local_path IS NOT NULL AND model_type = ?",
+        rows = conn.execute(
+            "SELECT hash, relative_path FROM versions WHERE model_type = ? AND relative_path IS NOT NULL AND hash IS NOT NULL",
             (model_type,),
-        )
-        rows = cursor.fetchall()
-
-    abs_path_to_hash = {
-        os.path.normpath(row["local_path"]): row["hash"] for row in rows
-    }
+        ).fetchall()
 
-    # 2. 获取ComfyUI认可的相对路径列表
-    known_relative_paths = folder_paths.get_filename_list(model_type)
+    # 只保留仍在 ComfyUI 文件列表中的文件
+    if known_relative_paths is None:
+        known_relative_paths = folder_paths.get_filename_list(model_type)
+    listed = set(known_relative_paths or [])
 
     hash_to_filename = {}
     filename_to_hash = {}
+    for row in rows:
+        if row["relative_path"] in listed:
+            hash_to_filename[row["hash"]] = row["relative_path"]
+            filename_to_hash[row["relative_path"]] = row["hash"]
 
-    # 3. 遍历列表，构建新的映射
-    for relative_path in known_relative_paths:
-        full_path = os.path.normpath(
-            folder_paths.get_full_path(model_type, relative_path)
-        )
+    return hash_to_filename, NameIndex(filename_to_hash, _local_name_aliases(model_type))
 
-        # 从我们的数据库中查找这个文件的哈希
-        file_hash = abs_path_to_hash.get(full_path)
 
-        if file_hash:
-            hash_to_filename[file_hash] = relative_path
-            filename_to_hash[relative_path] = file_hash
+class LocalModelIndex:
+    """
+    进程内常驻的本地模型索引：哈希 ↔ 相对路径 ↔ 模型类型，查询都是一次字典查找。
+    启动时在后台构建；同步哈希新文件、ComfyUI 的文件列表变化（新增、删除或重命名文件）时
+    只重建受影响的模型类型；获取到新的 Civitai 信息时只在下次查询时更新该类型的别名。
+    """
 
-    return hash_to_filename, filename_to_hash
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._maps = {}  # model_type -> (hash_to_filename, NameIndex)
+        self._listings = {}  # model_type -> 构建时的文件列表
+        self._synced_at = {}  # model_type -> 上次同步检查的时间
+        self._stale = set()
+        self._aliases_stale = set()
+        self._hash_types = {}  # hash -> model_type
+        self.ready = threading.Event()
+
+    def build(self, model_types=None):
+        """构建（或重建）指定类型的索引，默认全部支持的类型；全部完成后置位 ready"""
+        for model_type in model_types or SUPPORTED_MODEL_TYPES:
+            try:
+                self._refresh(model_type, sync=False)
+            except Exception as e:
+                print(f"[Civitai Toolkit] Failed to index local {model_type}: {e}")
+        if model_types is None:
+            self.ready.set()
+            print(f"[Civitai Toolkit] Local model index ready ({len(self._hash_types)} files).")
+
+    def _refresh(self, model_type, sync=True, force_sync=False):
+        with self._lock:
+            if sync:
+                sync_local_files_with_db(model_type, force=force_sync)
+                self._synced_at[model_type] = time.time()
+            listing = folder_paths.get_filename_list(model_type) or []
+            if model_type in self._listings and listing != self._listings[model_type]:
+                model_list_provider.invalidate(model_type)
+            maps = _build_local_model_maps(model_type, listing)
+            for file_hash, owner in list(self._hash_types.items()):
+                if owner == model_type and file_hash not in maps[0]:
+                    del self._hash_types[file_hash]
+            for file_hash in maps[0]:
+                self._hash_types[file_hash] = model_type
+            self._maps[model_type] = maps
+            self._listings[model_type] = listing
+            self._stale.discard(model_type)
+            self._aliases_stale.discard(model_type)
+            return maps
+
+    def _refresh_aliases(self, model_type):
+        with self._lock:
+            if model_type in self._aliases_stale:
+                # 先清除标记：读取别名期间的新写入会再次标记，下次查询时生效
+                self._aliases_stale.discard(model_type)
+                hash_to_filename, filename_to_hash = self._maps[model_type]
+                # 替换而不是修改共享的 NameIndex，其他线程可能正在使用它
+                self._maps[model_type] = (
+                    hash_to_filename,
+                    NameIndex(filename_to_hash, _local_name_aliases(model_type)),
+                )
+            return self._maps[model_type]
+
+    def _needs_refresh(self, model_type):
+        if model_type not in self._maps or model_type in self._stale:
+            return True
+        # 同步间隔与原先的 last_sync 设置一致，但只在内存中记录时间，不读数据库
+        if time.time() - self._synced_at.get(model_type, 0) >= HASH_CACHE_REFRESH_INTERVAL:
+            return True
+        # ComfyUI 按目录修改时间缓存文件列表，比较列表即可发现文件变化
+        return (folder_paths.get_filename_list(model_type) or []) != self._listings.get(model_type)
+
+    def get_maps(self, model_type, force_sync=False):
+        """返回 (hash_to_filename, filename_to_hash)；返回的映射为共享对象，调用方不应修改"""
+        if force_sync or self._needs_refresh(model_type):
+            return self._refresh(model_type, force_sync=force_sync)
+        if model_type in self._aliases_stale:
+            return self._refresh_aliases(model_type)
+        return self._maps[model_type]
+
+    def hash_for(self, model_type, filename, force_sync=False):
+        return self.get_maps(model_type, force_sync)[1].get(filename)
+
+    def filename_for(self, file_hash, model_type=None):
+        """返回哈希对应的本地相对路径；不指定类型时按哈希所属的类型查找"""
+        if not file_hash:
+            return None
+        file_hash = file_hash.lower()
+        model_type = model_type or self._hash_types.get(file_hash)
+        if not model_type:
+            return None
+        return self.get_maps(model_type)[0].get(file_hash)
+
+    def type_of(self, file_hash):
+        return self._hash_types.get(file_hash.lower()) if file_hash else None
+
+    def invalidate(self, model_type=None):
+        """标记索引需要重建；下次查询该类型时重新从数据库读取"""
+        with self._lock:
+            self._stale.update([model_type] if model_type else self._maps)
+
+    def invalidate_aliases(self, model_type):
+        """
+        只标记别名需要更新，供频繁的版本信息写入使用：连续多次写入只在下次查询时
+        重新读取一次别名，不重建映射，也不触发同步检查。
+        不获取锁（set.add 是原子操作），写入方不会等待正在进行的同步。
+        """
+        self._aliases_stale.add(model_type)
+
+    def status(self):
+        return {
+            "ready": self.ready.is_set(),
+            "files": len(self._hash_types),
+            "types": {model_type: len(maps[0]) for model_type, maps in self._maps.items()},
+        }
+
+
+local_model_index = LocalModelIndex()
 
 
-def get_model_filenames_from_db_cached_only(model_type: str):
+def get_local_model_maps(model_type: str, force_sync=False):
+    return local_model_index.get_maps(model_type, force_sync=force_sync)
+
+
+_name_alias_cache = {}
+
+
+def _local_name_aliases(model_type):
+    """
+    本地模型的别名 {别名: 哈希}：Civitai 上的模型名称与原始文件名（用户可能重命名过本地文件）。
+    只在已获取信息的本地文件集合变化时重新解析 api_response。
+    """
+    with db_manager.get_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT v.hash, v.last_api_check, m.name AS model_name FROM versions v
+            LEFT JOIN models m ON m.model_id = v.model_id
+            WHERE v.model_type = ? AND v.local_path IS NOT NULL AND v.api_response IS NOT NULL
+            """,
+            (model_type,),
+        ).fetchall()
+        signature = hash(tuple(sorted((row["hash"], row["last_api_check"] or 0) for row in rows)))
+        cached = _name_alias_cache.get(model_type)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        aliases = {}
+        for row in rows:
+            if row["model_name"]:
+                aliases.setdefault(row["model_name"], row["hash"])
+        file_rows = conn.execute(
+            """
+            SELECT hash, api_response FROM versions
+            WHERE model_type = ? AND local_path IS NOT NULL AND api_response IS NOT NULL
+            """,
+            (model_type,),
+        ).fetchall()
+    for row in file_rows:
+        try:
+            files = json_lib.loads(row["api_response"]).get("files") or []
+        except (ValueError, AttributeError) as e:
+            # JSON 损坏或不是对象：该文件只保留模型名别名
+            print(f"[Civitai Toolkit] Skipping file-name aliases for {row['hash']}: {e}")
+            continue
+        for file_info in files:
+            if (file_info.get("hashes") or {}).get("SHA256", "").lower() == row["hash"] and file_info.get("name"):
+                aliases[file_info["name"]] = row["hash"]
+    _name_alias_cache[model_type] = (signature, aliases)
+    return aliases
+
+
+def get_local_embedding_names():
+    """本地 Embedding 文件名列表，用于在提示词中匹配引用（无需哈希）"""
+    try:
+        return folder_paths.get_filename_list("embeddings")
+    except Exception:
+        return []
+
+
+def get_model_filenames_from_db_cached_only(model_type: str, known_relative_paths=None):
     """
     一个绝对安全的函数，只从数据库缓存中读取模型列表，绝不触发扫描。
     专门用于UI加载，确保启动速度。
     如果数据库为空，则回退到显示文件夹中的所有模型。
     """
-    with db_manager.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT local_path FROM versions WHERE model_type = ? AND local_path IS NOT NULL ORDER BY local_path ASC",
-            (model_type,),
-        )
-        rows = cursor.fetchall()
+    if known_relative_paths is None:
+        known_relative_paths = folder_paths.get_filename_list(model_type)
+    if not known_relative_paths:
+        return []
+
+    db_relative_paths = get_listed_relative_paths(model_type, known_relative_paths)
+    if not db_relative_paths:
+        print(f"[Civitai Toolkit] No DB entries for {model_type}, showing all models from folder_paths")
+        return sorted(set(known_relative_paths))
+
+    return db_relative_paths
+
+
+class ModelListProvider:
+    """
+    节点下拉列表（INPUT_TYPES）的缓存。每个模型类型有一个版本号，同步写入新文件或
+    相对路径变化时递增；缓存键还包含 ComfyUI 当前文件列表的长度与哈希，
+    文件被删除或改名后即使尚未同步数据库，列表也会在下一次请求时重新读取。
+    """
 
-    known_relative_paths = folder_paths.get_filename_list(model_type)
-    if not known_relative_paths:
-        return []
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._lists = {}  # 模型类型元组 -> (缓存键, 列表)
+
+    def version(self, model_type):
+        return self._versions.get(model_type, 0)
+
+    def invalidate(self, model_type=None):
+        with self._lock:
+            for mt in [model_type] if model_type else SUPPORTED_MODEL_TYPES:
+                self._versions[mt] = self._versions.get(mt, 0) + 1
+
+    def get(self, *model_types):
+        """返回一个或多个类型合并、去重并排序后的文件名列表；返回的列表为共享对象，调用方不应修改"""
+        # 先取版本与文件列表再读取，读取期间发生的失效会在下次请求时生效
+        listings = [folder_paths.get_filename_list(mt) for mt in model_types]
+        key = tuple(
+            (self.version(mt), len(listing), hash(tuple(listing)))
+            for mt, listing in zip(model_types, listings)
+        )
+        cached = self._lists.get(model_types)
+        if cached and cached[0] == key:
+            return cached[1]
+        if len(model_types) == 1:
+            names = get_model_filenames_from_db_cached_only(model_types[0], listings[0])
+        else:
+            names = sorted({name for mt in model_types for name in self.get(mt)})
+        self._lists[model_types] = (key, names)
+        return names
 
-    full_path_map = {
-        os.path.normpath(folder_paths.get_full_path(model_type, f)): f
-        for f in known_relative_paths
-    }
 
-    db_relative_paths = []
-    for row in rows:
-        full_path = os.path.normpath(row["local_path"])
-        relative_path = full_path_map.get(full_path)
-        if relative_path:
-            db_relative_paths.append(relative_path)
+model_list_provider = ModelListProvider()
 
-    if not db_relative_paths:
-        print(f"[Civitai Toolkit] No DB entries for {model_type}, showing all models from folder_paths")
-        return sorted(list(set(known_relative_paths)))
 
-    return sorted(list(set(db_relative_paths)))
+def _local_files_changed(model_type=None):
+    """本地文件或其相对路径变化后，让模型索引与下拉列表在下次使用时重建"""
+    local_model_index.invalidate(model_type)
+    model_list_provider.invalidate(model_type)
 
 
 def get_model_filenames_from_db(model_type: str, force_sync=False):
@@ -819,29 +2249,7 @@ def get_model_filenames_from_db(model_type: str, force_sync=False):
     并与ComfyUI的已知路径交叉引用以确保准确性。
     """
     sync_local_files_with_db(model_type, force=force_sync)
-
-    with db_manager.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT local_path FROM versions WHERE model_type = ? AND local_path IS NOT NULL ORDER BY local_path ASC",
-            (model_type,),
-        )
-        rows = cursor.fetchall()
-
-    known_relative_paths = folder_paths.get_filename_list(model_type)
-    full_path_map = {
-        os.path.normpath(folder_paths.get_full_path(model_type, f)): f
-        for f in known_relative_paths
-    }
-
-    db_relative_paths = []
-    for row in rows:
-        full_path = os.path.normpath(row["local_path"])
-        relative_path = full_path_map.get(full_path)
-        if relative_path:
-            db_relative_paths.append(relative_path)
-
-    return sorted(list(set(db_relative_paths)))
+    return get_listed_relative_paths(model_type)
 
 
 def get_legacy_cache_files():
@@ -951,6 +2359,12 @@ def migrate_legacy_caches():
                     total_skipped += 1
             os.rename(path, path + ".migrated")
 
+    # 迁移的记录没有相对路径，下次列出模型时重新计算
+    for model_type in ("checkpoints", "loras"):
+        db_manager.set_setting(f"folder_paths_{model_type}", None)
+        _valid_folder_paths.pop(model_type, None)
+        _local_files_changed(model_type)
+
     return {
         "migrated": total_migrated,
         "skipped": total_skipped,
@@ -968,214 +2382,231 @@ def prepare_models_and_get_list(model_type: str, force_sync=True):
 # =================================================================================
 # 4. 数据获取与处理
 # =================================================================================
-def fetch_civitai_data_by_hash(model_hash, sort, limit, nsfw_level, filter_type=None):
-    version_info = CivitaiAPIUtils.get_model_version_info_by_hash(model_hash)
-    if not version_info or "id" not in version_info:
-        raise ValueError(
-            "Could not find model version ID on Civitai using provided hash."
-        )
+def _filter_image_items(items, filter_type=None):
+    """只保留带 meta 的条目，并按媒体类型筛选"""
+    items_with_meta = [img for img in items if img.get("meta")]
+    if filter_type == "video":
+        return [img for img in items_with_meta if img.get("type") == "video"]
+    if filter_type == "image":
+        return [img for img in items_with_meta if img.get("type") != "video"]
+    return items_with_meta
+
+
+def iter_civitai_image_pages(
+    version_id, sort, nsfw_level, domain=None, prefetch=IMAGE_PREFETCH_PAGES, resume=None
+):
+    """
+    按顺序逐页产出 /api/v1/images 的结果：(page_index, items, resume_token)。
 
-    version_id = version_info["id"]
-    domain = _get_active_domain()
-    filtered_results, page, API_PAGE_LIMIT = [], 1, 100
+    - 接口返回 totalPages 时按页码流水线请求，最多保持 prefetch 页同时在途；
+    - 否则跟随 metadata.nextPage 游标链接，在调用方处理当前页时预取下一页。
+    resume_token 可传回 resume 参数，从下一页继续获取；为 None 表示已到末尾。
+    调用方提前停止迭代时，尚未开始的请求会被取消。
+    """
+    domain = domain or _get_active_domain()
+    api_url = f"https://{domain}/api/v1/images"
+    base_params = {
+        "modelVersionId": version_id,
+        "limit": IMAGE_PAGE_SIZE,
+        "sort": sort,
+        "nsfw": nsfw_level,
+    }
 
-    with tqdm(total=limit, desc="Fetching Recipes") as pbar:
-        while len(filtered_results) < limit:
-            params = {
-                "modelVersionId": version_id,
-                "limit": API_PAGE_LIMIT,
-                "sort": sort,
-                "nsfw": nsfw_level,
-                "page": page,
-            }
-            api_url = f"https://{domain}/api/v1/images"
-            try:
-                response = CivitaiAPIUtils._request_with_retry(api_url, params=params)
-                items = response.json().get("items", [])
-            except Exception as e:
-                print(f"[Civitai Toolkit] Halting fetch due to persistent API error: {e}")
-                break
+    def fetch(page=None, url=None):
+        if url:
+            response = CivitaiAPIUtils._request_with_retry(url)
+        else:
+            response = CivitaiAPIUtils._request_with_retry(
+                api_url, params={**base_params, "page": page}
+            )
+        payload = response.json()
+        return payload.get("items", []), payload.get("metadata") or {}
 
-            if not items:
-                print("[Civitai Toolkit] Reached the end of available results from API.")
-                if pbar.n < limit:
-                    pbar.update(limit - pbar.n)
-                break
+    resume = resume or {"page": 1}
+    page_index = resume.get("page", 1)
+    items, metadata = fetch(page=page_index, url=resume.get("url"))
+    total_pages = metadata.get("totalPages")
 
-            items_with_meta = [img for img in items if img.get("meta")]
+    if not items:
+        yield page_index, items, None
+        return
 
-            page_filtered = []
-            if filter_type == "video":
-                page_filtered = [
-                    img for img in items_with_meta if img.get("type") == "video"
-                ]
-            elif filter_type == "image":
-                page_filtered = [
-                    img for img in items_with_meta if img.get("type") != "video"
-                ]
-            else:
-                page_filtered = items_with_meta
+    if total_pages:
+        # 页码模式：页之间没有依赖，可以并发预取
+        yield page_index, items, (
+            {"page": page_index + 1} if page_index < total_pages else None
+        )
+        executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+        pending = {}
+        next_to_submit = next_to_yield = page_index + 1
+        try:
+            while next_to_yield <= total_pages:
+                while next_to_submit <= total_pages and len(pending) < prefetch:
+                    pending[next_to_submit] = executor.submit(fetch, page=next_to_submit)
+                    next_to_submit += 1
+                items, _ = pending.pop(next_to_yield).result()
+                has_more = bool(items) and next_to_yield < total_pages
+                yield next_to_yield, items, (
+                    {"page": next_to_yield + 1} if has_more else None
+                )
+                if not has_more:
+                    break
+                next_to_yield += 1
+        finally:
+            for future in pending.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+        return
 
-            filtered_results.extend(page_filtered)
-            pbar.update(min(len(filtered_results), limit) - pbar.n)
-            page += 1
-            if len(filtered_results) >= limit:
+    # 游标模式：下一页的地址依赖当前页，只能在处理当前页时预取下一页
+    executor = ThreadPoolExecutor(max_workers=1)
+    next_future = None
+    try:
+        while True:
+            next_url = metadata.get("nextPage")
+            next_future = executor.submit(fetch, url=next_url) if next_url else None
+            yield page_index, items, (
+                {"url": next_url, "page": page_index + 1} if next_url else None
+            )
+            if not next_future:
+                break
+            items, metadata = next_future.result()
+            next_future = None
+            page_index += 1
+            if not items:
+                yield page_index, items, None
                 break
-            time.sleep(0.1)
-
-    final_results = filtered_results[:limit]
-    for img in final_results:
-        db_manager.add_downloaded_image(
-            url=img["url"],
-            local_filename=None,
-            version_id=version_id,
-            meta=img.get("meta"),
+    finally:
+        if next_future:
+            next_future.cancel()
+        executor.shutdown(wait=False)
+
+
+def stream_civitai_data_by_hash(model_hash, sort, limit, nsfw_level, filter_type=None):
+    """
+    逐批产出已筛选的图片条目：每解析完一页就产出该页的结果，并立即写入 images 表。
+    产出的总数不超过 limit；调用方可随时停止迭代，未开始的页请求会被取消。
+    """
+    from tqdm import tqdm
+    version_info = CivitaiAPIUtils.get_model_version_info_by_hash(model_hash)
+    if not version_info or "id" not in version_info:
+        raise ValueError(
+            "Could not find model version ID on Civitai using provided hash."
         )
-    return final_results
 
+    version_id = version_info["id"]
+    collected = 0
+    prefetch = min(IMAGE_PREFETCH_PAGES, max(1, math.ceil(limit / IMAGE_PAGE_SIZE)))
 
-def extract_resources_from_meta(meta, filename_to_lora_hash_map, session_cache=None):
-    if not isinstance(meta, dict):
-        return {"ckpt_hash": None, "ckpt_name": "unknown", "loras": []}
-    if session_cache is None:
-        session_cache = {}
+    with tqdm(total=limit, desc="Fetching Recipes") as pbar:
+        pages = iter_civitai_image_pages(version_id, sort, nsfw_level, prefetch=prefetch)
+        try:
+            for _, items, resume_token in pages:
+                batch = _filter_image_items(items, filter_type)[: limit - collected]
+                if batch:
+                    collected += len(batch)
+                    pbar.update(len(batch))
+                    db_manager.add_fetched_images(batch, version_id)
+                    yield batch
+                if collected >= limit:
+                    break
+                if resume_token is None:
+                    print("[Civitai Toolkit] Reached the end of available results from API.")
+                    break
+        except Exception as e:
+            print(f"[Civitai Toolkit] Halting fetch due to persistent API error: {e}")
+        finally:
+            pages.close()
 
-    ckpt_hash, ck_name = meta.get("Model hash"), meta.get("Model")
-    loras, vaes, seen_hashes, seen_names = [], [], set(), set()
 
-    def add_lora(lora_info):
-        lora_hash, lora_name = lora_info.get("hash"), lora_info.get("name")
-        if lora_hash and lora_hash in seen_hashes:
-            return
-        if not lora_hash and lora_name and lora_name in seen_names:
-            return
-        loras.append(lora_info)
-        if lora_hash:
-            seen_hashes.add(lora_hash)
-        if lora_name:
-            seen_names.add(lora_name)
-
-    if isinstance(meta.get("civitaiResources"), list):
-        for res in meta["civitaiResources"]:
-            if not isinstance(res, dict) or not (
-                version_id := res.get("modelVersionId")
-            ):
-                continue
+def fetch_civitai_data_by_hash(model_hash, sort, limit, nsfw_level, filter_type=None):
+    results = []
+    for batch in stream_civitai_data_by_hash(
+        model_hash, sort, limit, nsfw_level, filter_type
+    ):
+        results.extend(batch)
+    return results
 
-            cached_resource = session_cache.get(str(version_id))
-            if not cached_resource:
-                continue
 
-            version_info = cached_resource.get("info")
-            res_hash = cached_resource.get("hash")
+def analysis_stream_key(version_id, sort, nsfw_level, filter_type=None):
+    return f"{version_id}|{sort}|{nsfw_level}|{filter_type or 'all'}"
 
-            res_type = res.get("type", "").lower()
-            if version_info and not res_type:
-                res_type = version_info.get("model", {}).get("type", "").lower()
 
-            if res_type == "lora":
-                add_lora(
-                    {
-                        "hash": res_hash,
-                        "name": res.get("modelVersionName")
-                        or (
-                            version_info.get("model", {}).get("name")
-                            if version_info
-                            else None
-                        ),
-                        "weight": safe_float_conversion(res.get("weight")),
-                        "modelVersionId": version_id,
-                    }
-                )
-            elif res_type in ["checkpoint", "model"] and not ckpt_hash:
-                ckpt_hash = res_hash
-                if res.get("modelVersionName") and not ck_name:
-                    ck_name = res["modelVersionName"]
-
-    if isinstance(meta.get("resources"), list):
-        for res in meta["resources"]:
-            if isinstance(res, dict) and res.get("type", "").lower() == "lora":
-                lora_name, lora_hash = res.get("name"), res.get("hash")
-                if not lora_hash and lora_name:
-                    lora_hash = filename_to_lora_hash_map.get(
-                        lora_name
-                    ) or filename_to_lora_hash_map.get(f"{lora_name}.safetensors")
-                add_lora(
-                    {
-                        "hash": lora_hash,
-                        "name": lora_name,
-                        "weight": safe_float_conversion(res.get("weight")),
-                    }
-                )
-            elif (
-                isinstance(res, dict)
-                and res.get("type", "").lower() == "model"
-                and not ckpt_hash
-            ):
-                ckpt_hash, ck_name = res.get("hash"), res.get("name")
-
-    if isinstance(meta.get("hashes"), dict):
-
-        is_new_hash_format = any(':' in k for k in meta['hashes'].keys())
-
-        if is_new_hash_format:
-            print("[Civitai Toolkit] Detected new hash format, applying special parsing logic.")
-            for key, short_hash in meta['hashes'].items():
-                key_lower = key.lower()
-
-                if key_lower.startswith("lora:"):
-                    # 从键名中提取文件名，并清理路径分隔符
-                    lora_filename = key[5:].replace('\\', '/').split('/')[-1]
-                    # 通过文件名反查完整的哈希值
-                    full_hash = filename_to_lora_hash_map.get(lora_filename)
-
-                    if not full_hash:
-                        print(f"[Civitai Toolkit] Warning: LoRA '{lora_filename}' found in metadata, but not in local file map. Cannot get full hash.")
-
-                    add_lora({
-                        "hash": full_hash or short_hash, # 优先使用完整的哈希
-                        "name": lora_filename,
-                        "weight": 1.0, # 这种格式没有提供权重，默认为 1.0
-                    })
-
-                elif key_lower.startswith("model:"):
-                    ckpt_hash = short_hash
-                    ck_name = key[6:]  # 提取模型名
-                elif key_lower == "model":
-                    if not ckpt_hash:
-                        ckpt_hash = short_hash
-                elif "vae" in key_lower:
-                    vaes.append({
-                        "hash": short_hash,
-                        "name": key,})
-
-        # 保留原有的逻辑以兼容旧格式
-        elif isinstance(meta["hashes"].get("lora"), dict):
-            for hash_val, weight in meta["hashes"]["lora"].items():
-                add_lora(
-                    {
-                        "hash": hash_val,
-                        "name": None,
-                        "weight": safe_float_conversion(weight),
-                    }
-                )
+def load_analysis_pages(model_hash, sort, limit, nsfw_level, filter_type=None, force_refresh=False):
+    """
+    返回覆盖前 limit 条带 meta 图片所需的分析页（按页序）及其数据流键。
+    已保存的页直接复用，只有不足 limit 时才从上次停下的位置继续获取缺少的尾部页。
+    """
+    from tqdm import tqdm
+    version_info = CivitaiAPIUtils.get_model_version_info_by_hash(model_hash)
+    if not version_info or "id" not in version_info:
+        raise ValueError(
+            "Could not find model version ID on Civitai using provided hash."
+        )
+    version_id = version_info["id"]
+    stream_key = analysis_stream_key(version_id, sort, nsfw_level, filter_type)
 
-    for i in range(1, 10):
-        if meta.get(f"AddNet Module {i}") == "LoRA" and f"AddNet Model {i}" in meta:
-            model_str = meta.get(f"AddNet Model {i}", "")
-            match = re.search(r"\((\w+)\)", model_str)
-            if match:
-                add_lora(
-                    {
-                        "hash": match.group(1),
-                        "name": model_str.split("(")[0].strip(),
-                        "weight": safe_float_conversion(
-                            meta.get(f"AddNet Weight A {i}")
-                        ),
-                    }
-                )
+    if force_refresh:
+        db_manager.clear_analysis_stream(stream_key)
+    stream, pages = db_manager.get_analysis_stream(stream_key)
+    if stream:
+        # 旧版数据库没有 created_at，按最后更新时间计算
+        stored_at = stream["created_at"] if stream["created_at"] is not None else stream["updated_at"]
+        if time.time() - (stored_at or 0) >= ANALYSIS_STREAM_TTL:
+            db_manager.clear_analysis_stream(stream_key)
+            stream, pages = None, []
+    collected = sum(page["item_count"] for page in pages)
+
+    if collected < limit and not (stream and stream["exhausted"]):
+        resume = None
+        if pages:
+            resume = json_lib.loads(stream["resume_token"]) if stream and stream["resume_token"] else None
+            if resume is None:
+                # 数据流状态丢失时从头获取
+                db_manager.clear_analysis_stream(stream_key)
+                pages, collected = [], 0
+        if pages:
+            print(
+                f"[Civitai Toolkit] Reusing {collected} stored recipes, fetching the remaining {limit - collected}..."
+            )
+        remaining = limit - collected
+        prefetch = min(IMAGE_PREFETCH_PAGES, max(1, math.ceil(remaining / IMAGE_PAGE_SIZE)))
+        page_iter = iter_civitai_image_pages(
+            version_id, sort, nsfw_level, prefetch=prefetch, resume=resume
+        )
+        try:
+            with tqdm(total=limit, initial=collected, desc="Fetching Recipes") as pbar:
+                for page_index, items, resume_token in page_iter:
+                    batch = _filter_image_items(items, filter_type)
+                    metas = [img["meta"] for img in batch]
+                    db_manager.append_analysis_page(
+                        stream_key, version_id, page_index, metas, resume_token
+                    )
+                    if batch:
+                        db_manager.add_fetched_images(batch, version_id)
+                    pages.append(
+                        {"page_index": page_index, "item_count": len(metas), "metas": metas, "partial": None}
+                    )
+                    collected += len(metas)
+                    pbar.update(min(len(metas), max(0, limit - pbar.n)))
+                    if collected >= limit:
+                        break
+                    if resume_token is None:
+                        print("[Civitai Toolkit] Reached the end of available results from API.")
+                        break
+        except Exception as e:
+            print(f"[Civitai Toolkit] Halting fetch due to persistent API error: {e}")
+        finally:
+            page_iter.close()
 
-    return {"ckpt_hash": ckpt_hash, "ckpt_name": ck_name, "loras": loras, "vaes": vaes}
+    # 只返回覆盖 limit 所需的页
+    needed, total = [], 0
+    for page in pages:
+        if total >= limit:
+            break
+        needed.append(page)
+        total += page["item_count"]
+    return stream_key, needed
 
 
 # =================================================================================
@@ -1214,25 +2645,22 @@ def sort_tags_by_frequency(meta_tags):
         return []
 
 
-def safe_float_conversion(value, default=1.0):
-    if value is None:
-        return default
-    if isinstance(value, (float, int)):
-        return float(value)
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return default
-
-
 def get_civitai_triggers(file_name, file_hash, force_refresh):
     if force_refresh == "no":
         version = db_manager.get_version_by_hash(file_hash)
         if version and version["trained_words"]:
             try:
-                return json_lib.loads(version["trained_words"])
+                triggers = json_lib.loads(version["trained_words"])
             except Exception:
-                pass
+                triggers = None
+            if triggers is not None:
+                if api_cache_policy.is_stale(version["last_api_check"]):
+                    api_cache_policy.schedule_refresh(
+                        f"hash:{file_hash.lower()}",
+                        CivitaiAPIUtils._revalidate_hash,
+                        file_hash.lower(),
+                    )
+                return triggers
 
     print(f"[Civitai Toolkit] Requesting civitai triggers from API for: {file_name}")
     model_info = CivitaiAPIUtils.get_model_version_info_by_hash(
@@ -1246,40 +2674,77 @@ def get_civitai_triggers(file_name, file_hash, force_refresh):
     return triggers
 
 
-def format_tags_as_markdown(pos_items, neg_items, top_n):
+def format_tags_as_markdown(pos_items, neg_items, top_n, pos_weights=None, neg_weights=None):
     md_lines = ["## Prompt Tag Analysis\n"]
+
+    def tag_table(title, items, weights):
+        if weights:
+            md_lines.extend(
+                [
+                    f"### {title}",
+                    "| Rank | Tag | Count | Avg. Weight |",
+                    "|:----:|:----|:-----:|:-----------:|",
+                ]
+            )
+            md_lines.extend(
+                [
+                    f"| {i + 1} | `{tag}` | **{count}** | `{weights.get(tag, 1.0):.2f}` |"
+                    for i, (tag, count) in enumerate(items[:top_n])
+                ]
+            )
+        else:
+            md_lines.extend([f"### {title}", "| Rank | Tag | Count |", "|:----:|:----|:-----:|"])
+            md_lines.extend(
+                [
+                    f"| {i + 1} | `{tag}` | **{count}** |"
+                    for i, (tag, count) in enumerate(items[:top_n])
+                ]
+            )
+
     if pos_items:
-        md_lines.extend(
-            ["### Positive Tags", "| Rank | Tag | Count |", "|:----:|:----|:-----:|"]
-        )
-        md_lines.extend(
-            [
-                f"| {i + 1} | `{tag}` | **{count}** |"
-                for i, (tag, count) in enumerate(pos_items[:top_n])
-            ]
-        )
+        tag_table("Positive Tags", pos_items, pos_weights)
     else:
         md_lines.append("_No positive tags found._")
 
     md_lines.append("\n")
     if neg_items:
-        md_lines.extend(
-            ["### Negative Tags", "| Rank | Tag | Count |", "|:----:|:----|:-----:|"]
-        )
-        md_lines.extend(
-            [
-                f"| {i + 1} | `{tag}` | **{count}** |"
-                for i, (tag, count) in enumerate(neg_items[:top_n])
-            ]
-        )
+        tag_table("Negative Tags", neg_items, neg_weights)
     else:
         md_lines.append("_No negative tags found._")
     return "\n".join(md_lines)
 
 
-def format_parameters_as_markdown(param_counts, total_images, summary_top_n=5):
+def _format_number(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def _format_numeric_summary(stats):
+    """数值参数的中位数、四分位距、范围与直方图"""
+    low, high = stats["recommended_range"]
+    lines = [
+        (
+            f"Median **{_format_number(stats['median'])}** · "
+            f"IQR {_format_number(stats['q1'])}–{_format_number(stats['q3'])} · "
+            f"Range {_format_number(stats['min'])}–{_format_number(stats['max'])} · "
+            f"Recommended **{_format_number(low)}–{_format_number(high)}**\n"
+        )
+    ]
+    histogram = stats.get("histogram") or []
+    peak = max((count for _, _, count in histogram), default=0)
+    if len(histogram) > 1 and peak:
+        lines.append("```")
+        for start, end, count in histogram:
+            bar = "█" * max(1 if count else 0, round(count / peak * 20))
+            lines.append(f"{start:>7.2f} – {end:<7.2f} {bar} {count}")
+        lines.append("```")
+    return "\n".join(lines)
+
+
+def format_parameters_as_markdown(param_counts, total_images, summary_top_n=5, numeric_stats=None):
+    """numeric_stats 为 analysis.numeric_param_stats 的结果，提供时数值参数按数值合并并附带分布统计"""
     if total_images == 0:
         return "No parameter data found."
+    numeric_stats = numeric_stats or {}
 
     md_lines = ["### Generation Parameters Analysis\n"]
     param_map = {
@@ -1296,7 +2761,13 @@ def format_parameters_as_markdown(param_counts, total_images, summary_top_n=5):
 
     for key, title in param_map.items():
         md_lines.append(f"#### {title}\n")
-        stats = Counter(param_counts.get(key, {})).most_common(summary_top_n)
+        numeric = numeric_stats.get(key)
+        if numeric:
+            stats = numeric["top_values"][:summary_top_n]
+        elif key == "Size" and numeric_stats.get("sizes"):
+            stats = numeric_stats["sizes"][:summary_top_n]
+        else:
+            stats = Counter(param_counts.get(key, {})).most_common(summary_top_n)
         if not stats:
             md_lines.append("_No data found._\n")
             continue
@@ -1306,23 +2777,46 @@ def format_parameters_as_markdown(param_counts, total_images, summary_top_n=5):
         for i, (value, count) in enumerate(stats):
             percentage = (count / total_images) * 100
             md_lines.append(
-                f"| {i + 1} | `{value}` | **{count}** ({percentage:.1f}%) |"
+                f"| {i + 1} | `{_format_number(value)}` | **{count}** ({percentage:.1f}%) |"
+            )
+        if numeric:
+            md_lines.append("\n" + _format_numeric_summary(numeric))
+        elif key == "Size" and "width" in numeric_stats and "height" in numeric_stats:
+            width, height = numeric_stats["width"], numeric_stats["height"]
+            md_lines.append(
+                f"\nMedian **{width['median']}x{height['median']}** · "
+                f"Width {width['min']}–{width['max']} · Height {height['min']}–{height['max']}"
             )
         md_lines.append("\n")
     return "\n".join(md_lines)
 
 
+def _lora_weight_stats(data):
+    """由权重直方图计算平均权重与众数权重；兼容旧缓存中的完整权重列表"""
+    hist = data.get("weight_hist")
+    if hist:
+        total = sum(hist.values())
+        mode_bucket = max(hist.items(), key=lambda kv: kv[1])[0]
+        return data.get("weight_sum", 0.0) / total, float(mode_bucket)
+    weights = data.get("weights", [])
+    if not weights:
+        return 0, 0
+    return statistics.mean(weights), statistics.mode(weights)
+
+
 def format_resources_as_markdown(assoc_stats, total_images, summary_top_n=5):
     domain = _get_active_domain()
     md_lines = ["### Associated Resources Analysis\n"]
 
-    for res_type in ["lora", "model", "vae"]:
+    for res_type in ["lora", "model", "vae", "embedding"]:
         stats_dict = assoc_stats.get(res_type, {})
         title = "LoRAs"
         if res_type == "model":
             title = "Checkpoints"
         elif res_type == "vae":
             title = "VAEs"
+        elif res_type == "embedding":
+            title = "Embeddings"
         md_lines.append(f"#### Top {summary_top_n} Associated {title}\n")
 
         if not stats_dict or total_images == 0:
@@ -1348,12 +2842,24 @@ def format_resources_as_markdown(assoc_stats, total_images, summary_top_n=5):
                     else f"`{actual_name}`"
                 )
                 percentage = (data["count"] / total_images) * 100
-                weights = data.get("weights", [])
-                avg_weight = statistics.mean(weights) if weights else 0
-                common_weight = statistics.mode(weights) if weights else 0
+                avg_weight, common_weight = _lora_weight_stats(data)
                 md_lines.append(
                     f"| {i + 1} | {display_name} | **{percentage:.1f}%** | `{avg_weight:.2f}` | `{common_weight:.2f}` |"
                 )
+        elif res_type == "embedding":
+            # 提示词中引用、且本地存在的 Embedding
+            md_lines.extend(
+                [
+                    "| Rank | Embedding | Usage | In Positive | In Negative |",
+                    "|:----:|:----------|:-----:|:-----------:|:-----------:|",
+                ]
+            )
+            for i, data in enumerate(sorted_resources[:summary_top_n]):
+                percentage = (data["count"] / total_images) * 100
+                md_lines.append(
+                    f"| {i + 1} | `{data.get('local_file') or data.get('name')}` | **{percentage:.1f}%** | "
+                    f"{data.get('positive', 0)} | {data.get('negative', 0)} |"
+                )
         else:
             md_lines.extend(
                 [
@@ -1522,11 +3028,81 @@ def format_info_as_markdown(meta, recipe_loras, lora_hash_map, missing_ckpt_hash
     return "\n".join(md_parts)
 
 
-def fetch_missing_model_info_from_civitai():
+def _fetch_model_info_batched(hashes):
+    """
+    批量模式：按 BATCH_HASH_LOOKUP_SIZE 分组调用批量哈希接口，
+    再按 modelId 分组获取模型主页信息（每个模型只请求一次）。
+    返回需要回退到逐个查询的哈希列表。
+    """
+    from tqdm import tqdm
+    domain = _get_active_domain()
+    resolved, fallback = {}, []
+    chunks = [
+        hashes[i : i + BATCH_HASH_LOOKUP_SIZE]
+        for i in range(0, len(hashes), BATCH_HASH_LOOKUP_SIZE)
+    ]
+
+    for index, chunk in enumerate(tqdm(chunks, desc="Batch Hash Lookup")):
+        results = CivitaiAPIUtils.get_model_versions_by_hashes(chunk, domain)
+        if results is None:
+            if index == 0:
+                # 第一组就失败，说明接口不可用，全部回退
+                return hashes
+            fallback.extend(chunk)
+            continue
+        for model_hash in chunk:
+            if model_hash.lower() in results:
+                resolved[model_hash.lower()] = results[model_hash.lower()]
+            else:
+                db_manager.mark_hash_as_not_found(model_hash)
+
+    if not resolved:
+        return fallback
+
+    hashes_by_model = {}
+    for model_hash, version_data in resolved.items():
+        model_id = version_data.get("modelId")
+        hashes_by_model.setdefault(model_id, []).append(model_hash)
+
+    print(
+        f"[Civitai Toolkit] Resolved {len(resolved)} hashes in batch, "
+        f"fetching details for {len(hashes_by_model)} unique models..."
+    )
+
+    def model_worker(model_id):
+        full_model_data = (
+            CivitaiAPIUtils.get_model_info_by_id(model_id, domain) if model_id else None
+        )
+        if model_id and not full_model_data:
+            print(
+                f"[Civitai Toolkit] Model details unavailable for ID {model_id}, "
+                "caching version info without them."
+            )
+        for model_hash in hashes_by_model[model_id]:
+            final_data = dict(resolved[model_hash])
+            if full_model_data:
+                CivitaiAPIUtils._merge_model_info(final_data, full_model_data)
+            # 获取模型主页失败时仍缓存版本信息：读取时从 models 表还原模型信息，过期后重新验证时再合并
+            db_manager.add_or_update_version_from_api(final_data, original_hash=model_hash)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = {executor.submit(model_worker, mid): mid for mid in hashes_by_model}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching Model Details"):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"\n[Civitai Toolkit] Error fetching model details for ID {futures[future]}: {e}")
+
+    return fallback
+
+
+def fetch_missing_model_info_from_civitai(batch=True):
     """
     联网为数据库中缺少API信息的模型获取数据。
     这个函数会阻塞，直到所有后台的获取和写入任务都完成。
+    batch=True 时优先使用批量哈希接口，失败的部分自动回退到逐个查询。
     """
+    from tqdm import tqdm
     print("[Civitai Toolkit] Checking for models missing Civitai info...")
 
     with db_manager.get_connection() as conn:
@@ -1543,6 +3119,13 @@ def fetch_missing_model_info_from_civitai():
 
     print(f"[Civitai Toolkit] Found {len(hashes_to_fetch)} models to fetch info for...")
 
+    if batch:
+        hashes_to_fetch = _fetch_model_info_batched(hashes_to_fetch)
+        if not hashes_to_fetch:
+            print("[Civitai Toolkit] Finished fetching and caching missing model info.")
+            return
+        print(f"[Civitai Toolkit] Falling back to per-hash lookup for {len(hashes_to_fetch)} models...")
+
     def fetch_worker(model_hash):
         # 每个线程独立调用 get_model_version_info_by_hash。
         # 该函数内部会自己处理数据库的写入和提交操作。
@@ -1568,6 +3151,7 @@ def fetch_missing_model_info_from_civitai():
 
 
 def download_image_safely(job):
+    import requests
     final_path = job["path"]
     temp_path = final_path + ".tmp"
     if os.path.exists(temp_path):
@@ -1595,10 +3179,206 @@ def download_image_safely(job):
         return False
 
 
+def download_file_resumable(url, temp_path, chunk_size=1 << 16, timeout=30):
+    """
+    以流式分块的方式把 url 下载到 temp_path，内存占用与文件大小无关。
+    temp_path 已存在时通过 HTTP Range 从断点续传；服务器不支持 Range 时从头下载。
+    返回响应的 Content-Type。下载不完整时抛出 OSError，并保留临时文件以便下次续传。
+    同一 temp_path 不能被并发下载，调用方需自行去重。
+    """
+    import requests
+    # 要求原始字节：Content-Length 与 Range 都以编码后的字节计算，压缩传输时无法校验或续传
+    headers = {"User-Agent": "Mozilla/5.0", "Accept-Encoding": "identity"}
+    resume_from = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+    if resume_from:
+        headers["Range"] = f"bytes={resume_from}-"
+
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 416:
+            # 断点超出文件范围（文件已变化），删除临时文件后从头下载
+            os.remove(temp_path)
+            return download_file_resumable(url, temp_path, chunk_size, timeout)
+        r.raise_for_status()
+
+        if r.status_code == 206:
+            mode, written = "ab", resume_from
+            expected_size = resume_from + int(r.headers.get("content-length", 0))
+        else:
+            mode, written = "wb", 0
+            expected_size = int(r.headers.get("content-length", 0))
+
+        with open(temp_path, mode) as f:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    written += len(chunk)
+
+        # 服务器仍压缩传输时，写入的是解码后的字节，与 Content-Length 不可比较
+        if r.headers.get("Content-Encoding", "identity").lower() != "identity":
+            expected_size = 0
+        if expected_size and written != expected_size:
+            raise OSError(
+                f"Incomplete download. Expected {expected_size}, got {written}"
+            )
+        return r.headers.get("Content-Type", "")
+
+
+class ThumbnailCache:
+    """
+    Civitai 缩略图的本地磁盘缓存。
+    文件按 URL 的 SHA256 内容寻址存放在 data/thumb_cache 下，元数据记录在 thumb_cache 表中，
+    总大小超过上限时按最近访问时间（LRU）淘汰。
+    """
+
+    def __init__(self, max_bytes, reencode_webp=True):
+        project_root = os.path.dirname(os.path.abspath(__file__))
+        self.cache_dir = os.path.join(project_root, "data", "thumb_cache")
+        self.max_bytes = max_bytes
+        self.reencode_webp = reencode_webp
+
+    @staticmethod
+    def normalize_url(url, width=None):
+        """校验来源并统一缩略图尺寸参数（width 为已校验的正整数）；非 Civitai 图片地址返回 None"""
+        parsed = urllib.parse.urlparse(url)
+        host = (parsed.hostname or "").lower()
+        if parsed.scheme not in ("http", "https") or not any(
+            host == h or host.endswith("." + h) for h in THUMB_ALLOWED_HOSTS
+        ):
+            return None
+        if width:
+            if re.search(r"/width=[^/]+", url):
+                url = re.sub(r"/width=[^/]+", f"/width={width}", url)
+            else:
+                url = re.sub(r"/([^/]+)$", rf"/width={width}/\1", url, count=1)
+        return url
+
+    def key_for(self, url):
+        variant = "webp" if self.reencode_webp else "raw"
+        return hashlib.sha256(f"{variant}|{url}".encode()).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key):
+        """命中时返回 (文件路径, Content-Type)，并刷新访问时间"""
+        with db_manager.get_connection() as conn:
+            row = conn.execute(
+                "SELECT content_type FROM thumb_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            path = self.path_for(key)
+            if not os.path.exists(path):
+                conn.execute("DELETE FROM thumb_cache WHERE cache_key = ?", (key,))
+                return None
+            conn.execute(
+                "UPDATE thumb_cache SET last_access = ? WHERE cache_key = ?",
+                (int(time.time()), key),
+            )
+        return path, row["content_type"]
+
+    def fetch(self, key, url):
+        """下载缩略图（必要时重新编码为 WebP）并写入缓存，返回 (文件路径, Content-Type)"""
+        import requests
+        with requests.get(
+            url, headers={"User-Agent": "Mozilla/5.0"}, stream=True, timeout=15
+        ) as r:
+            r.raise_for_status()
+            content_type = r.headers.get("Content-Type", "image/jpeg").split(";")[0]
+            data = bytearray()
+            for chunk in r.iter_content(chunk_size=1 << 16):
+                data.extend(chunk)
+                if len(data) > THUMB_MAX_DOWNLOAD_BYTES:
+                    raise OSError("Thumbnail exceeds the maximum download size.")
+        data = bytes(data)
+
+        if self.reencode_webp and content_type.startswith("image/") and content_type != "image/webp":
+            # fetch 已在工作线程中执行，直接编码；Pillow 编码时会释放 GIL
+            encoded = self._encode_webp(data)
+            if encoded:
+                data, content_type = encoded, "image/webp"
+
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with db_manager.get_connection() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO thumb_cache (cache_key, url, content_type, size, last_access)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, url, content_type, len(data), int(time.time())),
+            )
+        self._evict_if_needed()
+        return path, content_type
+
+    @staticmethod
+    def _encode_webp(data):
+        try:
+            import io
+
+            from PIL import Image
+
+            with Image.open(io.BytesIO(data)) as img:
+                if getattr(img, "is_animated", False):
+                    return None
+                if img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                out = io.BytesIO()
+                img.save(out, format="WEBP", quality=82, method=4)
+            encoded = out.getvalue()
+            return encoded if len(encoded) < len(data) else None
+        except Exception as e:
+            print(f"[Civitai Toolkit] WebP re-encode failed, keeping original thumbnail: {e}")
+            return None
+
+    def _evict_if_needed(self):
+        with db_manager.get_connection() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM thumb_cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = total - int(self.max_bytes * 0.9)
+            freed, evicted = 0, []
+            for row in conn.execute(
+                "SELECT cache_key, size FROM thumb_cache ORDER BY last_access ASC"
+            ):
+                evicted.append(row["cache_key"])
+                freed += row["size"] or 0
+                if freed >= target:
+                    break
+            conn.executemany(
+                "DELETE FROM thumb_cache WHERE cache_key = ?", [(k,) for k in evicted]
+            )
+        for key in evicted:
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with db_manager.get_connection() as conn:
+            keys = [row["cache_key"] for row in conn.execute("SELECT cache_key FROM thumb_cache")]
+            conn.execute("DELETE FROM thumb_cache")
+        for key in keys:
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+        print("[Civitai Toolkit] Thumbnail cache cleared.")
+
+
+thumb_cache = ThumbnailCache(THUMB_CACHE_MAX_BYTES, THUMB_REENCODE_WEBP)
+
+
 def download_missing_covers():
     """
     为数据库中已有API信息但本地缺少封面的模型下载封面图。
     """
+    from tqdm import tqdm
     print("[Civitai Toolkit] Checking for models missing local cover images...")
 
     # 1. 查询所有需要检查的模型
@@ -1656,13 +3436,27 @@ def download_missing_covers():
         )
     print("[Civitai Toolkit] Finished downloading missing covers.")
 
+def schedule_startup_tasks(loop):
+    """
+    在事件循环开始运行（服务器启动）STARTUP_TASK_DELAY 秒后再开始后台任务，
+    插件导入期间不访问数据库也不启动线程。事件循环看门狗也在这里随事件循环启动。
+    """
+    asyncio.run_coroutine_threadsafe(api.event_loop_watchdog(), loop)
+    loop.call_soon_threadsafe(loop.call_later, STARTUP_TASK_DELAY, initiate_background_scan, loop)
+
+
 def initiate_background_scan(loop):
+    scan_thread = threading.Thread(target=_startup_worker, args=(loop,))
+    scan_thread.daemon = True
+    scan_thread.start()
+
+
+def _startup_worker(loop):
     if db_manager.get_setting("initial_scan_complete", False):
         print("[Civitai Toolkit] Initial scan already completed. Skipping.")
+        local_model_index.build()
         return
-    scan_thread = threading.Thread(target=background_scan_worker, args=(loop,))
-    scan_thread.daemon = True
-    scan_thread.start()
+    background_scan_worker(loop)
 
 def background_scan_worker(loop):
     """
@@ -1675,6 +3469,7 @@ def background_scan_worker(loop):
         # 阶段一：哈希扫描
         print("\n--- Background Task: Phase 1/3 - Hashing Local Files ---")
         scan_all_supported_model_types(force=True)
+        local_model_index.build()
 
         # 阶段二：Civitai 信息补全
         print("\n--- Background Task: Phase 2/3 - Fetching Civitai Info ---")
@@ -1705,61 +3500,41 @@ def get_local_models_for_ui():
     """
     [功能完整版] 快速为UI提供数据，包含纯本地的封面查找逻辑。
     """
+    from safetensors import safe_open
     print("[Civitai Toolkit] Reading model list from database for UI...")
     models_details = []
 
+    listed_paths = {}
+    for mt in SUPPORTED_MODEL_TYPES:
+        ensure_relative_paths(mt)
+        listed_paths[mt] = set(folder_paths.get_filename_list(mt) or [])
+
     with db_manager.get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT v.hash, v.local_path, v.model_type, v.name as version_name, v.api_response, m.name as model_name
+            SELECT v.hash, v.local_path, v.model_type, v.relative_path, v.base_folder_index,
+                   v.name as version_name, v.api_response,
+                   m.name as model_name, m.api_response as model_api_response
             FROM versions v LEFT JOIN models m ON v.model_id = m.model_id
-            WHERE v.local_path IS NOT NULL
+            WHERE v.relative_path IS NOT NULL
         """)
         all_versions = cursor.fetchall()
 
-    all_model_paths = {}
-    all_base_folders = {}
-    for mt in SUPPORTED_MODEL_TYPES.keys():
-        relative_paths = folder_paths.get_filename_list(mt)
-        if relative_paths:
-            path_map = {}
-            for f in relative_paths:
-                full_path = folder_paths.get_full_path(mt, f)
-                if full_path:
-                    path_map[os.path.normpath(full_path)] = f
-            all_model_paths[mt] = path_map
-            all_base_folders[mt] = folder_paths.get_folder_paths(mt)
-
     for db_entry in all_versions:
         model_type = db_entry["model_type"]
-        norm_path = os.path.normpath(db_entry["local_path"])
-        relative_path = all_model_paths.get(model_type, {}).get(norm_path)
-        if not relative_path:
+        relative_path = db_entry["relative_path"]
+        if relative_path not in listed_paths.get(model_type, ()):
             continue
+        norm_path = os.path.normpath(db_entry["local_path"])
 
         api_data = json_lib.loads(db_entry['api_response']) if db_entry['api_response'] else None
+        api_data = _hydrate_version_data(api_data, db_entry["model_api_response"])
 
         # --- 快速的本地封面查找逻辑 ---
         local_cover_path, found_cover = None, False
-        path_index = -1
-
-        base_folders_for_type = all_base_folders.get(model_type, [])
-        for i, folder in enumerate(base_folders_for_type):
-            if not folder:
-                continue
-            folder = os.path.normpath(folder)
-            
-            # Windows: Check if drives match first to avoid ValueError in commonpath
-            if os.path.splitdrive(norm_path)[0].casefold() != os.path.splitdrive(folder)[0].casefold():
-                continue
-
-            try:
-                # Use checking with casefold to handle case-insensitive paths on Windows
-                if os.path.commonpath([norm_path, folder]).casefold() == folder.casefold():
-                    path_index = i
-                    break
-            except ValueError:
-                continue
+        path_index = db_entry["base_folder_index"]
+        if path_index is None:
+            path_index = -1
 
         if path_index != -1:
             name_no_ext = os.path.splitext(relative_path)[0]